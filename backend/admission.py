@@ -0,0 +1,245 @@
+"""Contrôle d'admission : limites de débit et de concurrence devant la base.
+
+- ``RateLimiter`` : un seau de jetons par clé (id utilisateur lu dans le JWT
+  par token_required, adresse IP pour /api/register et /api/login). Chaque
+  requête consomme un jeton ; les jetons reviennent à ``rate`` par seconde
+  jusqu'à ``burst``. Sans jeton, la requête reçoit une 429 avec Retry-After.
+  Coût O(1) par requête ; au plus ``max_keys`` seaux, le moins récemment
+  utilisé est évincé (il repart plein s'il revient).
+- ``ConcurrencyGate`` : au plus ``max_active`` requêtes en cours par
+  processus ; au-delà, au plus ``max_queue`` requêtes attendent une place
+  pendant ``queue_timeout`` secondes. Une requête refusée reçoit une 503
+  avec Retry-After plutôt que d'allonger les files devant le pool MySQL.
+  Par défaut ``max_active`` vaut la taille du pool (DB_POOL_MAX_SIZE).
+
+Un worker gthread ne traite jamais plus de requêtes à la fois que de
+threads : la barrière n'attend et ne refuse que si le worker a plus de threads
+que ``max_active``. ``wsgi_threads`` donne ce nombre (un thread par place
+admise, par place de la file et par flux SSE), utilisé par launcher.py quand
+WEB_THREADS n'est pas fixé ; sinon l'excès s'empile dans la file d'accept de
+gunicorn, sans 503.
+
+L'état est propre à chaque processus : avec WEB_WORKERS workers, la limite
+effective d'un utilisateur est au plus WEB_WORKERS fois celle configurée.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RateLimitedError(Exception):
+    """Débit autorisé dépassé (réponse 429)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Débit dépassé, réessayer dans {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+class OverloadedError(Exception):
+    """Trop de requêtes en cours dans le processus (réponse 503)"""
+
+    def __init__(self, retry_after):
+        super().__init__('Trop de requêtes en cours')
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds):
+    """Valeur de l'en-tête Retry-After (secondes entières, au moins 1)"""
+    return str(max(1, math.ceil(seconds)))
+
+
+class RateLimiter:
+    """Seaux de jetons par clé, LRU borné à ``max_keys`` entrées (rate <= 0 : désactivé)"""
+
+    def __init__(self, rate=10.0, burst=20, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # clé -> [jetons, instant du dernier calcul]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.limited = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix, rate, burst):
+        """Construit le limiteur à partir de <prefix>_RATE, <prefix>_BURST et RATE_LIMIT_MAX_KEYS"""
+        return cls(
+            rate=float(os.getenv(f'{prefix}_RATE', rate)),
+            burst=float(os.getenv(f'{prefix}_BURST', burst)),
+            max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', 10000)),
+        )
+
+    @property
+    def enabled(self):
+        return self.rate > 0 and self.max_keys > 0
+
+    def check(self, key):
+        """Consomme un jeton pour ``key``; lève RateLimitedError s'il n'y en a plus"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.admitted += 1
+                return
+            self.limited += 1
+            retry_after = (1 - bucket[0]) / self.rate
+        raise RateLimitedError(retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._buckets),
+                'max_keys': self.max_keys,
+                'rate': self.rate,
+                'burst': self.burst,
+                'admitted': self.admitted,
+                'limited': self.limited,
+                'evictions': self.evictions,
+            }
+
+
+class ConcurrencyGate:
+    """Au plus ``max_active`` requêtes admises, ``max_queue`` en attente (max_active <= 0 : désactivé).
+
+    ``enter`` / ``leave`` pour les threads (app.py), ``enter_async`` /
+    ``leave_async`` pour la boucle asyncio (asgi_app.py) : une instance ne
+    sert qu'à l'un des deux modes.
+    """
+
+    def __init__(self, max_active=32, max_queue=64, queue_timeout=0.5):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        # Mode asyncio : une place libérée est transmise directement au premier en attente
+        self._futures = deque()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit la barrière à partir de ADMISSION_MAX_ACTIVE (défaut : DB_POOL_MAX_SIZE),
+        ADMISSION_MAX_QUEUE et ADMISSION_QUEUE_TIMEOUT"""
+        return cls(
+            max_active=int(os.getenv('ADMISSION_MAX_ACTIVE', os.getenv('DB_POOL_MAX_SIZE', 10))),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 64)),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.5)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_active > 0
+
+    def _reject(self):
+        # File pleine : le client revient quand les requêtes en cours auront avancé
+        self.rejected += 1
+        raise OverloadedError(max(1.0, self.queue_timeout))
+
+    def enter(self):
+        """Admet la requête (en attendant au plus queue_timeout) ou lève OverloadedError"""
+        with self._cond:
+            if self.active < self.max_active:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queue:
+                self._reject()
+            self.waiting += 1
+            self.queued += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.max_active, self.queue_timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.timed_out += 1
+                self._reject()
+            self.active += 1
+            self.admitted += 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    async def enter_async(self):
+        if self.active < self.max_active:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.waiting >= self.max_queue:
+            self._reject()
+        future = asyncio.get_running_loop().create_future()
+        self._futures.append(future)
+        self.waiting += 1
+        self.queued += 1
+        try:
+            # La place est transmise par leave_async : active ne change pas
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._reject()
+        except asyncio.CancelledError:
+            # Client parti après avoir reçu la place : elle passe au suivant
+            if future.done() and not future.cancelled():
+                self.leave_async()
+            raise
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+
+    def leave_async(self):
+        while self._futures:
+            future = self._futures.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+# Threads d'un worker gthread quand la barrière est désactivée (ADMISSION_MAX_ACTIVE=0)
+DEFAULT_WSGI_THREADS = 4
+
+
+def wsgi_threads(gate, streams):
+    """Threads d'un worker gthread pour que ``gate`` attende et refuse réellement.
+
+    Un thread par requête admise et par requête en file, plus ``streams``
+    threads pour les flux SSE (hors admission, un thread chacun).
+    """
+    if not gate.enabled:
+        return DEFAULT_WSGI_THREADS + streams
+    return gate.max_active + gate.max_queue + streams
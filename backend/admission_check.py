@@ -0,0 +1,91 @@
+"""Barrière d'admission sous charge concurrente (python manage.py admission).
+
+Rejoue le fonctionnement d'un worker gthread : un pool de threads de taille
+fixe dont chaque thread sert une requête lente (``enter``, attente,
+``leave``), toutes arrivées en même temps. Avec ``wsgi_threads`` threads, les
+requêtes au-delà de ``max_active`` doivent attendre dans la file puis, leur
+attente dépassant ``queue_timeout``, recevoir leur 503 (OverloadedError).
+Avec seulement ``max_active`` threads, la barrière n'attend ni ne refuse
+jamais : c'est le cas que le dimensionnement des threads de launcher.py évite.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import ConcurrencyGate, OverloadedError, wsgi_threads
+
+MAX_ACTIVE = 2
+MAX_QUEUE = 2
+QUEUE_TIMEOUT = 0.1
+# Durée d'une requête admise, plus longue que l'attente tolérée dans la file
+REQUEST_SECONDS = 0.3
+
+
+def _serve(gate, start, threads, requests):
+    """Envoie ``requests`` requêtes lentes à ``threads`` threads; retourne les statistiques de ``gate``"""
+    peak = [0]
+    lock = threading.Lock()
+
+    def request():
+        start.wait()
+        try:
+            gate.enter()
+        except OverloadedError:
+            return
+        try:
+            with lock:
+                peak[0] = max(peak[0], gate.active)
+            time.sleep(REQUEST_SECONDS)
+        finally:
+            gate.leave()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(requests):
+            pool.submit(request)
+        start.set()
+    return dict(gate.stats(), peak=peak[0])
+
+
+def _gate():
+    return ConcurrencyGate(max_active=MAX_ACTIVE, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT)
+
+
+def check_sized_threads():
+    """Autant de requêtes simultanées que de threads prévus par wsgi_threads : file et 503"""
+    gate = _gate()
+    threads = wsgi_threads(gate, 0)
+    stats = _serve(gate, threading.Event(), threads, threads)
+    problems = []
+    if stats['peak'] > MAX_ACTIVE:
+        problems.append(f"{stats['peak']} requêtes en cours, limite {MAX_ACTIVE}")
+    if stats['queued'] != MAX_QUEUE:
+        problems.append(f"{stats['queued']} requête(s) en file, attendu {MAX_QUEUE}")
+    if stats['rejected'] != MAX_QUEUE or stats['timed_out'] != MAX_QUEUE:
+        problems.append(f"{stats['rejected']} refus dont {stats['timed_out']} après attente, attendu {MAX_QUEUE}")
+    if stats['admitted'] != MAX_ACTIVE:
+        problems.append(f"{stats['admitted']} requête(s) admise(s), attendu {MAX_ACTIVE}")
+    return problems
+
+
+def check_threads_at_limit():
+    """Threads = max_active : l'excès attend un thread, jamais la barrière (ni file ni 503)"""
+    gate = _gate()
+    requests = wsgi_threads(gate, 0)
+    stats = _serve(gate, threading.Event(), MAX_ACTIVE, requests)
+    problems = []
+    if stats['queued'] or stats['rejected']:
+        problems.append(f"{stats['queued']} en file, {stats['rejected']} refus : la barrière n'aurait pas dû servir")
+    if stats['admitted'] != requests:
+        problems.append(f"{stats['admitted']} requête(s) admise(s), attendu {requests}")
+    return problems
+
+
+CHECKS = [
+    ('threads dimensionnés : file et 503', check_sized_threads),
+    ('threads = max_active : barrière inopérante', check_threads_at_limit),
+]
+
+
+def run():
+    """Exécute les scénarios; retourne [(nom, problèmes)]"""
+    return [(name, check()) for name, check in CHECKS]
@@ -0,0 +1,504 @@
+"""Règles de l'API communes aux deux modes de service (app.py et asgi_app.py).
+
+Validation des entrées, jetons JWT et ETag : tout ce qui ne dépend ni de
+Flask ni du pilote MySQL, pour que les deux applications gardent exactement
+les mêmes contrats JSON.
+"""
+import hashlib
+import os
+from datetime import date, datetime, timedelta
+
+import jwt
+
+from task_repository import (CALENDAR_BUCKETS, LIST_ORDERS, TASK_FIELDS, TASK_ORDERINGS, TASK_STATUSES,
+                             SEARCH_ORDERINGS, boolean_query, decode_archive_cursor, decode_cursor, decode_change_cursor,
+                             decode_search_cursor, encode_archive_cursor, encode_change_cursor, encode_search_cursor,
+                             serialize_task)
+
+TASKS_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', 100))
+TASKS_PAGE_MAX_SIZE = int(os.getenv('TASKS_PAGE_MAX_SIZE', 500))
+TASKS_STREAM_BATCH = int(os.getenv('TASKS_STREAM_BATCH', 500))
+# Fenêtre (jours) de GET /api/tasks/upcoming
+UPCOMING_DAYS = 7
+
+# Fenêtre max (jours) et tâches max par groupe de GET /api/tasks/calendar
+CALENDAR_MAX_DAYS = int(os.getenv('CALENDAR_MAX_DAYS', 92))
+CALENDAR_MAX_TASKS = int(os.getenv('CALENDAR_MAX_TASKS', 20))
+
+# Longueur max du paramètre q de GET /api/tasks/search
+SEARCH_MAX_LENGTH = 200
+
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', 500))
+
+# Jeton de GET /api/tasks/stream : passé dans l'URL (EventSource n'envoie pas
+# d'en-têtes), il n'ouvre que le flux et expire vite
+STREAM_TOKEN_SCOPE = 'stream'
+STREAM_TOKEN_EXPIRES = int(os.getenv('STREAM_TOKEN_EXPIRES', 60))
+BATCH_OPERATIONS = ('create', 'update', 'status', 'delete')
+
+
+class ApiError(Exception):
+    """Erreur de validation à renvoyer telle quelle au client"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# Fonction utilitaire pour valider les dates
+def validate_date(date_str):
+    """Valide et parse une date au format YYYY-MM-DD"""
+    if not date_str:
+        return None
+
+    try:
+        # Vérifier le format
+        if len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
+            raise ValueError("Format invalide")
+
+        year, month, day = map(int, date_str.split('-'))
+
+        # Vérifier que c'est une date valide
+        datetime(year, month, day)
+
+        # Optionnel : vérifier que la date n'est pas trop ancienne
+        # input_date = date(year, month, day)
+        # if input_date < date.today():
+        #     return None  # Ou raise ValueError selon vos besoins
+
+        return date_str
+    except (ValueError, TypeError):
+        return None
+
+
+# ============================================
+# AUTHENTIFICATION
+# ============================================
+
+def issue_token(user, secret_key, expires_in, scope=None):
+    """Jeton JWT de l'utilisateur (id, username et email sont des claims signés)"""
+    claims = {
+        'user_id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'exp': datetime.utcnow() + timedelta(seconds=expires_in)
+    }
+    if scope is not None:
+        claims['scope'] = scope
+    return jwt.encode(claims, secret_key)
+
+
+def check_token_scope(claims, in_query):
+    """Un jeton passé dans l'URL doit être un jeton de flux, qui n'est accepté nulle part ailleurs"""
+    if claims.get('scope') != (STREAM_TOKEN_SCOPE if in_query else None):
+        raise jwt.InvalidTokenError('Portée du jeton invalide')
+
+
+def bearer_token(headers):
+    """Jeton de l'en-tête Authorization: Bearer, ou None"""
+    auth_header = headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+def principal_from_claims(claims):
+    """Construit l'utilisateur courant depuis le token si tous les champs y sont"""
+    if not all(key in claims for key in ('user_id', 'username', 'email')):
+        return None
+    return {'id': claims['user_id'], 'username': claims['username'], 'email': claims['email']}
+
+
+def public_user(user):
+    return {'id': user['id'], 'username': user['username'], 'email': user['email']}
+
+
+def api_index(server):
+    """Description de l'API renvoyée par la route /"""
+    return {
+        'API Status': f'API {server} avec authentification JWT et date de début pour les tâches',
+        'version': '3.0',
+        'features': [
+            'Authentification JWT',
+            '3 colonnes Kanban (To Do, In Progress, Done)',
+            'Date de début pour chaque tâche',
+            'Tri par date de début dans To Do et In Progress',
+            'Tri chronologique inverse dans Done',
+            'Drag & drop entre colonnes',
+            'Ordre manuel dans chaque colonne'
+        ],
+        'endpoints': {
+            'auth': ['POST /api/register', 'POST /api/login', 'GET /api/profile'],
+            'tasks': [
+                'GET /api/tasks?status=all|todo|in_progress|done[&order=date|position][&limit=N&cursor=...]'
+                '[&stream=1]',
+                'POST /api/tasks (avec start_date optionnel)',
+                'PUT /api/tasks/{id}',
+                'PUT /api/tasks/{id}/status (avec after_id ou before_id optionnel)',
+                'DELETE /api/tasks/{id}',
+                'POST /api/tasks/batch',
+                'GET /api/tasks/changes?since=<cursor>[&limit=N]',
+                'GET /api/tasks/search?q=...[&status=...][&from=YYYY-MM-DD][&to=YYYY-MM-DD]'
+                '[&order=relevance|date][&limit=N&cursor=...]',
+                'GET /api/tasks/archive[?limit=N&cursor=...]',
+                'GET /api/tasks/calendar?from=YYYY-MM-DD&to=YYYY-MM-DD[&bucket=day|week][&tasks=N]',
+                'GET /api/tasks/export?format=ndjson|csv[&status=...]',
+                'POST /api/tasks/import (corps NDJSON ou CSV)',
+                'POST /api/tasks/stream/token',
+                'GET /api/tasks/stream?access_token=<jeton de flux> (Server-Sent Events)',
+                'GET /api/tasks/stats',
+                'GET /api/tasks/upcoming'
+            ]
+        }
+    }
+
+
+# ============================================
+# ETAG
+# ============================================
+
+def data_version_etag(route_name, args, user_id, version, extra_parts=()):
+    """ETag d'une réponse qui ne dépend que de la version des données de l'utilisateur"""
+    parts = [route_name, sorted(args), user_id, version] + list(extra_parts)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def today_part(current_user):
+    """Les réponses qui comparent à CURDATE() changent aussi avec la date"""
+    return date.today().isoformat()
+
+
+def profile_part(current_user):
+    return (current_user['username'], current_user['email'])
+
+
+# ============================================
+# TÂCHES
+# ============================================
+
+def parse_list_params(args):
+    """Paramètres de GET /api/tasks : (status, ordre, position de départ, limit, stream)"""
+    status = args.get('status', 'all')
+    if status not in TASK_ORDERINGS:
+        raise ApiError('Status invalide. Valeurs acceptées: all, todo, in_progress, done')
+
+    order = args.get('order', 'date')
+    if order not in LIST_ORDERS:
+        raise ApiError('Tri invalide. Valeurs acceptées: date, position')
+
+    after = None
+    if args.get('cursor'):
+        try:
+            after = decode_cursor(status, args['cursor'], order)
+        except ValueError:
+            raise ApiError('Curseur invalide')
+
+    limit = None
+    if 'limit' in args or after is not None:
+        try:
+            limit = int(args.get('limit', TASKS_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if limit < 1 or limit > TASKS_PAGE_MAX_SIZE:
+            raise ApiError(f'limit doit être compris entre 1 et {TASKS_PAGE_MAX_SIZE}')
+
+    stream = args.get('stream', '').lower() in ('1', 'true')
+    return status, order, after, limit, stream
+
+
+def parse_changes_params(args):
+    """Paramètres de GET /api/tasks/changes : (position since décodée ou None, limit)"""
+    after = None
+    if args.get('since'):
+        try:
+            after = decode_change_cursor(args['since'])
+        except ValueError:
+            raise ApiError('Curseur invalide')
+
+    try:
+        limit = int(args.get('limit', TASKS_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > TASKS_PAGE_MAX_SIZE:
+        raise ApiError(f'limit doit être compris entre 1 et {TASKS_PAGE_MAX_SIZE}')
+    return after, limit
+
+
+def parse_archive_params(args):
+    """Paramètres de GET /api/tasks/archive : (position de départ ou None, limit)"""
+    after = None
+    if args.get('cursor'):
+        try:
+            after = decode_archive_cursor(args['cursor'])
+        except ValueError:
+            raise ApiError('Curseur invalide')
+
+    try:
+        limit = int(args.get('limit', TASKS_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > TASKS_PAGE_MAX_SIZE:
+        raise ApiError(f'limit doit être compris entre 1 et {TASKS_PAGE_MAX_SIZE}')
+    return after, limit
+
+
+def archive_page(rows, limit):
+    """Tâches d'une page de l'archive (``limit + 1`` lignes lues) et curseur de la suivante, ou None"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_archive_cursor(rows[-1])
+
+
+def parse_calendar_params(args):
+    """Paramètres de GET /api/tasks/calendar : (début, fin, groupe, tâches par groupe)"""
+    dates = {}
+    for name in ('from', 'to'):
+        dates[name] = validate_date(args.get(name))
+        if not dates[name]:
+            raise ApiError(f'Le paramètre {name} est requis (format YYYY-MM-DD)')
+    start, end = date.fromisoformat(dates['from']), date.fromisoformat(dates['to'])
+    if start > end:
+        raise ApiError('from doit précéder to')
+    if (end - start).days + 1 > CALENDAR_MAX_DAYS:
+        raise ApiError(f'La période est limitée à {CALENDAR_MAX_DAYS} jours')
+
+    bucket = args.get('bucket', 'day')
+    if bucket not in CALENDAR_BUCKETS:
+        raise ApiError('Groupe invalide. Valeurs acceptées: day, week')
+
+    try:
+        tasks_per_bucket = int(args.get('tasks', 0))
+    except ValueError:
+        tasks_per_bucket = -1
+    if tasks_per_bucket < 0 or tasks_per_bucket > CALENDAR_MAX_TASKS:
+        raise ApiError(f'tasks doit être compris entre 0 et {CALENDAR_MAX_TASKS}')
+    return start, end, bucket, tasks_per_bucket
+
+
+def parse_search_params(args):
+    """Paramètres de GET /api/tasks/search, sous forme d'arguments de task_repository.search_tasks"""
+    text = args.get('q', '').strip()
+    if not text or len(text) > SEARCH_MAX_LENGTH:
+        raise ApiError(f'Le paramètre q est requis ({SEARCH_MAX_LENGTH} caractères maximum)')
+    if not boolean_query(text):
+        raise ApiError('La recherche doit contenir au moins un mot')
+
+    status = args.get('status', 'all')
+    if status not in TASK_ORDERINGS:
+        raise ApiError('Status invalide. Valeurs acceptées: all, todo, in_progress, done')
+
+    dates = {}
+    for name in ('from', 'to'):
+        if args.get(name):
+            dates[name] = validate_date(args[name])
+            if not dates[name]:
+                raise ApiError('Format de date invalide. Utilisez YYYY-MM-DD')
+
+    order = args.get('order', 'relevance')
+    if order not in SEARCH_ORDERINGS:
+        raise ApiError('Tri invalide. Valeurs acceptées: relevance, date')
+
+    after = None
+    if args.get('cursor'):
+        try:
+            after = decode_search_cursor(order, args['cursor'])
+        except ValueError:
+            raise ApiError('Curseur invalide')
+
+    try:
+        limit = int(args.get('limit', TASKS_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > TASKS_PAGE_MAX_SIZE:
+        raise ApiError(f'limit doit être compris entre 1 et {TASKS_PAGE_MAX_SIZE}')
+
+    return {
+        'text': text,
+        'status': None if status == 'all' else status,
+        'start_from': dates.get('from'),
+        'start_to': dates.get('to'),
+        'order': order,
+        'after': after,
+        'limit': limit,
+    }
+
+
+def search_page(rows, order, limit):
+    """Tâches d'une page de recherche (``limit + 1`` lignes lues) et curseur de la suivante, ou None"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(order, rows[-1])
+    for row in rows:
+        # Même forme que GET /api/tasks
+        del row['score']
+    return rows, next_cursor
+
+
+def check_sync_horizon(after, purged_seq):
+    """Refuse un curseur antérieur à des tombstones déjà purgées (suppressions perdues)"""
+    if after is not None and after[0] < purged_seq:
+        raise ApiError('Curseur expiré, resynchronisation complète nécessaire', 410)
+
+
+def changes_body(rows, limit, since):
+    """Réponse de GET /api/tasks/changes à partir de ``limit + 1`` lignes de list_changes"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = []
+    for row in rows:
+        if row['deleted']:
+            deleted_at = row['updatedAt'].isoformat() if row['updatedAt'] else None
+            changes.append({'type': 'deleted', 'id': row['id'], 'deletedAt': deleted_at})
+        else:
+            changes.append({'type': 'upserted', 'task': serialize_task(row)})
+
+    if rows:
+        cursor = encode_change_cursor(rows[-1])
+    else:
+        # Rien de nouveau : le client garde sa position
+        cursor = since or encode_change_cursor({'change_seq': 0, 'deleted': 0, 'id': 0})
+    return {'changes': changes, 'cursor': cursor, 'has_more': has_more}
+
+
+def parse_new_task(data):
+    """Champs de POST /api/tasks : (title, status, start_date)"""
+    if not data or 'title' not in data:
+        raise ApiError('Le titre est requis')
+
+    # Valider et parser la date de début
+    start_date = validate_date(data.get('start_date'))
+
+    # Si la date est invalide, on peut soit rejeter soit utiliser None
+    if data.get('start_date') and not start_date:
+        raise ApiError('Format de date invalide. Utilisez YYYY-MM-DD')
+
+    # Statut par défaut: 'todo'
+    status = data.get('status', 'todo')
+    if status not in TASK_STATUSES:
+        status = 'todo'
+
+    return data['title'], status, start_date
+
+
+def parse_status_change(data):
+    """Nouveau status et place de PUT /api/tasks/<id>/status : (status, after_id, before_id)"""
+    if not data or 'status' not in data:
+        raise ApiError('Le status est requis')
+
+    if data['status'] not in TASK_STATUSES:
+        raise ApiError('Status invalide. Valeurs acceptées: todo, in_progress, done')
+
+    # Place facultative dans la colonne : juste après ou juste avant une autre tâche
+    after_id, before_id = data.get('after_id'), data.get('before_id')
+    for value in (after_id, before_id):
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            raise ApiError('after_id et before_id doivent être des ids de tâche')
+    if after_id is not None and before_id is not None:
+        raise ApiError('after_id et before_id ne peuvent pas être donnés ensemble')
+
+    return data['status'], after_id, before_id
+
+
+def parse_task_update(data):
+    """Champs modifiés par PUT /api/tasks/<id>"""
+    data = data or {}
+    fields = {}
+
+    if 'title' in data:
+        fields['title'] = data['title']
+
+    if 'status' in data:
+        if data['status'] in TASK_STATUSES:
+            fields['status'] = data['status']
+
+    # Gérer la date de début
+    if 'start_date' in data:
+        start_date = validate_date(data['start_date'])
+        if start_date:
+            fields['start_date'] = start_date
+        elif data['start_date'] is None:
+            # Permettre de supprimer la date
+            fields['start_date'] = None
+        else:
+            raise ApiError('Format de date invalide. Utilisez YYYY-MM-DD')
+
+    if not fields:
+        raise ApiError('Aucun champ à mettre à jour')
+
+    return fields
+
+
+def validate_batch_operation(item):
+    """Valide une opération du lot; retourne (opération normalisée, None) ou (None, erreur)"""
+    if not isinstance(item, dict) or item.get('op') not in BATCH_OPERATIONS:
+        return None, 'Opération invalide. Valeurs acceptées: create, update, status, delete'
+    op = item['op']
+
+    if op != 'create':
+        if not isinstance(item.get('id'), int) or isinstance(item.get('id'), bool):
+            return None, 'L\'id de la tâche est requis'
+
+    if 'status' in item or op == 'status':
+        if item.get('status') not in TASK_STATUSES:
+            return None, 'Status invalide. Valeurs acceptées: todo, in_progress, done'
+
+    fields = {}
+    if op == 'create':
+        if not item.get('title'):
+            return None, 'Le titre est requis'
+        fields = {'title': item['title'], 'status': item.get('status', 'todo'), 'start_date': None}
+    elif op == 'update':
+        fields = {key: item[key] for key in TASK_FIELDS if key in item}
+        if not fields:
+            return None, 'Aucun champ à mettre à jour'
+        if 'title' in fields and not fields['title']:
+            return None, 'Le titre est requis'
+    elif op == 'status':
+        fields = {'status': item['status']}
+
+    if item.get('start_date') is not None and op in ('create', 'update'):
+        start_date = validate_date(item['start_date'])
+        if not start_date:
+            return None, 'Format de date invalide. Utilisez YYYY-MM-DD'
+        fields['start_date'] = start_date
+
+    return {'op': op, 'id': item.get('id'), 'fields': fields}, None
+
+
+def parse_batch(data):
+    """Valide un lot : (atomic, opérations valides, résultats en erreur par index)"""
+    if not data or not isinstance(data.get('operations'), list) or not data['operations']:
+        raise ApiError('La liste des opérations est requise')
+    if len(data['operations']) > BATCH_MAX_OPERATIONS:
+        raise ApiError(f'Maximum {BATCH_MAX_OPERATIONS} opérations par lot')
+    atomic = bool(data.get('atomic', True))
+
+    results = {}
+    valid = []
+    seen_ids = set()
+    for index, item in enumerate(data['operations']):
+        operation, error = validate_batch_operation(item)
+        if operation and operation['id'] is not None:
+            if operation['id'] in seen_ids:
+                operation, error = None, 'Tâche présente plusieurs fois dans le lot'
+            else:
+                seen_ids.add(operation['id'])
+        if error:
+            results[index] = {'index': index, 'op': item.get('op') if isinstance(item, dict) else None,
+                              'status': 400, 'error': error}
+        else:
+            valid.append((index, operation))
+    return atomic, valid, results
+
+
+def batch_response(atomic, results):
+    """Corps et code HTTP de la réponse d'un lot (rollback nécessaire si code != 200)"""
+    failed = sorted(index for index in results if results[index]['status'] >= 400)
+    if atomic and failed:
+        status = 400 if any(results[index]['status'] == 400 for index in failed) else 404
+        return {'error': 'Lot rejeté, aucune opération appliquée',
+                'results': [results[index] for index in failed]}, status
+    return {'results': [results[index] for index in sorted(results)]}, 200
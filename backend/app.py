@@ -1,124 +1,234 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
-import mysql.connector, os, jwt
-from datetime import datetime, timedelta, date
+import os, jwt
+from datetime import datetime, date
 from functools import wraps
-import time
+from db_pool import PoolExhaustedError
+from admission import ConcurrencyGate, OverloadedError, RateLimitedError, RateLimiter, retry_after_header
+from storage import active_storage
+from auth_cache import PrincipalCache
+from cache import ListingCache, calendar_variant, tasks_variant, upcoming_variant
+from encoding import COMPRESS_MIN_SIZE, FastJSONProvider, compress, compressible, dumps, negotiate
+from passwords import PasswordHasher, PasswordHasherBusyError
+from events import WSGI_MAX_STREAMS, EventHub
+from import_export import (EXPORT_FORMATS, IMPORT_CHUNK_SIZE, IMPORT_READ_SIZE, TaskImportParser, export_chunk,
+                           export_header, export_headers, import_event, parse_export_params, parse_import_format)
+from metrics import RequestMetrics, measure, timed_cursor
+from counters import TaskCounterDelta, read_data_version, read_stats
+from sql_plan import execute_plan
+from migrate import initialize_database
+import task_repository, user_repository
+from task_repository import serialize_task, encode_cursor, build_tasks_query
+from api_common import (ApiError, TASKS_STREAM_BATCH, STREAM_TOKEN_EXPIRES, STREAM_TOKEN_SCOPE, issue_token,
+                        check_token_scope, bearer_token, principal_from_claims,
+                        public_user, api_index, data_version_etag, today_part, profile_part,
+                        parse_list_params, parse_new_task, parse_status_change, parse_task_update,
+                        parse_batch, batch_response, parse_changes_params, check_sync_horizon,
+                        parse_search_params, search_page, parse_archive_params, archive_page,
+                        parse_calendar_params, changes_body, UPCOMING_DAYS)
 
 app = Flask(__name__)
-CORS(app)
-bcrypt = Bcrypt(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
+# jsonify via orjson : dates écrites directement depuis les lignes MySQL (voir encoding.py)
+app.json = FastJSONProvider(app)
 
 # Configuration JWT
 app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'default_secret_key_change_in_production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))
+# Si activé, l'utilisateur est construit à partir des claims signés du token,
+# sans lecture de la table users (un compte supprimé reste valide jusqu'à l'expiration)
+app.config['AUTH_TRUST_CLAIMS'] = os.getenv('AUTH_TRUST_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+# Ajoute l'en-tête X-DB-Queries (requêtes SQL exécutées) aux réponses, pour bench/loadtest.py
+app.config['DB_QUERY_COUNT_HEADER'] = os.getenv('DB_QUERY_COUNT_HEADER', 'false').lower() in ('1', 'true', 'yes')
 
-def get_db_connection(max_retries=10, retry_delay=2):
-    """Établit une connexion à la base de données avec retry"""
-    for attempt in range(max_retries):
-        try:
-            conn = mysql.connector.connect(
-                host=os.getenv('DB_HOST'),
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                database=os.getenv('DB_NAME'),
-                port=os.getenv('DB_PORT')
-            )
-            print(f"✅ Connexion MySQL réussie (tentative {attempt + 1}/{max_retries})")
-            return conn
-        except mysql.connector.errors.DatabaseError as e:
-            if attempt < max_retries - 1:
-                print(f"⏳ MySQL pas encore prêt, nouvelle tentative dans {retry_delay}s...")
-                time.sleep(retry_delay)
-            else:
-                print(f"❌ Impossible de se connecter à MySQL après {max_retries} tentatives")
-                raise e
+# Moteur de stockage (STORAGE_BACKEND, voir storage.py) et son pool de
+# connexions (configuré par les variables DB_POOL_*)
+storage = active_storage()
+db_pool = storage.create_pool()
 
-def initialize_database():
-    """Initialise la base de données avec la nouvelle structure (date de début)"""
-    print("🔧 Initialisation de la base de données avec date de début...")
-    
+def get_db_connection(timeout=None):
+    """Connexion MySQL de la requête courante, empruntée au pool.
+
+    La même connexion est partagée par token_required et la route, puis rendue
+    au pool à la fin de la requête (voir release_db_connection).
+    """
+    if 'db_conn' not in g:
+        with measure('db_acquire'):
+            g.db_conn = db_pool.acquire(timeout)
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Rend la connexion de la requête au pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+def run_plan(plan):
+    """Exécute un plan (voir sql_plan.py) sur la connexion de la requête"""
+    cursor = timed_cursor(get_db_connection().cursor(dictionary=True))
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Table users (inchangée)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
-        print("✅ Table 'users' vérifiée/créée")
-        
-        # Table tasks AVEC DATE DE DÉBUT
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                status ENUM('todo', 'in_progress', 'done') DEFAULT 'todo',
-                start_date DATE NULL,  -- NOUVEAU : Date de début
-                createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_user_id (user_id),
-                INDEX idx_status (status),
-                INDEX idx_start_date (start_date),  -- Index pour le tri
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
-        print("✅ Table 'tasks' créée avec start_date")
-        
-        # Migration : ajouter la colonne start_date si elle n'existe pas
-        try:
-            cursor.execute("SHOW COLUMNS FROM tasks LIKE 'start_date'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE tasks ADD COLUMN start_date DATE NULL")
-                print("✅ Colonne 'start_date' ajoutée")
-                
-                # Pour les tâches existantes, définir start_date = date de création
-                cursor.execute("UPDATE tasks SET start_date = DATE(createdAt) WHERE start_date IS NULL")
-                print("✅ Dates de début initialisées pour les tâches existantes")
-        except Exception as e:
-            print(f"ℹ️  Gestion de la colonne start_date: {e}")
-        
-        conn.commit()
+        return execute_plan(plan, cursor)
+    finally:
         cursor.close()
-        conn.close()
-        
-        print("🎉 Base de données initialisée avec date de début!")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Erreur lors de l'initialisation: {e}")
-        return False
+
+def run_detached_plan(plan):
+    """Exécute un plan hors requête (thread de fond) sur sa propre connexion du pool.
+
+    La connexion est rendue aussitôt : sa transaction est annulée, la
+    prochaine exécution lit un nouvel instantané.
+    """
+    conn = db_pool.acquire()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            return execute_plan(plan, cursor)
+        finally:
+            cursor.close()
+    finally:
+        db_pool.release(conn)
+
+# Durées par route et par phase, requêtes lentes (METRICS_*, voir metrics.py)
+request_metrics = RequestMetrics.from_env()
+
+@app.before_request
+def start_request_trace():
+    request_metrics.start()
+
+# Limites de débit (RATE_LIMIT_*) et de concurrence (ADMISSION_*), voir admission.py
+user_rate_limiter = RateLimiter.from_env('RATE_LIMIT_USER', 20, 40)
+ip_rate_limiter = RateLimiter.from_env('RATE_LIMIT_AUTH_IP', 1, 10)
+admission_gate = ConcurrencyGate.from_env()
+
+def admission_exempt(f):
+    """Route servie hors de la limite de concurrence (sondes, métriques, flux SSE de longue durée).
+    À placer juste sous @app.route."""
+    f.admission_exempt = True
+    return f
+
+@app.before_request
+def admit_request():
+    """Enregistrée après start_request_trace : les requêtes refusées sont mesurées"""
+    view = app.view_functions.get(request.endpoint)
+    if not admission_gate.enabled or view is None or getattr(view, 'admission_exempt', False):
+        return
+    with measure('admission'):
+        admission_gate.enter()
+    g.admitted = True
+
+@app.teardown_request
+def release_admission(exception=None):
+    # Réponse en flux : exécuté à la fin de l'envoi (stream_with_context)
+    if g.pop('admitted', False):
+        admission_gate.leave()
+
+@app.after_request
+def record_request_metrics(response):
+    """Enregistrée avant compress_response, donc exécutée après : taille compressée"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    size = None if response.is_streamed else response.calculate_content_length()
+    trace = request_metrics.finish(route, request.method, response.status_code, size)
+    if trace is not None and app.config['DB_QUERY_COUNT_HEADER']:
+        response.headers['X-DB-Queries'] = str(trace.queries)
+    return response
+
+@app.teardown_request
+def clear_request_trace(exception=None):
+    request_metrics.clear()
+
+@app.after_request
+def compress_response(response):
+    """Compresse les réponses JSON volumineuses selon Accept-Encoding (voir encoding.py)"""
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    if not compressible(response.status_code, response.mimetype, response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.errorhandler(ApiError)
+def handle_api_error(e):
+    return jsonify({'error': e.message}), e.status
+
+@app.errorhandler(RateLimitedError)
+def handle_rate_limited(e):
+    response = jsonify({'error': 'Trop de requêtes, réessayez plus tard'})
+    response.headers['Retry-After'] = retry_after_header(e.retry_after)
+    return response, 429
+
+@app.errorhandler(OverloadedError)
+def handle_overloaded(e):
+    response = jsonify({'error': 'Service temporairement surchargé, réessayez plus tard'})
+    response.headers['Retry-After'] = retry_after_header(e.retry_after)
+    return response, 503
+
+@app.errorhandler(PoolExhaustedError)
+@app.errorhandler(PasswordHasherBusyError)
+def handle_pool_exhausted(e):
+    response = jsonify({'error': 'Service temporairement surchargé, réessayez plus tard'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Cache des utilisateurs authentifiés (AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+principal_cache = PrincipalCache.from_env()
+
+# bcrypt hors des threads de requête (BCRYPT_LOG_ROUNDS, PASSWORD_WORKERS, PASSWORD_MAX_PENDING)
+password_hasher = PasswordHasher.from_env()
+
+# Listes de tâches déjà sérialisées (TASKS_CACHE_*, voir cache.py)
+listing_cache = ListingCache.from_env()
+
+def invalidate_user(user_id):
+    """À appeler quand un utilisateur est modifié ou supprimé"""
+    principal_cache.invalidate(user_id)
+
+def load_principal(user_id):
+    """Utilisateur courant depuis le cache, sinon depuis la table users"""
+    current_user = principal_cache.get(user_id)
+    if current_user is not None:
+        return current_user
+    
+    current_user = run_plan(user_repository.find_principal(user_id))
+    if current_user:
+        principal_cache.set(user_id, current_user)
+    return current_user
+
+def token_in_query(f):
+    """Accepte aussi un jeton de flux (POST /api/tasks/stream/token) en paramètre ?access_token=
+    (EventSource ne peut pas envoyer d'en-têtes). À placer sous @token_required."""
+    f.allow_query_token = True
+    return f
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
+        token = bearer_token(request.headers)
+        in_query = not token and getattr(f, 'allow_query_token', False)
+        if in_query:
+            token = request.args.get('access_token')
         if not token:
             return jsonify({'error': 'Token manquant'}), 401
         
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            with measure('jwt'):
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            check_token_scope(data, in_query)
             current_user_id = data['user_id']
+            # Avant toute lecture en base : un client trop rapide ne coûte qu'un décodage JWT
+            user_rate_limiter.check(current_user_id)
             
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute('SELECT id, username, email FROM users WHERE id = %s', (current_user_id,))
-            current_user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            current_user = None
+            if app.config['AUTH_TRUST_CLAIMS']:
+                current_user = principal_from_claims(data)
+            if current_user is None:
+                with measure('auth_lookup'):
+                    current_user = load_principal(current_user_id)
             
             if not current_user:
                 return jsonify({'error': 'Utilisateur non trouvé'}), 401
@@ -132,36 +242,50 @@ def token_required(f):
     
     return decorated
 
-# Fonction utilitaire pour valider les dates
-def validate_date(date_str):
-    """Valide et parse une date au format YYYY-MM-DD"""
-    if not date_str:
-        return None
-    
-    try:
-        # Vérifier le format
-        if len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
-            raise ValueError("Format invalide")
-        
-        year, month, day = map(int, date_str.split('-'))
-        
-        # Vérifier que c'est une date valide
-        datetime(year, month, day)
-        
-        # Optionnel : vérifier que la date n'est pas trop ancienne
-        # input_date = date(year, month, day)
-        # if input_date < date.today():
-        #     return None  # Ou raise ValueError selon vos besoins
-        
-        return date_str
-    except (ValueError, TypeError):
-        return None
+def ip_rate_limited(f):
+    """Limite de débit par adresse IP, pour les routes sans token (bcrypt, création de compte)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        ip_rate_limiter.check(request.remote_addr)
+        return f(*args, **kwargs)
+    return decorated
+
+def etag_from_data_version(*extra_parts):
+    """Réponses conditionnelles (ETag / If-None-Match) pilotées par data_version.
+
+    L'ETag est dérivé de la version des données de l'utilisateur, incrémentée
+    par chaque écriture de tâche, et des ``extra_parts`` (fonctions de
+    current_user) dont dépend aussi la réponse. Si le client possède déjà cet
+    ETag, la route n'est pas exécutée et une réponse 304 est renvoyée. La
+    version lue reste disponible dans ``g.data_version``.
+    À placer sous @token_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            version = g.data_version = run_plan(read_data_version(current_user['id']))
+            etag = data_version_etag(f.__name__, request.args.items(multi=True), current_user['id'],
+                                     version, [part(current_user) for part in extra_parts])
+            
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(f(current_user, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Le navigateur revalide à chaque fois (If-None-Match automatique)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
 
 # ============================================
 # ROUTES D'AUTHENTIFICATION (inchangées)
 # ============================================
 
 @app.route('/api/register', methods=['POST'])
+@ip_rate_limited
 def register():
     data = request.json
     
@@ -175,92 +299,79 @@ def register():
     if len(password) < 6:
         return jsonify({'error': 'Le mot de passe doit contenir au moins 6 caractères'}), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id FROM users WHERE username = %s OR email = %s', (username, email))
-    if cursor.fetchone():
-        cursor.close()
-        conn.close()
+    if run_plan(user_repository.is_taken(username, email)):
         return jsonify({'error': 'Nom d\'utilisateur ou email déjà utilisé'}), 400
     
-    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-    
-    cursor.execute(
-        'INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)',
-        (username, email, password_hash)
-    )
-    
-    user_id = cursor.lastrowid
-    conn.commit()
-    
-    token = jwt.encode({
-        'user_id': user_id,
-        'username': username,
-        'exp': datetime.utcnow() + timedelta(seconds=app.config['JWT_ACCESS_TOKEN_EXPIRES'])
-    }, app.config['SECRET_KEY'])
+    password_hash = password_hasher.hash(password)
     
-    cursor.close()
-    conn.close()
+    user_id = run_plan(user_repository.create_user(username, email, password_hash))
+    get_db_connection().commit()
+    user = {'id': user_id, 'username': username, 'email': email}
+    principal_cache.set(user_id, user)
     
     return jsonify({
         'message': 'Utilisateur créé avec succès',
-        'token': token,
-        'user': {
-            'id': user_id,
-            'username': username,
-            'email': email
-        }
+        'token': issue_token(user, app.config['SECRET_KEY'], app.config['JWT_ACCESS_TOKEN_EXPIRES']),
+        'user': public_user(user)
     }), 201
 
 @app.route('/api/login', methods=['POST'])
+@ip_rate_limited
 def login():
     data = request.json
     
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Nom d\'utilisateur et mot de passe requis'}), 400
     
-    username = data['username']
-    password = data['password']
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    user = run_plan(user_repository.find_for_login(data['username']))
     
-    cursor.execute('SELECT id, username, email, password_hash FROM users WHERE username = %s', (username,))
-    user = cursor.fetchone()
-    
-    if not user or not bcrypt.check_password_hash(user['password_hash'], password):
-        cursor.close()
-        conn.close()
+    if not user or not password_hasher.check(user['password_hash'], data['password']):
         return jsonify({'error': 'Identifiants incorrects'}), 401
     
-    token = jwt.encode({
-        'user_id': user['id'],
-        'username': user['username'],
-        'exp': datetime.utcnow() + timedelta(seconds=app.config['JWT_ACCESS_TOKEN_EXPIRES'])
-    }, app.config['SECRET_KEY'])
+    # Hash calculé avec un ancien coût : remplacé maintenant que le mot de passe est connu
+    new_hash = password_hasher.upgrade(user['password_hash'], data['password'])
+    if new_hash:
+        run_plan(user_repository.update_password_hash(user['id'], new_hash))
+        get_db_connection().commit()
     
-    cursor.close()
-    conn.close()
+    principal_cache.set(user['id'], public_user(user))
     
     return jsonify({
         'message': 'Connexion réussie',
-        'token': token,
-        'user': {
-            'id': user['id'],
-            'username': user['username'],
-            'email': user['email']
-        }
+        'token': issue_token(user, app.config['SECRET_KEY'], app.config['JWT_ACCESS_TOKEN_EXPIRES']),
+        'user': public_user(user)
     })
 
 @app.route('/api/profile', methods=['GET'])
 @token_required
+@etag_from_data_version(profile_part)
 def get_profile(current_user):
-    return jsonify({
-        'id': current_user['id'],
-        'username': current_user['username'],
-        'email': current_user['email']
-    })
+    return jsonify(public_user(current_user))
+
+# ============================================
+# LISTE DES TÂCHES : TRI ET PAGINATION PAR CURSEUR
+# ============================================
+
+def stream_tasks(cursor):
+    """Génère le tableau JSON au fil de la lecture d'un curseur déjà exécuté"""
+    try:
+        yield b'['
+        first = True
+        while True:
+            rows = cursor.fetchmany(TASKS_STREAM_BATCH)
+            if not rows:
+                break
+            # Un lot entier par morceau : les lignes sont déjà au format de serialize_task
+            chunk = dumps(rows)[1:-1]
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']'
+    finally:
+        try:
+            cursor.close()
+        except storage.Error:
+            # Lecture interrompue : la connexion sera écartée par le pool
+            pass
 
 # ============================================
 # ROUTES POUR LES TÂCHES AVEC DATE DE DÉBUT
@@ -268,335 +379,360 @@ def get_profile(current_user):
 
 @app.route('/api/tasks', methods=['GET'])
 @token_required
+@etag_from_data_version()
 def get_tasks(current_user):
-    status = request.args.get('status', 'all')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if status == 'all':
-        # Toutes les tâches
-        cursor.execute('''
-            SELECT * FROM tasks 
-            WHERE user_id = %s 
-            ORDER BY 
-                CASE status
-                    WHEN 'todo' THEN 1
-                    WHEN 'in_progress' THEN 2
-                    WHEN 'done' THEN 3
-                END,
-                createdAt DESC
-        ''', (current_user['id'],))
-    
-    elif status == 'todo':
-        # Tâches à faire : tri par date de début la plus proche
-        # Les tâches sans date (NULL) viennent en dernier
-        cursor.execute('''
-            SELECT * FROM tasks 
-            WHERE user_id = %s AND status = 'todo'
-            ORDER BY 
-                CASE 
-                    WHEN start_date IS NULL THEN 1
-                    ELSE 0
-                END,
-                start_date ASC,
-                createdAt ASC
-        ''', (current_user['id'],))
-    
-    elif status == 'in_progress':
-        # Tâches en cours : tri par date de début
-        cursor.execute('''
-            SELECT * FROM tasks 
-            WHERE user_id = %s AND status = 'in_progress'
-            ORDER BY 
-                CASE 
-                    WHEN start_date IS NULL THEN 1
-                    ELSE 0
-                END,
-                start_date ASC,
-                createdAt ASC
-        ''', (current_user['id'],))
-    
-    elif status == 'done':
-        # Tâches terminées : tri chronologique inverse
-        cursor.execute('''
-            SELECT * FROM tasks 
-            WHERE user_id = %s AND status = 'done'
-            ORDER BY createdAt DESC
-        ''', (current_user['id'],))
-    
-    else:
-        cursor.close()
-        conn.close()
-        return jsonify({'error': 'Status invalide. Valeurs acceptées: all, todo, in_progress, done'}), 400
-    
-    tasks = cursor.fetchall()
-    
-    # Convertir les dates en format ISO pour le JSON
-    for task in tasks:
-        if task['start_date']:
-            task['start_date'] = task['start_date'].isoformat()
-        if task['createdAt']:
-            task['createdAt'] = task['createdAt'].isoformat()
-    
-    cursor.close()
-    conn.close()
-    
-    return jsonify(tasks)
+    """Liste des tâches d'une colonne.
+
+    Paramètres optionnels :
+    - order=position : ordre manuel du tableau (défaut : date, voir TASK_ORDERINGS) ;
+    - limit / cursor : pagination par curseur, le curseur de la page suivante
+      est renvoyé dans l'en-tête X-Next-Cursor ;
+    - stream=1 : envoie les tâches au fil de la lecture, sans tout charger en
+      mémoire (limit sert alors de plafond, sans en-tête X-Next-Cursor).
+    """
+    status, order, after, limit, stream = parse_list_params(request.args)
+    
+    if stream:
+        # Curseur non bufferisé : les lignes sont lues par lots au fil de l'envoi
+        cursor = timed_cursor(get_db_connection().cursor(dictionary=True))
+        cursor.execute(*build_tasks_query(current_user['id'], status, after, limit, order))
+        return Response(stream_with_context(stream_tasks(cursor)),
+                        mimetype='application/json')
+    
+    if after is None and limit is None:
+        # Liste complète : servie par le cache tant que data_version n'a pas changé
+        payload = listing_cache.get_or_load(
+            current_user['id'], tasks_variant(status, order), g.data_version,
+            lambda: dumps(run_plan(task_repository.list_tasks(current_user['id'], status, order=order))))
+        return app.response_class(payload, mimetype='application/json')
+    
+    # Une ligne de plus que la page pour savoir s'il existe une page suivante
+    rows = run_plan(task_repository.list_tasks(current_user['id'], status, after,
+                                               limit + 1 if limit is not None else None, order))
+    
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(status, rows[-1], order)
+    
+    # Les lignes (TASK_COLUMNS) ont déjà la forme de serialize_task : sérialisées telles quelles
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/api/tasks', methods=['POST'])
 @token_required
 def create_task(current_user):
-    data = request.json
-    
-    if not data or 'title' not in data:
-        return jsonify({'error': 'Le titre est requis'}), 400
+    title, status, start_date = parse_new_task(request.json)
     
-    # Valider et parser la date de début
-    start_date = validate_date(data.get('start_date'))
+    delta = TaskCounterDelta()
+    task = run_plan(task_repository.create_task(current_user['id'], title, status, start_date, delta))
+    get_db_connection().commit()
+    listing_cache.invalidate(current_user['id'], delta)
+    task = serialize_task(task)
+    task_events.publish(current_user['id'], 'created', {'task': task}, delta.version)
     
-    # Si la date est invalide, on peut soit rejeter soit utiliser None
-    if data.get('start_date') and not start_date:
-        return jsonify({'error': 'Format de date invalide. Utilisez YYYY-MM-DD'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Statut par défaut: 'todo'
-    status = data.get('status', 'todo')
-    if status not in ['todo', 'in_progress', 'done']:
-        status = 'todo'
-    
-    # Construire la requête en fonction de la présence de la date
-    if start_date:
-        cursor.execute(
-            'INSERT INTO tasks (user_id, title, status, start_date) VALUES (%s, %s, %s, %s)',
-            (current_user['id'], data['title'], status, start_date)
-        )
-    else:
-        cursor.execute(
-            'INSERT INTO tasks (user_id, title, status) VALUES (%s, %s, %s)',
-            (current_user['id'], data['title'], status)
-        )
-    
-    conn.commit()
-    task_id = cursor.lastrowid
-    
-    cursor.execute('SELECT * FROM tasks WHERE id = %s', (task_id,))
-    task = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    # Formater la réponse
-    response = {
-        'id': task[0],
-        'user_id': task[1],
-        'title': task[2],
-        'status': task[3],
-        'start_date': task[4].isoformat() if task[4] else None,
-        'createdAt': task[5].isoformat() if task[5] else None
-    }
-    
-    return jsonify(response), 201
+    return jsonify(task), 201
 
 @app.route('/api/tasks/<int:task_id>/status', methods=['PUT'])
 @token_required
 def update_task_status(current_user, task_id):
-    """Mettre à jour uniquement le status d'une tâche"""
-    data = request.json
-    
-    if not data or 'status' not in data:
-        return jsonify({'error': 'Le status est requis'}), 400
-    
-    if data['status'] not in ['todo', 'in_progress', 'done']:
-        return jsonify({'error': 'Status invalide. Valeurs acceptées: todo, in_progress, done'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Changer le status d'une tâche et/ou sa place dans la colonne.
+
+    Corps : {"status", "after_id" ou "before_id" optionnel}. Seule la ligne de
+    la tâche est réécrite (nouvelle clé de position entre ses voisines).
+    """
+    status, after_id, before_id = parse_status_change(request.json)
     
-    # Vérifier que la tâche appartient à l'utilisateur
-    cursor.execute('SELECT id FROM tasks WHERE id = %s AND user_id = %s', 
-                  (task_id, current_user['id']))
-    if not cursor.fetchone():
-        cursor.close()
-        conn.close()
+    delta = TaskCounterDelta()
+    try:
+        task, renumbered = run_plan(task_repository.move_task(current_user['id'], task_id, status,
+                                                              after_id, before_id, delta))
+    except task_repository.PlacementError as e:
+        raise ApiError(str(e), 409)
+    if task is None:
         return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
+    get_db_connection().commit()
+    listing_cache.invalidate(current_user['id'], delta)
+    task = serialize_task(task)
+    if renumbered:
+        # Colonne renumérotée : les clients rechargent leur liste
+        task_events.publish(current_user['id'], 'reset', {}, delta.version)
+    else:
+        task_events.publish(current_user['id'], 'status_changed', {'task': task}, delta.version)
     
-    # Mettre à jour le status
-    cursor.execute(
-        'UPDATE tasks SET status = %s WHERE id = %s AND user_id = %s',
-        (data['status'], task_id, current_user['id'])
-    )
-    
-    conn.commit()
-    
-    # Récupérer la tâche mise à jour
-    cursor.execute('SELECT * FROM tasks WHERE id = %s', (task_id,))
-    task = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    return jsonify({
-        'id': task[0],
-        'user_id': task[1],
-        'title': task[2],
-        'status': task[3],
-        'start_date': task[4].isoformat() if task[4] else None,
-        'createdAt': task[5].isoformat() if task[5] else None
-    })
+    return jsonify(task)
 
 @app.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @token_required
 def update_task(current_user, task_id):
     """Mettre à jour le titre et/ou la date de début d'une tâche"""
-    data = request.json
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    fields = parse_task_update(request.json)
     
-    # Vérifier que la tâche appartient à l'utilisateur
-    cursor.execute('SELECT id FROM tasks WHERE id = %s AND user_id = %s', 
-                  (task_id, current_user['id']))
-    if not cursor.fetchone():
-        cursor.close()
-        conn.close()
+    delta = TaskCounterDelta()
+    task = run_plan(task_repository.update_task(current_user['id'], task_id, fields, delta))
+    if task is None:
         return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
+    get_db_connection().commit()
+    listing_cache.invalidate(current_user['id'], delta)
+    task = serialize_task(task)
+    task_events.publish(current_user['id'], 'updated', {'task': task}, delta.version)
     
-    updates = []
-    values = []
-    
-    if 'title' in data:
-        updates.append('title = %s')
-        values.append(data['title'])
-    
-    if 'status' in data:
-        if data['status'] in ['todo', 'in_progress', 'done']:
-            updates.append('status = %s')
-            values.append(data['status'])
-    
-    # Gérer la date de début
-    if 'start_date' in data:
-        start_date = validate_date(data['start_date'])
-        if start_date:
-            updates.append('start_date = %s')
-            values.append(start_date)
-        elif data['start_date'] is None:
-            # Permettre de supprimer la date
-            updates.append('start_date = NULL')
-        else:
-            cursor.close()
-            conn.close()
-            return jsonify({'error': 'Format de date invalide. Utilisez YYYY-MM-DD'}), 400
-    
-    if not updates:
-        cursor.close()
-        conn.close()
-        return jsonify({'error': 'Aucun champ à mettre à jour'}), 400
-    
-    values.append(task_id)
-    values.append(current_user['id'])
-    query = f'UPDATE tasks SET {", ".join(updates)} WHERE id = %s AND user_id = %s'
-    
-    cursor.execute(query, values)
-    conn.commit()
-    
-    cursor.execute('SELECT * FROM tasks WHERE id = %s', (task_id,))
-    task = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    return jsonify({
-        'id': task[0],
-        'user_id': task[1],
-        'title': task[2],
-        'status': task[3],
-        'start_date': task[4].isoformat() if task[4] else None,
-        'createdAt': task[5].isoformat() if task[5] else None
-    })
+    return jsonify(task)
 
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 @token_required
 def delete_task(current_user, task_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id FROM tasks WHERE id = %s AND user_id = %s', (task_id, current_user['id']))
-    if not cursor.fetchone():
-        cursor.close()
-        conn.close()
+    delta = TaskCounterDelta()
+    if not run_plan(task_repository.delete_task(current_user['id'], task_id, delta)):
         return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
-    
-    cursor.execute('DELETE FROM tasks WHERE id = %s AND user_id = %s', (task_id, current_user['id']))
-    conn.commit()
-    
-    cursor.close()
-    conn.close()
+    get_db_connection().commit()
+    listing_cache.invalidate(current_user['id'], delta)
+    task_events.publish(current_user['id'], 'deleted', {'id': task_id}, delta.version)
     
     return jsonify({'message': 'Tâche supprimée avec succès'})
 
+# ============================================
+# FLUX DES MODIFICATIONS (SERVER-SENT EVENTS)
+# ============================================
+
+# Hub des événements de tâches de ce processus (EVENTS_* , voir events.py). Un
+# flux occupe un thread du worker, prévu par launcher.py en plus de l'admission
+task_events = EventHub.from_env(max_streams=WSGI_MAX_STREAMS)
+
+@app.route('/api/tasks/stream/token', methods=['POST'])
+@token_required
+def issue_task_stream_token(current_user):
+    """Jeton de courte durée (STREAM_TOKEN_EXPIRES s) pour ouvrir GET /api/tasks/stream.
+
+    Le jeton voyage dans l'URL du flux (journaux d'accès, historique) : il
+    n'est accepté que par cette route et n'est vérifié qu'à l'ouverture.
+    """
+    token = issue_token(current_user, app.config['SECRET_KEY'], STREAM_TOKEN_EXPIRES, STREAM_TOKEN_SCOPE)
+    return jsonify({'token': token, 'expires_in': STREAM_TOKEN_EXPIRES})
+
+@app.route('/api/tasks/stream', methods=['GET'])
+@admission_exempt
+@token_required
+@token_in_query
+def task_events_stream(current_user):
+    """Événements created / updated / status_changed / deleted des tâches de l'utilisateur.
+
+    Un client qui se reconnecte avec l'en-tête Last-Event-ID (ou ?last_event_id=)
+    reçoit les événements manqués, ou un événement reset s'il doit tout recharger.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    # Point de départ de la scrutation des écritures servies par les autres workers
+    version = run_plan(read_data_version(current_user['id']))
+    subscription, replay = task_events.subscribe(current_user['id'], version, last_event_id)
+    task_events.start_poller(run_detached_plan)
+    
+    # La connexion MySQL n'est pas gardée pendant toute la durée du flux
+    release_db_connection()
+    
+    response = Response(stream_with_context(task_events.stream(subscription, replay)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ============================================
+# MODIFICATIONS PAR LOT
+# ============================================
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@token_required
+def batch_tasks(current_user):
+    """Applique une liste d'opérations (create, update, status, delete) en une transaction.
+
+    Corps : {"operations": [{"op": "create", "title": ...}, {"op": "status", "id": 1,
+    "status": "done"}, ...], "atomic": true}. En mode atomique (défaut), une seule
+    opération invalide fait rejeter tout le lot; sinon les opérations valides sont
+    appliquées et chaque résultat indique son propre code.
+    """
+    atomic, valid, results = parse_batch(request.json)
+    
+    if atomic and results:
+        body, code = batch_response(atomic, results)
+        return jsonify(body), code
+    
+    delta = TaskCounterDelta()
+    if valid:
+        results.update(run_plan(task_repository.apply_batch(current_user['id'], valid, delta)))
+    
+    body, code = batch_response(atomic, results)
+    if code != 200:
+        get_db_connection().rollback()
+    else:
+        get_db_connection().commit()
+        listing_cache.invalidate(current_user['id'], delta)
+        task_events.publish_batch(current_user['id'], results, delta.version)
+    
+    return jsonify(body), code
+
+# ============================================
+# SYNCHRONISATION PAR DELTA
+# ============================================
+
+@app.route('/api/tasks/changes', methods=['GET'])
+@token_required
+@etag_from_data_version()
+def get_task_changes(current_user):
+    """Tâches créées / modifiées / supprimées depuis le curseur ``since``.
+
+    Sans ``since`` : toutes les tâches (synchronisation initiale). Le curseur
+    renvoyé sert d'appel suivant ; ``has_more`` indique une page suivante. Un
+    curseur plus ancien que la rétention des suppressions reçoit une 410.
+    """
+    after, limit = parse_changes_params(request.args)
+    check_sync_horizon(after, run_plan(task_repository.read_sync_horizon(current_user['id'])))
+    
+    rows = run_plan(task_repository.list_changes(current_user['id'], after, limit + 1))
+    return jsonify(changes_body(rows, limit, request.args.get('since')))
+
+@app.route('/api/tasks/search', methods=['GET'])
+@token_required
+@etag_from_data_version()
+def search_tasks(current_user):
+    """Recherche dans les titres des tâches (index FULLTEXT).
+
+    Paramètres :
+    - q : mots recherchés, tous requis, chacun en préfixe (« rap » trouve « rapport ») ;
+    - status, from / to : filtres sur la colonne et la date de début (bornes incluses) ;
+    - order : relevance (défaut) ou date (création, plus récentes d'abord) ;
+    - limit / cursor : pagination par curseur (en-tête X-Next-Cursor).
+    """
+    params = parse_search_params(request.args)
+    limit = params.pop('limit')
+    rows = run_plan(task_repository.search_tasks(current_user['id'], limit=limit + 1, **params))
+    rows, next_cursor = search_page(rows, params['order'], limit)
+    
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/tasks/archive', methods=['GET'])
+@token_required
+@etag_from_data_version()
+def get_archived_tasks(current_user):
+    """Tâches terminées archivées (python manage.py archive), plus récentes d'abord.
+
+    Pagination par curseur : limit / cursor, curseur de la page suivante dans
+    l'en-tête X-Next-Cursor. Chaque tâche porte en plus sa date d'archivage (archivedAt).
+    """
+    after, limit = parse_archive_params(request.args)
+    rows = run_plan(task_repository.list_archive(current_user['id'], after, limit + 1))
+    rows, next_cursor = archive_page(rows, limit)
+    
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# ============================================
+# IMPORT / EXPORT EN MASSE
+# ============================================
+
+def export_tasks_stream(cursor, fmt):
+    """Génère le fichier exporté au fil de la lecture d'un curseur déjà exécuté"""
+    try:
+        yield export_header(fmt)
+        while True:
+            rows = cursor.fetchmany(TASKS_STREAM_BATCH)
+            if not rows:
+                break
+            yield export_chunk(rows, fmt)
+    finally:
+        try:
+            cursor.close()
+        except storage.Error:
+            pass
+
+@app.route('/api/tasks/export', methods=['GET'])
+@token_required
+@etag_from_data_version()
+def export_tasks(current_user):
+    """Export des tâches d'une colonne (status, défaut all) en NDJSON (défaut) ou CSV (format=csv).
+
+    Les lignes sont envoyées au fil de la lecture d'un curseur non bufferisé :
+    la mémoire utilisée ne dépend pas du nombre de tâches.
+    """
+    status, fmt = parse_export_params(request.args)
+    cursor = timed_cursor(get_db_connection().cursor(dictionary=True))
+    cursor.execute(*build_tasks_query(current_user['id'], status))
+    return Response(stream_with_context(export_tasks_stream(cursor, fmt)),
+                    mimetype=EXPORT_FORMATS[fmt], headers=export_headers(status, fmt))
+
+def insert_import_chunk(user_id, tasks):
+    """Insère un morceau de l'import dans sa propre transaction"""
+    delta = TaskCounterDelta()
+    count = run_plan(task_repository.import_tasks(user_id, tasks, delta))
+    get_db_connection().commit()
+    listing_cache.invalidate(user_id, delta)
+    task_events.record_local_version(user_id, delta.version)
+    return count
+
+def import_tasks_stream(user_id, parser, outcomes):
+    """Lit la suite du corps, insère les tâches valides par morceaux et génère les événements"""
+    pending, imported, reading = [], 0, True
+    while True:
+        for line, task, error in outcomes:
+            if error:
+                yield import_event('error', line=line, error=error)
+                continue
+            pending.append(task)
+            if len(pending) == IMPORT_CHUNK_SIZE:
+                imported += insert_import_chunk(user_id, pending)
+                pending = []
+                yield import_event('progress', line=line, imported=imported)
+        if not reading:
+            break
+        data = request.stream.read(IMPORT_READ_SIZE)
+        reading = bool(data)
+        try:
+            outcomes = parser.feed(data) if data else parser.close()
+        except ApiError as e:
+            # En-tête CSV plus long que le premier morceau lu
+            yield import_event('error', line=parser.line, error=e.message)
+            outcomes, reading = [], False
+    
+    if pending:
+        imported += insert_import_chunk(user_id, pending)
+        yield import_event('progress', line=parser.line, imported=imported)
+    if imported:
+        # Trop de tâches pour un événement chacune : les clients rechargent leur liste
+        task_events.publish(user_id, 'reset', {})
+    yield import_event('done', imported=imported, failed=parser.failed, lines=parser.line)
+
+@app.route('/api/tasks/import', methods=['POST'])
+@token_required
+def import_tasks(current_user):
+    """Import en masse : corps NDJSON (une tâche par ligne) ou CSV (en-tête title[,status][,start_date]).
+
+    Le corps est lu et validé au fil de l'eau ; les tâches valides sont insérées
+    par morceaux de IMPORT_CHUNK_SIZE, chacun dans sa transaction. La réponse est
+    un flux NDJSON : {"type": "error", "line", "error"} par ligne rejetée,
+    {"type": "progress", "line", "imported"} après chaque morceau enregistré
+    (toutes les tâches valides jusqu'à cette ligne), puis
+    {"type": "done", "imported", "failed", "lines"}.
+    """
+    fmt = parse_import_format(request.mimetype, request.args)
+    parser = TaskImportParser(fmt)
+    # Premier morceau lu avant la réponse : un en-tête CSV invalide reçoit une 400
+    data = request.stream.read(IMPORT_READ_SIZE)
+    outcomes = parser.feed(data) if data else parser.close()
+    return Response(stream_with_context(import_tasks_stream(current_user['id'], parser, outcomes)),
+                    mimetype='application/x-ndjson')
+
 @app.route('/api/tasks/stats', methods=['GET'])
 @token_required
+@etag_from_data_version(today_part)
 def get_task_stats(current_user):
-    """Récupérer les statistiques des tâches"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Nombre de tâches par status
-    cursor.execute('''
-        SELECT 
-            status,
-            COUNT(*) as count
-        FROM tasks 
-        WHERE user_id = %s 
-        GROUP BY status
-    ''', (current_user['id'],))
-    
-    stats = cursor.fetchall()
-    
-    # Tâches en retard (date de début dépassée et status != 'done')
-    cursor.execute('''
-        SELECT COUNT(*) as overdue_count
-        FROM tasks 
-        WHERE user_id = %s 
-        AND status != 'done'
-        AND start_date IS NOT NULL
-        AND start_date < CURDATE()
-    ''', (current_user['id'],))
-    
-    overdue = cursor.fetchone()
-    
-    # Tâches pour aujourd'hui
-    cursor.execute('''
-        SELECT COUNT(*) as today_count
-        FROM tasks 
-        WHERE user_id = %s 
-        AND status != 'done'
-        AND start_date = CURDATE()
-    ''', (current_user['id'],))
-    
-    today = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    # Formatage des résultats
-    result = {
-        'todo': 0,
-        'in_progress': 0,
-        'done': 0,
-        'total': 0,
-        'overdue': overdue['overdue_count'] if overdue else 0,
-        'today': today['today_count'] if today else 0
-    }
-    
-    for stat in stats:
-        result[stat['status']] = stat['count']
-        result['total'] += stat['count']
-    
-    return jsonify(result)
+    """Récupérer les statistiques des tâches (compteurs matérialisés, voir counters.py)"""
+    return jsonify(run_plan(read_stats(current_user['id'])))
 
 # ============================================
 # ROUTES UTILES
@@ -604,75 +740,90 @@ def get_task_stats(current_user):
 
 @app.route('/api/tasks/upcoming', methods=['GET'])
 @token_required
+@etag_from_data_version(today_part)
 def get_upcoming_tasks(current_user):
     """Récupérer les tâches à venir (prochains 7 jours)"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    cursor.execute('''
-        SELECT * FROM tasks 
-        WHERE user_id = %s 
-        AND status != 'done'
-        AND start_date IS NOT NULL
-        AND start_date >= CURDATE()
-        AND start_date <= DATE_ADD(CURDATE(), INTERVAL 7 DAY)
-        ORDER BY start_date ASC, createdAt ASC
-    ''', (current_user['id'],))
-    
-    tasks = cursor.fetchall()
-    
-    # Convertir les dates en format ISO
-    for task in tasks:
-        if task['start_date']:
-            task['start_date'] = task['start_date'].isoformat()
-        if task['createdAt']:
-            task['createdAt'] = task['createdAt'].isoformat()
-    
-    cursor.close()
-    conn.close()
-    
-    return jsonify(tasks)
+    payload = listing_cache.get_or_load(
+        current_user['id'], upcoming_variant(UPCOMING_DAYS), g.data_version,
+        lambda: dumps(run_plan(task_repository.fetch_upcoming(current_user['id'], UPCOMING_DAYS))))
+    return app.response_class(payload, mimetype='application/json')
+
+@app.route('/api/tasks/calendar', methods=['GET'])
+@token_required
+@etag_from_data_version()
+def get_task_calendar(current_user):
+    """Nombre de tâches par status pour chaque jour ou semaine de [from, to] (date de début).
+
+    ?bucket=day|week (défaut day) ; ?tasks=N ajoute les N premières tâches de chaque groupe.
+    """
+    start, end, bucket, tasks_per_bucket = parse_calendar_params(request.args)
+
+    def load():
+        buckets = run_plan(task_repository.read_calendar(current_user['id'], start, end, bucket, tasks_per_bucket))
+        return dumps({'from': start, 'to': end, 'bucket': bucket, 'buckets': buckets})
+
+    payload = listing_cache.get_or_load(
+        current_user['id'], calendar_variant(start, end, bucket, tasks_per_bucket), g.data_version, load)
+    return app.response_class(payload, mimetype='application/json')
 
 # ============================================
 # ROUTES DE TEST ET SANTÉ
 # ============================================
 
 @app.route('/api/health', methods=['GET'])
+@admission_exempt
 def health_check():
     """Route de vérification de santé"""
     return jsonify({
         'status': 'OK', 
         'message': 'API Flask avec date de début pour les tâches',
         'timestamp': datetime.now().isoformat(),
-        'today': date.today().isoformat()
+        'today': date.today().isoformat(),
+        'password_hasher': password_hasher.stats(),
+        'listing_cache': listing_cache.stats()
     })
 
+request_metrics.register_gauges('db_pool', 'Pool de connexions à la base', db_pool.stats)
+request_metrics.register_gauges('password_hasher', 'File de hachage bcrypt', password_hasher.stats)
+request_metrics.register_gauges('auth_cache', 'Cache des utilisateurs authentifiés', principal_cache.stats)
+request_metrics.register_gauges('listing_cache', 'Cache des listes de tâches', listing_cache.stats)
+request_metrics.register_gauges('task_events', 'Flux SSE des tâches', task_events.stats)
+request_metrics.register_gauges('rate_limit_user', 'Limite de débit par utilisateur', user_rate_limiter.stats)
+request_metrics.register_gauges('rate_limit_ip', 'Limite de débit par IP (inscription, connexion)',
+                                ip_rate_limiter.stats)
+request_metrics.register_gauges('admission', 'Requêtes admises, en attente et refusées', admission_gate.stats)
+
+@app.route('/api/metrics', methods=['GET'])
+@admission_exempt
+def metrics():
+    """Métriques du processus au format texte Prometheus (voir metrics.py)"""
+    return Response(request_metrics.render(), content_type=request_metrics.content_type)
+
+# Attente max (s) d'une connexion pour /api/ready, plus courte que DB_POOL_TIMEOUT
+READY_DB_TIMEOUT = float(os.getenv('READY_DB_TIMEOUT', 1))
+
+@app.route('/api/live', methods=['GET'])
+@admission_exempt
+def liveness():
+    """Le processus répond (sans toucher à la base) : sinon il faut le redémarrer"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/ready', methods=['GET'])
+@admission_exempt
+def readiness():
+    """Le worker peut servir du trafic : la base répond depuis ce processus"""
+    try:
+        cursor = get_db_connection(READY_DB_TIMEOUT).cursor()
+        cursor.execute('SELECT 1')
+        cursor.fetchall()
+        cursor.close()
+    except (PoolExhaustedError, storage.Error) as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready', 'db_pool': db_pool.stats()})
+
 @app.route('/', methods=['GET'])
 def index():
-    return jsonify({
-        'API Status': 'API Flask avec authentification JWT et date de début pour les tâches',
-        'version': '3.0',
-        'features': [
-            'Authentification JWT',
-            '3 colonnes Kanban (To Do, In Progress, Done)',
-            'Date de début pour chaque tâche',
-            'Tri par date de début dans To Do et In Progress',
-            'Tri chronologique inverse dans Done',
-            'Drag & drop entre colonnes'
-        ],
-        'endpoints': {
-            'auth': ['POST /api/register', 'POST /api/login', 'GET /api/profile'],
-            'tasks': [
-                'GET /api/tasks?status=all|todo|in_progress|done',
-                'POST /api/tasks (avec start_date optionnel)',
-                'PUT /api/tasks/{id}',
-                'PUT /api/tasks/{id}/status',
-                'DELETE /api/tasks/{id}',
-                'GET /api/tasks/stats',
-                'GET /api/tasks/upcoming'
-            ]
-        }
-    })
+    return jsonify(api_index('Flask'))
 
 # ============================================
 # POINT D'ENTRÉE PRINCIPAL
@@ -685,10 +836,11 @@ if __name__ == '__main__':
     # Initialiser la base de données
     if initialize_database():
         print("✅ Base de données prête")
+        db_pool.warmup()
         print("📊 Structure: users, tasks(status, start_date)")
         print("📅 Tri: To Do → par start_date ASC, Done → par createdAt DESC")
-        print("🌐 Démarrage du serveur Flask...")
+        print("🌐 Démarrage du serveur Flask (développement, voir launcher.py pour la production)...")
         print("=" * 60)
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG', 'true').lower() in ('1', 'true'))
     else:
         print("❌ Échec de l'initialisation de la base de données")
\ No newline at end of file
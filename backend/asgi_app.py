@@ -0,0 +1,849 @@
+"""Mode de service asynchrone (ASGI) : mêmes routes et mêmes contrats JSON que app.py.
+
+Quart sur une boucle asyncio avec aiomysql : une attente MySQL ne bloque plus
+un worker, un seul processus garde des centaines de requêtes en vol. Le SQL
+est celui des plans de task_repository.py / user_repository.py / counters.py,
+exécutés par ``execute_plan_async`` ; bcrypt tourne dans le pool de passwords.py.
+
+Démarrage :
+    python asgi_app.py
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Uniquement avec STORAGE_BACKEND=mysql (voir storage.py) : le moteur SQLite
+n'a pas de pilote asyncio, il est servi par app.py.
+"""
+import asyncio
+import os
+from datetime import date, datetime
+from functools import wraps
+
+import aiomysql
+import jwt
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+
+from api_common import (ApiError, TASKS_STREAM_BATCH, STREAM_TOKEN_EXPIRES, STREAM_TOKEN_SCOPE, issue_token,
+                        check_token_scope, bearer_token, principal_from_claims,
+                        public_user, api_index, data_version_etag, today_part, profile_part,
+                        parse_list_params, parse_new_task, parse_status_change, parse_task_update,
+                        parse_batch, batch_response, parse_changes_params, check_sync_horizon,
+                        parse_search_params, search_page, parse_archive_params, archive_page,
+                        parse_calendar_params, changes_body, UPCOMING_DAYS)
+from auth_cache import PrincipalCache
+from cache import ListingCache, calendar_variant, tasks_variant, upcoming_variant
+from encoding import COMPRESS_MIN_SIZE, FastJSONProvider, compress, compressible, dumps, negotiate
+from counters import TaskCounterDelta, read_data_version, read_stats
+from admission import ConcurrencyGate, OverloadedError, RateLimitedError, RateLimiter, retry_after_header
+from db_pool import PoolExhaustedError, connection_settings_from_env
+from passwords import PasswordHasher, PasswordHasherBusyError
+from events import EventHub
+from import_export import (EXPORT_FORMATS, IMPORT_CHUNK_SIZE, TaskImportParser, export_chunk, export_header,
+                           export_headers, import_event, parse_export_params, parse_import_format)
+from metrics import RequestMetrics, measure, timed_async_cursor
+from sql_plan import execute_plan_async
+from storage import active_storage
+import task_repository, user_repository
+from task_repository import serialize_task, encode_cursor, build_tasks_query
+
+app = Quart(__name__)
+app.json = FastJSONProvider(app)
+app = cors(app, allow_origin='*', expose_headers=['X-Next-Cursor', 'ETag'])
+
+# Configuration JWT (identique à app.py : les tokens sont valables sur les deux modes)
+app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'default_secret_key_change_in_production')
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))
+app.config['AUTH_TRUST_CLAIMS'] = os.getenv('AUTH_TRUST_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+app.config['DB_QUERY_COUNT_HEADER'] = os.getenv('DB_QUERY_COUNT_HEADER', 'false').lower() in ('1', 'true', 'yes')
+
+if active_storage().name != 'mysql':
+    raise RuntimeError("asgi_app.py ne sert que MySQL (STORAGE_BACKEND=mysql), utiliser app.py")
+
+# Pool aiomysql, créé au démarrage de la boucle (mêmes variables DB_POOL_* que db_pool.py)
+db_pool = None
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+
+@app.before_serving
+async def open_db_pool():
+    global db_pool
+    settings = connection_settings_from_env()
+    db_pool = await aiomysql.create_pool(
+        minsize=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+        maxsize=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        pool_recycle=int(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+        host=settings['host'],
+        port=int(settings['port'] or 3306),
+        user=settings['user'],
+        password=settings['password'],
+        db=settings['database'],
+        autocommit=False,
+    )
+    print(f"✅ Pool aiomysql prêt ({db_pool.size} connexion(s))")
+
+
+@app.after_serving
+async def close_db_pool():
+    db_pool.close()
+    await db_pool.wait_closed()
+    password_hasher.shutdown()
+
+
+async def get_db_connection(timeout=None):
+    """Connexion aiomysql de la requête courante, empruntée au pool"""
+    timeout = DB_POOL_TIMEOUT if timeout is None else timeout
+    if 'db_conn' not in g:
+        try:
+            with measure('db_acquire'):
+                g.db_conn = await asyncio.wait_for(db_pool.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolExhaustedError(f"Aucune connexion MySQL disponible après {timeout}s")
+    return g.db_conn
+
+
+async def release_connection(conn):
+    """Rend une connexion au pool (aiomysql ferme celles laissées en transaction)"""
+    try:
+        await conn.rollback()
+    except Exception:
+        conn.close()
+    await db_pool.release(conn)
+
+
+@app.teardown_appcontext
+async def release_db_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        await release_connection(conn)
+
+
+async def run_plan(plan):
+    """Exécute un plan (voir sql_plan.py) sur la connexion de la requête"""
+    conn = await get_db_connection()
+    async with conn.cursor(aiomysql.DictCursor) as cursor:
+        return await execute_plan_async(plan, timed_async_cursor(cursor))
+
+
+async def run_detached_plan(plan):
+    """Exécute un plan hors requête (tâche de fond) sur sa propre connexion du pool"""
+    conn = await asyncio.wait_for(db_pool.acquire(), DB_POOL_TIMEOUT)
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            return await execute_plan_async(plan, cursor)
+    finally:
+        await release_connection(conn)
+
+
+async def commit():
+    await (await get_db_connection()).commit()
+
+
+# Durées par route et par phase, requêtes lentes (METRICS_*, voir metrics.py)
+request_metrics = RequestMetrics.from_env()
+
+
+@app.before_request
+async def start_request_trace():
+    request_metrics.start()
+
+
+# Limites de débit et de concurrence (voir admission.py et app.py)
+user_rate_limiter = RateLimiter.from_env('RATE_LIMIT_USER', 20, 40)
+ip_rate_limiter = RateLimiter.from_env('RATE_LIMIT_AUTH_IP', 1, 10)
+admission_gate = ConcurrencyGate.from_env()
+
+
+def admission_exempt(f):
+    """Route servie hors de la limite de concurrence. À placer juste sous @app.route."""
+    f.admission_exempt = True
+    return f
+
+
+@app.before_request
+async def admit_request():
+    view = app.view_functions.get(request.endpoint)
+    if not admission_gate.enabled or view is None or getattr(view, 'admission_exempt', False):
+        return
+    with measure('admission'):
+        await admission_gate.enter_async()
+    g.admitted = True
+
+
+@app.teardown_request
+async def release_admission(exception=None):
+    # Réponse en flux : place rendue dès le début de l'envoi (la connexion appartient au flux)
+    if g.pop('admitted', False):
+        admission_gate.leave_async()
+
+
+@app.after_request
+async def record_request_metrics(response):
+    """Exécutée après compress_response (voir app.py)"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    size = response.content_length if isinstance(response.response, response.data_body_class) else None
+    trace = request_metrics.finish(route, request.method, response.status_code, size)
+    if trace is not None and app.config['DB_QUERY_COUNT_HEADER']:
+        response.headers['X-DB-Queries'] = str(trace.queries)
+    return response
+
+
+@app.teardown_request
+async def clear_request_trace(exception=None):
+    request_metrics.clear()
+
+
+@app.after_request
+async def compress_response(response):
+    """Compression négociée des réponses JSON volumineuses (voir app.py)"""
+    if not isinstance(response.response, response.data_body_class):
+        return response
+    if not compressible(response.status_code, response.mimetype, response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    body = await response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@app.errorhandler(ApiError)
+async def handle_api_error(e):
+    return jsonify({'error': e.message}), e.status
+
+
+@app.errorhandler(RateLimitedError)
+async def handle_rate_limited(e):
+    response = jsonify({'error': 'Trop de requêtes, réessayez plus tard'})
+    response.headers['Retry-After'] = retry_after_header(e.retry_after)
+    return response, 429
+
+
+@app.errorhandler(OverloadedError)
+async def handle_overloaded(e):
+    response = jsonify({'error': 'Service temporairement surchargé, réessayez plus tard'})
+    response.headers['Retry-After'] = retry_after_header(e.retry_after)
+    return response, 503
+
+
+@app.errorhandler(PoolExhaustedError)
+@app.errorhandler(PasswordHasherBusyError)
+async def handle_pool_exhausted(e):
+    response = jsonify({'error': 'Service temporairement surchargé, réessayez plus tard'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+# ============================================
+# AUTHENTIFICATION
+# ============================================
+
+# Cache des utilisateurs authentifiés (AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+principal_cache = PrincipalCache.from_env()
+
+# bcrypt dans un pool de processus borné (voir passwords.py)
+password_hasher = PasswordHasher.from_env()
+
+# Listes de tâches déjà sérialisées (TASKS_CACHE_*, voir cache.py)
+listing_cache = ListingCache.from_env()
+
+
+async def load_principal(user_id):
+    """Utilisateur courant depuis le cache, sinon depuis la table users"""
+    current_user = principal_cache.get(user_id)
+    if current_user is not None:
+        return current_user
+
+    current_user = await run_plan(user_repository.find_principal(user_id))
+    if current_user:
+        principal_cache.set(user_id, current_user)
+    return current_user
+
+
+def token_in_query(f):
+    """Accepte aussi un jeton de flux en ?access_token= (EventSource), à placer sous @token_required"""
+    f.allow_query_token = True
+    return f
+
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = bearer_token(request.headers)
+        in_query = not token and getattr(f, 'allow_query_token', False)
+        if in_query:
+            token = request.args.get('access_token')
+        if not token:
+            return jsonify({'error': 'Token manquant'}), 401
+
+        try:
+            with measure('jwt'):
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            check_token_scope(data, in_query)
+            user_rate_limiter.check(data['user_id'])
+
+            current_user = None
+            if app.config['AUTH_TRUST_CLAIMS']:
+                current_user = principal_from_claims(data)
+            if current_user is None:
+                with measure('auth_lookup'):
+                    current_user = await load_principal(data['user_id'])
+
+            if not current_user:
+                return jsonify({'error': 'Utilisateur non trouvé'}), 401
+
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token expiré'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Token invalide'}), 401
+
+        return await f(current_user, *args, **kwargs)
+
+    return decorated
+
+
+def ip_rate_limited(f):
+    """Limite de débit par adresse IP (routes sans token, voir app.py)"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        ip_rate_limiter.check(request.remote_addr)
+        return await f(*args, **kwargs)
+    return decorated
+
+
+def etag_from_data_version(*extra_parts):
+    """Réponses conditionnelles pilotées par data_version (voir app.py)"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(current_user, *args, **kwargs):
+            version = g.data_version = await run_plan(read_data_version(current_user['id']))
+            etag = data_version_etag(f.__name__, request.args.items(multi=True), current_user['id'],
+                                     version, [part(current_user) for part in extra_parts])
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response('', status=304)
+            else:
+                response = await app.make_response(await f(current_user, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+@app.route('/api/register', methods=['POST'])
+@ip_rate_limited
+async def register():
+    data = await request.get_json(silent=True)
+
+    if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Nom d\'utilisateur, email et mot de passe requis'}), 400
+
+    username = data['username']
+    email = data['email']
+    password = data['password']
+
+    if len(password) < 6:
+        return jsonify({'error': 'Le mot de passe doit contenir au moins 6 caractères'}), 400
+
+    if await run_plan(user_repository.is_taken(username, email)):
+        return jsonify({'error': 'Nom d\'utilisateur ou email déjà utilisé'}), 400
+
+    password_hash = await password_hasher.hash_async(password)
+
+    user_id = await run_plan(user_repository.create_user(username, email, password_hash))
+    await commit()
+    user = {'id': user_id, 'username': username, 'email': email}
+    principal_cache.set(user_id, user)
+
+    return jsonify({
+        'message': 'Utilisateur créé avec succès',
+        'token': issue_token(user, app.config['SECRET_KEY'], app.config['JWT_ACCESS_TOKEN_EXPIRES']),
+        'user': public_user(user)
+    }), 201
+
+
+@app.route('/api/login', methods=['POST'])
+@ip_rate_limited
+async def login():
+    data = await request.get_json(silent=True)
+
+    if not data or not data.get('username') or not data.get('password'):
+        return jsonify({'error': 'Nom d\'utilisateur et mot de passe requis'}), 400
+
+    user = await run_plan(user_repository.find_for_login(data['username']))
+
+    if not user or not await password_hasher.check_async(user['password_hash'], data['password']):
+        return jsonify({'error': 'Identifiants incorrects'}), 401
+
+    new_hash = await password_hasher.upgrade_async(user['password_hash'], data['password'])
+    if new_hash:
+        await run_plan(user_repository.update_password_hash(user['id'], new_hash))
+        await commit()
+
+    principal_cache.set(user['id'], public_user(user))
+
+    return jsonify({
+        'message': 'Connexion réussie',
+        'token': issue_token(user, app.config['SECRET_KEY'], app.config['JWT_ACCESS_TOKEN_EXPIRES']),
+        'user': public_user(user)
+    })
+
+
+@app.route('/api/profile', methods=['GET'])
+@token_required
+@etag_from_data_version(profile_part)
+async def get_profile(current_user):
+    return jsonify(public_user(current_user))
+
+
+# ============================================
+# TÂCHES
+# ============================================
+
+async def stream_tasks(conn, cursor):
+    """Génère le tableau JSON au fil de la lecture; la connexion appartient au flux"""
+    try:
+        yield b'['
+        first = True
+        while True:
+            rows = await cursor.fetchmany(TASKS_STREAM_BATCH)
+            if not rows:
+                break
+            chunk = dumps(rows)[1:-1]
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']'
+    finally:
+        try:
+            await cursor.close()
+        except Exception:
+            # Lecture interrompue : la connexion ne retourne pas au pool
+            conn.close()
+        await release_connection(conn)
+
+
+@app.route('/api/tasks', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def get_tasks(current_user):
+    """Liste des tâches d'une colonne (paramètres : voir app.py)"""
+    status, order, after, limit, stream = parse_list_params(request.args)
+
+    if stream:
+        # Curseur non bufferisé; la connexion est rendue par stream_tasks, après l'envoi
+        conn = await get_db_connection()
+        cursor = timed_async_cursor(await conn.cursor(aiomysql.SSDictCursor))
+        await cursor.execute(*build_tasks_query(current_user['id'], status, after, limit, order))
+        g.pop('db_conn')
+        return Response(stream_tasks(conn, cursor), mimetype='application/json')
+
+    if after is None and limit is None:
+        async def load():
+            rows = await run_plan(task_repository.list_tasks(current_user['id'], status, order=order))
+            return dumps(rows)
+
+        payload = await listing_cache.get_or_load_async(current_user['id'], tasks_variant(status, order),
+                                                        g.data_version, load)
+        return Response(payload, mimetype='application/json')
+
+    # Une ligne de plus que la page pour savoir s'il existe une page suivante
+    rows = await run_plan(task_repository.list_tasks(current_user['id'], status, after,
+                                                     limit + 1 if limit is not None else None, order))
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(status, rows[-1], order)
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+@app.route('/api/tasks', methods=['POST'])
+@token_required
+async def create_task(current_user):
+    title, status, start_date = parse_new_task(await request.get_json(silent=True))
+
+    delta = TaskCounterDelta()
+    task = await run_plan(task_repository.create_task(current_user['id'], title, status, start_date, delta))
+    await commit()
+    await listing_cache.invalidate_async(current_user['id'], delta)
+    task = serialize_task(task)
+    task_events.publish(current_user['id'], 'created', {'task': task}, delta.version)
+
+    return jsonify(task), 201
+
+
+@app.route('/api/tasks/<int:task_id>/status', methods=['PUT'])
+@token_required
+async def update_task_status(current_user, task_id):
+    status, after_id, before_id = parse_status_change(await request.get_json(silent=True))
+
+    delta = TaskCounterDelta()
+    try:
+        task, renumbered = await run_plan(task_repository.move_task(current_user['id'], task_id, status,
+                                                                    after_id, before_id, delta))
+    except task_repository.PlacementError as e:
+        raise ApiError(str(e), 409)
+    if task is None:
+        return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
+    await commit()
+    await listing_cache.invalidate_async(current_user['id'], delta)
+    task = serialize_task(task)
+    if renumbered:
+        task_events.publish(current_user['id'], 'reset', {}, delta.version)
+    else:
+        task_events.publish(current_user['id'], 'status_changed', {'task': task}, delta.version)
+
+    return jsonify(task)
+
+
+@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+@token_required
+async def update_task(current_user, task_id):
+    fields = parse_task_update(await request.get_json(silent=True))
+
+    delta = TaskCounterDelta()
+    task = await run_plan(task_repository.update_task(current_user['id'], task_id, fields, delta))
+    if task is None:
+        return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
+    await commit()
+    await listing_cache.invalidate_async(current_user['id'], delta)
+    task = serialize_task(task)
+    task_events.publish(current_user['id'], 'updated', {'task': task}, delta.version)
+
+    return jsonify(task)
+
+
+@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@token_required
+async def delete_task(current_user, task_id):
+    delta = TaskCounterDelta()
+    if not await run_plan(task_repository.delete_task(current_user['id'], task_id, delta)):
+        return jsonify({'error': 'Tâche non trouvée ou non autorisée'}), 404
+    await commit()
+    await listing_cache.invalidate_async(current_user['id'], delta)
+    task_events.publish(current_user['id'], 'deleted', {'id': task_id}, delta.version)
+
+    return jsonify({'message': 'Tâche supprimée avec succès'})
+
+
+# Hub des événements de tâches de ce processus (voir events.py) : un flux ne
+# coûte qu'une tâche asyncio, la limite par défaut est bien plus haute qu'en WSGI
+task_events = EventHub.from_env(max_streams=10000)
+
+
+@app.route('/api/tasks/stream/token', methods=['POST'])
+@token_required
+async def issue_task_stream_token(current_user):
+    """Jeton de courte durée pour ouvrir GET /api/tasks/stream (voir app.py)"""
+    token = issue_token(current_user, app.config['SECRET_KEY'], STREAM_TOKEN_EXPIRES, STREAM_TOKEN_SCOPE)
+    return jsonify({'token': token, 'expires_in': STREAM_TOKEN_EXPIRES})
+
+
+@app.route('/api/tasks/stream', methods=['GET'])
+@admission_exempt
+@token_required
+@token_in_query
+async def task_events_stream(current_user):
+    """Flux SSE des modifications de tâches (voir app.py)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    version = await run_plan(read_data_version(current_user['id']))
+    subscription, replay = task_events.subscribe(current_user['id'], version, last_event_id, asynchronous=True)
+    task_events.start_poller_async(run_detached_plan)
+
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        await release_connection(conn)
+
+    response = Response(task_events.stream_async(subscription, replay), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@token_required
+async def batch_tasks(current_user):
+    """Liste d'opérations en une transaction (format : voir app.py)"""
+    atomic, valid, results = parse_batch(await request.get_json(silent=True))
+
+    if atomic and results:
+        body, code = batch_response(atomic, results)
+        return jsonify(body), code
+
+    delta = TaskCounterDelta()
+    if valid:
+        results.update(await run_plan(task_repository.apply_batch(current_user['id'], valid, delta)))
+
+    body, code = batch_response(atomic, results)
+    if code == 200:
+        await commit()
+        await listing_cache.invalidate_async(current_user['id'], delta)
+        task_events.publish_batch(current_user['id'], results, delta.version)
+    # Sinon le rollback est fait en rendant la connexion au pool
+
+    return jsonify(body), code
+
+
+@app.route('/api/tasks/changes', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def get_task_changes(current_user):
+    """Synchronisation par delta (voir app.py)"""
+    after, limit = parse_changes_params(request.args)
+    check_sync_horizon(after, await run_plan(task_repository.read_sync_horizon(current_user['id'])))
+
+    rows = await run_plan(task_repository.list_changes(current_user['id'], after, limit + 1))
+    return jsonify(changes_body(rows, limit, request.args.get('since')))
+
+
+@app.route('/api/tasks/search', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def search_tasks(current_user):
+    """Recherche dans les titres des tâches (paramètres : voir app.py)"""
+    params = parse_search_params(request.args)
+    limit = params.pop('limit')
+    rows = await run_plan(task_repository.search_tasks(current_user['id'], limit=limit + 1, **params))
+    rows, next_cursor = search_page(rows, params['order'], limit)
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+@app.route('/api/tasks/archive', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def get_archived_tasks(current_user):
+    """Tâches archivées, plus récentes d'abord (paramètres : voir app.py)"""
+    after, limit = parse_archive_params(request.args)
+    rows = await run_plan(task_repository.list_archive(current_user['id'], after, limit + 1))
+    rows, next_cursor = archive_page(rows, limit)
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+# ============================================
+# IMPORT / EXPORT EN MASSE
+# ============================================
+
+async def export_tasks_stream(conn, cursor, fmt):
+    """Génère le fichier exporté au fil de la lecture; la connexion appartient au flux"""
+    try:
+        yield export_header(fmt)
+        while True:
+            rows = await cursor.fetchmany(TASKS_STREAM_BATCH)
+            if not rows:
+                break
+            yield export_chunk(rows, fmt)
+    finally:
+        try:
+            await cursor.close()
+        except Exception:
+            conn.close()
+        await release_connection(conn)
+
+
+@app.route('/api/tasks/export', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def export_tasks(current_user):
+    """Export NDJSON ou CSV des tâches d'une colonne (paramètres : voir app.py)"""
+    status, fmt = parse_export_params(request.args)
+    conn = await get_db_connection()
+    cursor = timed_async_cursor(await conn.cursor(aiomysql.SSDictCursor))
+    await cursor.execute(*build_tasks_query(current_user['id'], status))
+    g.pop('db_conn')
+    return Response(export_tasks_stream(conn, cursor, fmt),
+                    mimetype=EXPORT_FORMATS[fmt], headers=export_headers(status, fmt))
+
+
+async def insert_import_chunk(conn, user_id, tasks):
+    """Insère un morceau de l'import dans sa propre transaction"""
+    delta = TaskCounterDelta()
+    async with conn.cursor(aiomysql.DictCursor) as cursor:
+        count = await execute_plan_async(task_repository.import_tasks(user_id, tasks, delta),
+                                         timed_async_cursor(cursor))
+    await conn.commit()
+    await listing_cache.invalidate_async(user_id, delta)
+    task_events.record_local_version(user_id, delta.version)
+    return count
+
+
+async def import_tasks_stream(conn, user_id, parser, chunks, outcomes):
+    """Lit la suite du corps, insère les tâches valides par morceaux et génère les événements"""
+    try:
+        pending, imported, reading = [], 0, True
+        while True:
+            for line, task, error in outcomes:
+                if error:
+                    yield import_event('error', line=line, error=error)
+                    continue
+                pending.append(task)
+                if len(pending) == IMPORT_CHUNK_SIZE:
+                    imported += await insert_import_chunk(conn, user_id, pending)
+                    pending = []
+                    yield import_event('progress', line=line, imported=imported)
+            if not reading:
+                break
+            data = await anext(chunks, b'')
+            reading = bool(data)
+            try:
+                outcomes = parser.feed(data) if data else parser.close()
+            except ApiError as e:
+                yield import_event('error', line=parser.line, error=e.message)
+                outcomes, reading = [], False
+
+        if pending:
+            imported += await insert_import_chunk(conn, user_id, pending)
+            yield import_event('progress', line=parser.line, imported=imported)
+        if imported:
+            task_events.publish(user_id, 'reset', {})
+        yield import_event('done', imported=imported, failed=parser.failed, lines=parser.line)
+    finally:
+        await release_connection(conn)
+
+
+@app.route('/api/tasks/import', methods=['POST'])
+@token_required
+async def import_tasks(current_user):
+    """Import en masse NDJSON ou CSV, réponse en flux d'événements (voir app.py)"""
+    fmt = parse_import_format(request.mimetype, request.args)
+    parser = TaskImportParser(fmt)
+    chunks = aiter(request.body)
+    data = await anext(chunks, b'')
+    outcomes = parser.feed(data) if data else parser.close()
+    # La connexion suit le flux, rendue par import_tasks_stream
+    conn = await get_db_connection()
+    g.pop('db_conn')
+    return Response(import_tasks_stream(conn, current_user['id'], parser, chunks, outcomes),
+                    mimetype='application/x-ndjson')
+
+
+@app.route('/api/tasks/stats', methods=['GET'])
+@token_required
+@etag_from_data_version(today_part)
+async def get_task_stats(current_user):
+    return jsonify(await run_plan(read_stats(current_user['id'])))
+
+
+@app.route('/api/tasks/upcoming', methods=['GET'])
+@token_required
+@etag_from_data_version(today_part)
+async def get_upcoming_tasks(current_user):
+    async def load():
+        tasks = await run_plan(task_repository.fetch_upcoming(current_user['id'], UPCOMING_DAYS))
+        return dumps(tasks)
+
+    payload = await listing_cache.get_or_load_async(current_user['id'], upcoming_variant(UPCOMING_DAYS),
+                                                    g.data_version, load)
+    return Response(payload, mimetype='application/json')
+
+
+@app.route('/api/tasks/calendar', methods=['GET'])
+@token_required
+@etag_from_data_version()
+async def get_task_calendar(current_user):
+    start, end, bucket, tasks_per_bucket = parse_calendar_params(request.args)
+
+    async def load():
+        buckets = await run_plan(task_repository.read_calendar(current_user['id'], start, end, bucket,
+                                                               tasks_per_bucket))
+        return dumps({'from': start, 'to': end, 'bucket': bucket, 'buckets': buckets})
+
+    payload = await listing_cache.get_or_load_async(
+        current_user['id'], calendar_variant(start, end, bucket, tasks_per_bucket), g.data_version, load)
+    return Response(payload, mimetype='application/json')
+
+
+# ============================================
+# SANTÉ
+# ============================================
+
+@app.route('/api/health', methods=['GET'])
+@admission_exempt
+async def health_check():
+    return jsonify({
+        'status': 'OK',
+        'message': 'API Quart (asyncio) avec date de début pour les tâches',
+        'timestamp': datetime.now().isoformat(),
+        'today': date.today().isoformat(),
+        'password_hasher': password_hasher.stats(),
+        'listing_cache': listing_cache.stats()
+    })
+
+
+def db_pool_stats():
+    if db_pool is None:
+        return {}
+    return {'size': db_pool.size, 'idle': db_pool.freesize, 'max_size': db_pool.maxsize}
+
+
+request_metrics.register_gauges('db_pool', 'Pool de connexions MySQL', db_pool_stats)
+request_metrics.register_gauges('password_hasher', 'File de hachage bcrypt', password_hasher.stats)
+request_metrics.register_gauges('auth_cache', 'Cache des utilisateurs authentifiés', principal_cache.stats)
+request_metrics.register_gauges('listing_cache', 'Cache des listes de tâches', listing_cache.stats)
+request_metrics.register_gauges('task_events', 'Flux SSE des tâches', task_events.stats)
+request_metrics.register_gauges('rate_limit_user', 'Limite de débit par utilisateur', user_rate_limiter.stats)
+request_metrics.register_gauges('rate_limit_ip', 'Limite de débit par IP (inscription, connexion)',
+                                ip_rate_limiter.stats)
+request_metrics.register_gauges('admission', 'Requêtes admises, en attente et refusées', admission_gate.stats)
+
+
+@app.route('/api/metrics', methods=['GET'])
+@admission_exempt
+async def metrics():
+    """Métriques du processus au format texte Prometheus (voir metrics.py)"""
+    return Response(request_metrics.render(), content_type=request_metrics.content_type)
+
+
+READY_DB_TIMEOUT = float(os.getenv('READY_DB_TIMEOUT', 1))
+
+
+@app.route('/api/live', methods=['GET'])
+@admission_exempt
+async def liveness():
+    return jsonify({'status': 'alive'})
+
+
+@app.route('/api/ready', methods=['GET'])
+@admission_exempt
+async def readiness():
+    try:
+        conn = await get_db_connection(READY_DB_TIMEOUT)
+        async with conn.cursor() as cursor:
+            await cursor.execute('SELECT 1')
+            await cursor.fetchall()
+    except (PoolExhaustedError, aiomysql.Error) as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready', 'db_pool': db_pool_stats()})
+
+
+@app.route('/', methods=['GET'])
+async def index():
+    return jsonify(api_index('Quart (asyncio)'))
+
+
+if __name__ == '__main__':
+    import uvicorn
+    from migrate import initialize_database
+
+    print("🚀 Démarrage de l'application en mode asyncio (ASGI)...")
+    if initialize_database():
+        print("🌐 Démarrage du serveur uvicorn...")
+        uvicorn.run(app, host='0.0.0.0', port=5000)
+    else:
+        print("❌ Échec de l'initialisation de la base de données")
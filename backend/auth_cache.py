@@ -0,0 +1,82 @@
+"""Cache en mémoire des utilisateurs authentifiés (LRU + TTL).
+
+token_required consulte ce cache avant de relire la table ``users`` : une
+entrée vit au plus ``ttl`` secondes et le cache ne dépasse jamais ``max_size``
+entrées (la moins récemment utilisée est évincée). Le cache est propre à
+chaque processus ; ``invalidate`` doit être appelé quand un utilisateur est
+modifié ou supprimé.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PrincipalCache:
+    """Cache LRU borné avec expiration, indexé par id utilisateur"""
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit le cache à partir de AUTH_CACHE_SIZE et AUTH_CACHE_TTL"""
+        return cls(
+            max_size=int(os.getenv('AUTH_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('AUTH_CACHE_TTL', 60)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id):
+        """Retourne l'utilisateur en cache ou None (absent ou expiré)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(principal)
+
+    def set(self, user_id, principal):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(principal))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Supprime un utilisateur du cache (modification ou suppression)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
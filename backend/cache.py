@@ -0,0 +1,338 @@
+"""Cache des listes de tâches (GET /api/tasks, /api/tasks/upcoming et /api/tasks/calendar).
+
+Une entrée contient le JSON déjà sérialisé (octets) d'une liste, par utilisateur et par
+variante (``tasks:<status>[:position]``, ``upcoming:<jour>:<jours>``,
+``calendar:<du>:<au>:<groupe>:<tâches>``), avec la
+``data_version`` de l'utilisateur pour laquelle il a été calculé. Une entrée
+n'est servie que si cette version est celle lue par la requête : le cache
+reste donc exact même quand une écriture passe par un autre processus.
+
+Après le commit d'une écriture, ``invalidate`` supprime uniquement les
+variantes touchées (colonnes des anciens et nouveaux status, fenêtres
+« à venir » et calendriers contenant une des dates de début) et fait passer les autres à la
+nouvelle version, ce qui les garde valides.
+
+Deux backends :
+- ``MemoryBackend`` : LRU borné, propre à chaque processus ;
+- ``RedisBackend`` : partagé entre processus, avec n'importe quel client de
+  type redis-py (hget/hset/hkeys/hdel/expire), par exemple ``fakeredis``.
+
+Quand plusieurs requêtes manquent la même entrée en même temps, une seule
+exécute la requête SQL et les autres attendent son résultat.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+class MemoryBackend:
+    """LRU en mémoire, au plus ``max_size`` entrées"""
+
+    name = 'memory'
+    # Appels sans entrée/sortie : utilisables directement depuis la boucle asyncio
+    blocking = False
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._variants = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, user_id, variant):
+        with self._lock:
+            entry = self._entries.get((user_id, variant))
+            if entry is not None:
+                self._entries.move_to_end((user_id, variant))
+            return entry
+
+    def set(self, user_id, variant, stamp, payload):
+        with self._lock:
+            self._entries[(user_id, variant)] = (stamp, payload)
+            self._entries.move_to_end((user_id, variant))
+            self._variants.setdefault(user_id, set()).add(variant)
+            while len(self._entries) > self.max_size:
+                (old_user, old_variant), _ = self._entries.popitem(last=False)
+                self._forget(old_user, old_variant)
+                self.evictions += 1
+
+    def _forget(self, user_id, variant):
+        variants = self._variants.get(user_id)
+        if variants is not None:
+            variants.discard(variant)
+            if not variants:
+                del self._variants[user_id]
+
+    def variants(self, user_id):
+        with self._lock:
+            return list(self._variants.get(user_id, ()))
+
+    def delete(self, user_id, variants):
+        with self._lock:
+            for variant in variants:
+                if self._entries.pop((user_id, variant), None) is not None:
+                    self._forget(user_id, variant)
+
+    def restamp(self, user_id, variants, old, new):
+        """Passe de la version ``old`` à ``new`` les entrées qui ont exactement ``old``"""
+        with self._lock:
+            for variant in variants:
+                entry = self._entries.get((user_id, variant))
+                if entry is not None and entry[0] == old:
+                    self._entries[(user_id, variant)] = (new, entry[1])
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'evictions': self.evictions}
+
+
+class RedisBackend:
+    """Entrées partagées : un hash ``<prefix><user_id>`` par utilisateur, champ = variante"""
+
+    name = 'redis'
+    blocking = True
+
+    def __init__(self, client, prefix='tasks-cache:', ttl=3600):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TASKS_CACHE_BACKEND=redis nécessite le paquet redis (pip install redis)")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, user_id):
+        return f'{self.prefix}{user_id}'
+
+    @staticmethod
+    def _decode(value):
+        if value is None:
+            return None
+        stamp, _, payload = value.partition(b'\n')
+        return int(stamp), payload
+
+    def get(self, user_id, variant):
+        return self._decode(self.client.hget(self._key(user_id), variant))
+
+    def set(self, user_id, variant, stamp, payload):
+        self.client.hset(self._key(user_id), variant, b'%d\n' % stamp + payload)
+        # Les utilisateurs inactifs disparaissent d'eux-mêmes
+        self.client.expire(self._key(user_id), self.ttl)
+
+    def variants(self, user_id):
+        return [variant.decode('utf-8') if isinstance(variant, bytes) else variant
+                for variant in self.client.hkeys(self._key(user_id))]
+
+    def delete(self, user_id, variants):
+        if variants:
+            self.client.hdel(self._key(user_id), *variants)
+
+    def restamp(self, user_id, variants, old, new):
+        # Non atomique, mais sans risque : une entrée à ``old`` d'une variante non
+        # touchée par l'écriture ``new`` est aussi exacte pour ``new``
+        for variant in variants:
+            entry = self.get(user_id, variant)
+            if entry is not None and entry[0] == old:
+                self.set(user_id, variant, new, entry[1])
+
+    def stats(self):
+        return {'ttl': self.ttl}
+
+
+def tasks_variant(status, order='date'):
+    return f'tasks:{status}' if order == 'date' else f'tasks:{status}:{order}'
+
+
+def upcoming_variant(days, today=None):
+    # Le jour fait partie de la clé : la fenêtre glisse à minuit
+    return f'upcoming:{(today or date.today()).isoformat()}:{days}'
+
+
+def calendar_variant(start, end, bucket, tasks_per_bucket):
+    return f'calendar:{start.isoformat()}:{end.isoformat()}:{bucket}:{tasks_per_bucket}'
+
+
+def variant_touched(variant, statuses, dates):
+    """True si une écriture sur ces status / dates de début modifie la variante"""
+    kind, _, rest = variant.partition(':')
+    if kind == 'tasks':
+        column = rest.partition(':')[0]
+        return column == 'all' or column in statuses
+    if kind == 'upcoming':
+        day, _, days = rest.partition(':')
+        first = date.fromisoformat(day)
+        last = first + timedelta(days=int(days))
+        return any(first <= start_date <= last for start_date in dates)
+    if kind == 'calendar':
+        day, _, rest = rest.partition(':')
+        first = date.fromisoformat(day)
+        last = date.fromisoformat(rest.partition(':')[0])
+        return any(first <= start_date <= last for start_date in dates)
+    return True
+
+
+class ListingCache:
+    """Cache des listes de tâches validé par data_version (voir le docstring du module)"""
+
+    def __init__(self, backend=None, max_payload=1024 * 1024, wait_timeout=2.0):
+        self.backend = backend
+        self.max_payload = max_payload
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_async = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidated = 0
+        self.restamped = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit le cache à partir des variables TASKS_CACHE_*"""
+        kind = os.getenv('TASKS_CACHE_BACKEND', 'memory')
+        if kind == 'memory':
+            backend = MemoryBackend(max_size=int(os.getenv('TASKS_CACHE_SIZE', 1024)))
+        elif kind == 'redis':
+            backend = RedisBackend.from_url(os.getenv('TASKS_CACHE_URL', 'redis://localhost:6379/0'),
+                                            ttl=int(os.getenv('TASKS_CACHE_TTL', 3600)))
+        elif kind == 'none':
+            backend = None
+        else:
+            raise ValueError(f"TASKS_CACHE_BACKEND invalide: {kind} (valeurs acceptées: memory, redis, none)")
+        return cls(
+            backend,
+            max_payload=int(os.getenv('TASKS_CACHE_MAX_PAYLOAD', 1024 * 1024)),
+            wait_timeout=float(os.getenv('TASKS_CACHE_WAIT', 2)),
+        )
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _lookup(self, user_id, variant, version):
+        entry = self.backend.get(user_id, variant)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def _store(self, user_id, variant, version, payload):
+        if len(payload) <= self.max_payload:
+            self.backend.set(user_id, variant, version, payload)
+
+    def get_or_load(self, user_id, variant, version, load):
+        """JSON de la variante pour ``version`` ; ``load()`` le calcule en cas d'absence"""
+        if not self.enabled:
+            return load()
+        payload = self._lookup(user_id, variant, version)
+        if payload is not None:
+            self._count('hits')
+            return payload
+        self._count('misses')
+
+        key = (user_id, variant, version)
+        with self._lock:
+            done = self._inflight.get(key)
+            leader = done is None
+            if leader:
+                done = self._inflight[key] = threading.Event()
+
+        if not leader:
+            # Un autre thread calcule déjà cette entrée
+            done.wait(self.wait_timeout)
+            payload = self._lookup(user_id, variant, version)
+            if payload is not None:
+                self._count('coalesced')
+                return payload
+            return load()
+
+        try:
+            payload = load()
+            self._store(user_id, variant, version, payload)
+            return payload
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    async def _call(self, fn, *args):
+        # Backend réseau : hors de la boucle pour ne pas bloquer les autres requêtes
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get_or_load_async(self, user_id, variant, version, load):
+        """Comme get_or_load, avec ``load`` une fonction async"""
+        if not self.enabled:
+            return await load()
+        payload = await self._call(self._lookup, user_id, variant, version)
+        if payload is not None:
+            self._count('hits')
+            return payload
+        self._count('misses')
+
+        key = (user_id, variant, version)
+        pending = self._inflight_async.get(key)
+        if pending is not None:
+            # Une autre requête calcule déjà cette entrée (None : elle a échoué)
+            try:
+                payload = await asyncio.wait_for(asyncio.shield(pending), self.wait_timeout)
+            except asyncio.TimeoutError:
+                payload = None
+            if payload is None:
+                return await load()
+            self._count('coalesced')
+            return payload
+
+        pending = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        payload = None
+        try:
+            payload = await load()
+            await self._call(self._store, user_id, variant, version, payload)
+            return payload
+        finally:
+            del self._inflight_async[key]
+            pending.set_result(payload)
+
+    def _invalidate(self, user_id, delta):
+        variants = self.backend.variants(user_id)
+        touched = [variant for variant in variants
+                   if variant_touched(variant, delta.touched_statuses, delta.touched_dates)]
+        untouched = [variant for variant in variants if variant not in touched]
+        self.backend.delete(user_id, touched)
+        self.backend.restamp(user_id, untouched, delta.version - 1, delta.version)
+        self._count('invalidated', len(touched))
+        self._count('restamped', len(untouched))
+
+    def invalidate(self, user_id, delta):
+        """Après le commit d'une écriture décrite par ``delta`` (TaskCounterDelta appliqué)"""
+        if self.enabled and delta.version is not None:
+            self._invalidate(user_id, delta)
+
+    async def invalidate_async(self, user_id, delta):
+        if self.enabled and delta.version is not None:
+            await self._call(self._invalidate, user_id, delta)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'backend': self.backend.name if self.enabled else 'none',
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'invalidated': self.invalidated,
+                'restamped': self.restamped,
+            }
+        if self.enabled:
+            stats.update(self.backend.stats())
+        return stats
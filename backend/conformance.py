@@ -0,0 +1,466 @@
+"""Suite de conformité des moteurs de stockage (python manage.py conformance).
+
+Les mêmes scénarios sont exécutés, à travers les plans de task_repository.py,
+user_repository.py et counters.py, sur le moteur configuré (STORAGE_BACKEND,
+voir storage.py) ; les résultats sont comparés à ce qu'attend l'API, calculé
+en Python. Un moteur n'est utilisable par les routes que s'il passe toute la
+suite : tris et curseurs de chaque colonne, statistiques, tâches à venir,
+calendrier, écritures unitaires, par lot et import en masse, ordre manuel, synchronisation par delta,
+recherche plein texte, archivage et cohérence des compteurs.
+
+Un utilisateur temporaire est créé puis supprimé avec ses tâches : la suite
+peut tourner sur une base qui contient déjà des données.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+
+from api_common import changes_body, parse_batch
+from counters import TaskCounterDelta, read_data_version, read_stats, verify_counters
+from sql_plan import execute_plan
+from task_repository import (ARCHIVE_ORDERING, LIST_ORDERS, SEARCH_ORDERINGS, TASK_ORDERINGS, PlacementError,
+                             apply_batch, archive_tasks, bucket_start, create_task, decode_archive_cursor,
+                             decode_change_cursor, decode_cursor, decode_search_cursor, delete_task,
+                             encode_archive_cursor, encode_change_cursor, encode_cursor, encode_search_cursor,
+                             fetch_upcoming, find_archivable, find_long_positions, import_tasks, list_archive,
+                             list_changes, list_tasks, move_task, read_calendar, rebalance_column, search_tasks,
+                             serialize_task, task_ordering, update_task)
+import user_repository
+
+USER_PREFIX = 'conformance-'
+# Id qu'aucune tâche ne porte (INT signé maximal)
+MISSING_TASK_ID = 2 ** 31 - 1
+
+
+def sample_tasks(today):
+    """(titre, status, date de début) des tâches du scénario"""
+    return [
+        ('Rapport mensuel', 'todo', today - timedelta(days=3)),
+        ('Réunion équipe', 'todo', None),
+        ('Rapport annuel', 'in_progress', today),
+        ('Préparer la démo', 'in_progress', today + timedelta(days=2)),
+        ('Archiver les mails', 'done', today - timedelta(days=10)),
+        ('Appeler le fournisseur', 'todo', today + timedelta(days=5)),
+        ('Rappel client', 'todo', today + timedelta(days=30)),
+        ('Ranger le bureau', 'done', None),
+        ('Planifier le sprint', 'todo', None),
+    ]
+
+
+class Scenario:
+    """Connexion, utilisateur temporaire et tâches attendues (id -> ligne)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.today = date.today()
+        self.user_id = None
+        self.username = f'{USER_PREFIX}{uuid.uuid4().hex[:8]}'
+        self.tasks = {}
+        self.deleted = []
+        self.archived = {}
+
+    def run(self, plan, commit=False):
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            result = execute_plan(plan, cursor)
+        finally:
+            cursor.close()
+        if commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        return result
+
+    def expected(self, status, order='date'):
+        """Tâches de la colonne ``status`` dans l'ordre de TASK_ORDERINGS (ou POSITION_ORDERINGS)"""
+        rows = [task for task in self.tasks.values() if status == 'all' or task['status'] == status]
+        return _ordered(rows, task_ordering(status, order))
+
+
+def _ordered(rows, keys):
+    for _, desc, _, getter in reversed(keys):
+        rows = sorted(rows, key=lambda task: _sortable(getter(task)), reverse=desc)
+    return [task['id'] for task in rows]
+
+
+def _sortable(value):
+    return (value is None, 0 if value is None else value)
+
+
+def _compare(label, expected, actual):
+    return [] if expected == actual else [f'{label} : attendu {expected}, obtenu {actual}']
+
+
+# ============================================
+# SCÉNARIOS (exécutés dans l'ordre, chacun part de l'état laissé par le précédent)
+# ============================================
+
+def check_users(s):
+    s.user_id = s.run(user_repository.create_user(s.username, f'{s.username}@conformance.invalid', 'hash'),
+                      commit=True)
+    problems = []
+    if not s.run(user_repository.is_taken(s.username.upper(), 'autre@conformance.invalid')):
+        problems.append("nom d'utilisateur comparé avec la casse")
+    row = s.run(user_repository.find_for_login(s.username))
+    if row is None or row['id'] != s.user_id or row['password_hash'] != 'hash':
+        problems.append(f'find_for_login : {row}')
+    if s.run(user_repository.find_principal(s.user_id))['username'] != s.username:
+        problems.append('find_principal : mauvais utilisateur')
+    return problems
+
+
+def check_create(s):
+    problems = []
+    for title, status, start_date in sample_tasks(s.today):
+        task = s.run(create_task(s.user_id, title, status, start_date), commit=True)
+        s.tasks[task['id']] = task
+    version = s.run(read_data_version(s.user_id))
+    problems += _compare('data_version', len(s.tasks), version)
+    stored = s.run(list_tasks(s.user_id, 'all'))
+    for row in stored:
+        task = s.tasks.get(row['id'])
+        if task is None or any(row[key] != task[key] for key in ('title', 'status', 'start_date', 'createdAt')):
+            problems.append(f'ligne relue différente de la tâche créée : {row}')
+    return problems
+
+
+def check_listings(s):
+    problems = []
+    for order in LIST_ORDERS:
+        for status in TASK_ORDERINGS:
+            ids = [row['id'] for row in s.run(list_tasks(s.user_id, status, order=order))]
+            problems += _compare(f'tri {status} ({order})', s.expected(status, order), ids)
+    return problems
+
+
+def check_pagination(s):
+    problems = []
+    for order in LIST_ORDERS:
+        for status in TASK_ORDERINGS:
+            ids, after = [], None
+            while True:
+                rows = s.run(list_tasks(s.user_id, status, after, 2, order))
+                ids += [row['id'] for row in rows]
+                if len(rows) < 2:
+                    break
+                after = decode_cursor(status, encode_cursor(status, rows[-1], order), order)
+            problems += _compare(f'pages {status} ({order})', s.expected(status, order), ids)
+    return problems
+
+
+def check_stats(s):
+    open_tasks = [task for task in s.tasks.values() if task['status'] != 'done' and task['start_date']]
+    expected = {status: sum(task['status'] == status for task in s.tasks.values())
+                for status in ('todo', 'in_progress', 'done')}
+    expected['total'] = len(s.tasks)
+    expected['archived'] = len(s.archived)
+    expected['overdue'] = sum(task['start_date'] < s.today for task in open_tasks)
+    expected['today'] = sum(task['start_date'] == s.today for task in open_tasks)
+    return _compare('stats', expected, s.run(read_stats(s.user_id)))
+
+
+def check_upcoming(s):
+    horizon = s.today + timedelta(days=7)
+    expected = sorted(task['id'] for task in s.tasks.values()
+                      if task['status'] != 'done' and task['start_date']
+                      and s.today <= task['start_date'] <= horizon)
+    rows = s.run(fetch_upcoming(s.user_id, 7))
+    problems = _compare('à venir', expected, sorted(row['id'] for row in rows))
+    dates = [row['start_date'] for row in rows]
+    if dates != sorted(dates):
+        problems.append(f'à venir non triées par date de début : {dates}')
+    return problems
+
+
+def check_calendar(s):
+    start, end = s.today - timedelta(days=10), s.today + timedelta(days=20)
+    dated = [s.tasks[task_id] for task_id in _ordered(
+        [task for task in s.tasks.values() if task['start_date'] and start <= task['start_date'] <= end],
+        [(key, False, None, lambda task, key=key: task[key]) for key in ('start_date', 'createdAt', 'id')])]
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    problems = []
+    for bucket in ('day', 'week'):
+        expected = {}
+        for task in dated:
+            first = bucket_start(task['start_date'], bucket)
+            entry = expected.setdefault(max(first, start).isoformat(), {'counts': {}, 'tasks': []})
+            entry['counts'][task['status']] = entry['counts'].get(task['status'], 0) + 1
+            if len(entry['tasks']) < 2:
+                entry['tasks'].append(task['id'])
+
+        buckets = s.run(read_calendar(s.user_id, start, end, bucket, 2))
+        actual = {entry['start']: {'counts': {status: n for status, n in entry['counts'].items() if n},
+                                   'tasks': [task['id'] for task in entry['tasks']]}
+                  for entry in buckets if entry['total']}
+        problems += _compare(f'calendrier ({bucket})', expected, actual)
+        # Groupes vides compris, coupés aux bornes de la fenêtre
+        firsts = sorted({max(bucket_start(day, bucket), start).isoformat() for day in days})
+        problems += _compare(f'groupes du calendrier ({bucket})', firsts, [entry['start'] for entry in buckets])
+        if buckets[-1]['end'] != end.isoformat():
+            problems.append(f'calendrier ({bucket}) : dernier groupe après {end}')
+    return problems
+
+
+def check_update(s):
+    task_id = next(task['id'] for task in s.tasks.values() if task['status'] == 'todo' and task['start_date'])
+    delta = TaskCounterDelta()
+    task = s.run(update_task(s.user_id, task_id, {'status': 'done', 'title': 'Rapport mensuel envoyé'}, delta),
+                 commit=True)
+    s.tasks[task_id] = task
+    problems = _compare('version après modification', s.run(read_data_version(s.user_id)), delta.version)
+    if s.run(update_task(s.user_id, MISSING_TASK_ID, {'status': 'done'})) is not None:
+        problems.append('modification d\'une tâche inexistante acceptée')
+    return problems + check_listings(s) + check_stats(s)
+
+
+def check_batch(s):
+    victim, target = sorted(task['id'] for task in s.tasks.values() if task['status'] == 'todo')[:2]
+    _, operations, _ = parse_batch({'atomic': False, 'operations': [
+        {'op': 'create', 'title': 'Rapport de lot', 'start_date': s.today.isoformat()},
+        {'op': 'create', 'title': 'Second lot', 'status': 'in_progress'},
+        {'op': 'status', 'id': target, 'status': 'in_progress'},
+        {'op': 'delete', 'id': victim},
+        {'op': 'delete', 'id': MISSING_TASK_ID},
+    ]})
+    results = s.run(apply_batch(s.user_id, operations), commit=True)
+    problems = _compare('statuts du lot', [201, 201, 200, 200, 404], [results[i]['status'] for i in range(5)])
+
+    stored = {row['id']: row for row in s.run(list_tasks(s.user_id, 'all'))}
+    for index in (0, 1):
+        created = results[index]['task']
+        row = stored.get(created['id'])
+        if row is None or row['title'] != created['title']:
+            problems.append(f'id renvoyé pour la création {index} ne désigne pas la tâche créée : {created["id"]}')
+        else:
+            s.tasks[row['id']] = row
+    s.tasks[target] = stored[target]
+    del s.tasks[victim]
+    s.deleted.append(victim)
+    return problems + check_listings(s) + check_stats(s)
+
+
+def check_import(s):
+    imported = [('Import un', 'todo', None),
+                ('Import deux', 'done', s.today.isoformat()),
+                ('Import trois', 'in_progress', (s.today + timedelta(days=1)).isoformat())]
+    known = set(s.tasks)
+    delta = TaskCounterDelta()
+    problems = _compare('tâches importées', len(imported), s.run(import_tasks(s.user_id, imported, delta),
+                                                                   commit=True))
+    problems += _compare('version après import', s.run(read_data_version(s.user_id)), delta.version)
+    rows = [row for row in s.run(list_tasks(s.user_id, 'all')) if row['id'] not in known]
+    stored = sorted((row['title'], row['status'], row['start_date'] and row['start_date'].isoformat())
+                    for row in rows)
+    problems += _compare('lignes importées', sorted(imported), stored)
+    for row in rows:
+        s.tasks[row['id']] = row
+    return problems + check_listings(s) + check_stats(s)
+
+
+def check_positions(s):
+    def column(status):
+        return [row['id'] for row in s.run(list_tasks(s.user_id, status, order='position'))]
+
+    def move(task_id, status, after_id=None, before_id=None):
+        task, _ = s.run(move_task(s.user_id, task_id, status, after_id, before_id), commit=True)
+        s.tasks[task_id] = task
+        return task
+
+    problems = []
+    # Créations : en fin de colonne, dans l'ordre de création
+    todo = column('todo')
+    created = [task['id'] for task in s.tasks.values() if task['status'] == 'todo']
+    problems += _compare('créations en fin de colonne', sorted(created), sorted(todo))
+
+    # Déplacement dans la colonne : seule la ligne déplacée change
+    before = {task_id: task['position'] for task_id, task in s.tasks.items()}
+    last = todo[-1]
+    move(last, 'todo', after_id=todo[0])
+    problems += _compare('après after_id', [todo[0], last] + todo[1:-1], column('todo'))
+    changed = [task_id for task_id, task in s.tasks.items() if task['position'] != before[task_id]]
+    problems += _compare('lignes repositionnées', [last], changed)
+    move(todo[1], 'todo', before_id=todo[0])
+    problems += _compare('avant before_id', [todo[1], todo[0], last] + todo[2:-1], column('todo'))
+
+    # Changement de colonne : à la place demandée, sinon en fin de colonne
+    todo, in_progress = column('todo'), column('in_progress')
+    move(todo[0], 'in_progress', after_id=in_progress[0])
+    problems += _compare('colonne de destination', [in_progress[0], todo[0]] + in_progress[1:], column('in_progress'))
+    done = column('done')
+    move(todo[1], 'done')
+    problems += _compare('fin de la colonne done', done + [todo[1]], column('done'))
+    for anchor in (todo[2], column('in_progress')[0]):
+        try:
+            move(todo[2], 'todo', after_id=anchor)
+            problems.append(f'tâche de référence {anchor} acceptée')
+        except PlacementError:
+            s.conn.rollback()
+
+    # Insertions répétées au même endroit : les clés s'allongent, puis la colonne est renumérotée
+    in_progress = column('in_progress')
+    first, a, b = in_progress[:3]
+    for i in range(60):
+        move(a if i % 2 else b, 'in_progress', after_id=first)
+    order = column('in_progress')
+    longest = max(len(s.tasks[task_id]['position']) for task_id in order)
+    if longest < 8:
+        problems.append(f'clés de position courtes après 60 insertions : {longest}')
+    long_columns = {(row['user_id'], row['status']) for row in s.run(find_long_positions(7, 1000))}
+    if (s.user_id, 'in_progress') not in long_columns:
+        problems.append('colonne aux clés longues non trouvée')
+    problems += _compare('tâches renumérotées', len(order), s.run(rebalance_column(s.user_id, 'in_progress'),
+                                                                   commit=True))
+    problems += _compare('ordre après renumérotation', order, column('in_progress'))
+    for row in s.run(list_tasks(s.user_id, 'all')):
+        s.tasks[row['id']] = row
+    if max(len(s.tasks[task_id]['position']) for task_id in order) > 2:
+        problems.append('clés toujours longues après renumérotation')
+    return problems + check_listings(s) + check_pagination(s) + check_stats(s)
+
+
+def check_changes(s):
+    task_id = max(s.tasks)
+    problems = []
+    if not s.run(delete_task(s.user_id, task_id), commit=True):
+        problems.append('suppression refusée')
+    del s.tasks[task_id]
+    s.deleted.append(task_id)
+    if s.run(delete_task(s.user_id, task_id)):
+        problems.append('suppression d\'une tâche déjà supprimée acceptée')
+
+    full = s.run(list_changes(s.user_id, None, 1000))
+    live = sorted(row['id'] for row in full if not row['deleted'])
+    dead = sorted(row['id'] for row in full if row['deleted'])
+    problems += _compare('tâches modifiées', sorted(s.tasks), live)
+    problems += _compare('tâches supprimées', sorted(s.deleted), dead)
+    # Réponse de GET /api/tasks/changes : mêmes tâches sérialisées que GET /api/tasks
+    body = changes_body(full, 1000, None)
+    upserted = {change['task']['id']: change['task'] for change in body['changes'] if change['type'] == 'upserted'}
+    listed = {row['id']: serialize_task(row) for row in s.run(list_tasks(s.user_id, 'all'))}
+    if upserted != listed:
+        problems.append('tâches de /api/tasks/changes différentes de /api/tasks')
+
+    paged, after = [], None
+    while True:
+        rows = s.run(list_changes(s.user_id, after, 3))
+        paged += rows
+        if len(rows) < 3:
+            break
+        after = decode_change_cursor(encode_change_cursor(rows[-1]))
+    return problems + _compare('pages des modifications', [(r['id'], r['deleted']) for r in full],
+                               [(r['id'], r['deleted']) for r in paged])
+
+
+def check_search(s):
+    def titles_matching(*prefixes):
+        return sorted(task['id'] for task in s.tasks.values()
+                      if all(any(word.lower().startswith(p) for word in task['title'].split()) for p in prefixes))
+
+    problems = []
+    for text, prefixes in (('rapp', ('rapp',)), ('RAPPORT men', ('rapport', 'men')), ('reunion', ('réunion',))):
+        rows = s.run(search_tasks(s.user_id, text))
+        problems += _compare(f'recherche « {text} »', titles_matching(*prefixes), sorted(row['id'] for row in rows))
+
+    for order in SEARCH_ORDERINGS:
+        full = [row['id'] for row in s.run(search_tasks(s.user_id, 'rapp', order=order))]
+        paged, after = [], None
+        while True:
+            rows = s.run(search_tasks(s.user_id, 'rapp', order=order, after=after, limit=1))
+            paged += [row['id'] for row in rows]
+            if not rows:
+                break
+            after = decode_search_cursor(order, encode_search_cursor(order, rows[-1]))
+        problems += _compare(f'pages de recherche ({order})', full, paged)
+    return problems
+
+
+def check_archive(s):
+    # Date limite dans le futur : toutes les tâches terminées sont archivables
+    cutoff = datetime.now().replace(microsecond=0) + timedelta(days=1)
+    done = sorted(task['id'] for task in s.tasks.values() if task['status'] == 'done')
+    # Tâche d'un autre utilisateur (ou inexistante) : ignorée
+    moved = s.run(archive_tasks(s.user_id, done + [MISSING_TASK_ID], cutoff), commit=True)
+    problems = _compare('tâches archivées', len(done), moved)
+    for task_id in done:
+        s.archived[task_id] = s.tasks.pop(task_id)
+        s.deleted.append(task_id)
+    if s.run(archive_tasks(s.user_id, done, cutoff)):
+        problems.append('tâche archivée deux fois')
+    candidates = {row['id'] for row in s.run(find_archivable(cutoff, 1000)) if row['user_id'] == s.user_id}
+    if candidates:
+        problems.append(f'tâches encore archivables : {sorted(candidates)}')
+
+    expected = _ordered(list(s.archived.values()), ARCHIVE_ORDERING)
+    rows = s.run(list_archive(s.user_id))
+    problems += _compare('archive', expected, [row['id'] for row in rows])
+    for row in rows:
+        task = s.archived[row['id']]
+        if row['archivedAt'] is None or any(row[key] != task[key] for key in ('title', 'status', 'createdAt')):
+            problems.append(f'ligne archivée différente de la tâche : {row}')
+
+    paged, after = [], None
+    while True:
+        page = s.run(list_archive(s.user_id, after, 1))
+        paged += [row['id'] for row in page]
+        if not page:
+            break
+        after = decode_archive_cursor(encode_archive_cursor(page[-1]))
+    problems += _compare('pages de l\'archive', expected, paged)
+
+    dead = sorted(row['id'] for row in s.run(list_changes(s.user_id, None, 1000)) if row['deleted'])
+    problems += _compare('tâches archivées vues comme supprimées', sorted(s.deleted), dead)
+    return problems + check_listings(s) + check_stats(s)
+
+
+def check_counters(s):
+    return [f"compteur {item['counter']} : attendu {item['expected']}, stocké {item['stored']}"
+            for item in verify_counters(s.conn, s.user_id)]
+
+
+CHECKS = [
+    ('utilisateurs', check_users),
+    ('création de tâches', check_create),
+    ('tri des colonnes', check_listings),
+    ('pagination par curseur', check_pagination),
+    ('statistiques', check_stats),
+    ('tâches à venir', check_upcoming),
+    ('calendrier', check_calendar),
+    ('modification', check_update),
+    ('opérations par lot', check_batch),
+    ('import en masse', check_import),
+    ('ordre manuel', check_positions),
+    ('suppression et synchronisation', check_changes),
+    ('recherche plein texte', check_search),
+    ('archivage', check_archive),
+    ('cohérence des compteurs', check_counters),
+]
+
+
+def cleanup(conn, username):
+    # Tâches, archive, compteurs et tombstones suivent par ON DELETE CASCADE
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM users WHERE username = %s', (username,))
+    conn.commit()
+    cursor.close()
+
+
+def run(conn):
+    """Exécute la suite; retourne la liste de (nom, problèmes).
+
+    Après le premier scénario en échec, les suivants ne sont pas exécutés
+    (ils partent de son état).
+    """
+    scenario = Scenario(conn)
+    report = []
+    try:
+        for name, check in CHECKS:
+            try:
+                problems = check(scenario)
+            except Exception as e:
+                conn.rollback()
+                problems = [f'{type(e).__name__}: {e}']
+            report.append((name, problems))
+            if problems:
+                break
+    finally:
+        cleanup(conn, scenario.username)
+    return report
@@ -0,0 +1,374 @@
+"""Contrat HTTP commun de app.py et asgi_app.py (python manage.py contract).
+
+Les mêmes scénarios sont joués, à travers le client de test de chaque
+application (Flask, Quart), sur l'API réelle : codes HTTP, en-têtes et forme
+des corps attendus. Chaque réponse est aussi transcrite (étape, code, forme du
+corps) : quand les deux applications sont jouées, leurs transcriptions doivent
+être identiques, ce qui détecte une route qui diverge entre les deux modes.
+
+asgi_app.py ne sert que MySQL (aiomysql) : avec STORAGE_BACKEND=sqlite, seul
+app.py est joué. Un utilisateur temporaire est créé par application puis
+supprimé avec ses tâches.
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import date, timedelta
+
+from import_export import IMPORT_MAX_RECORD_BYTES, IMPORT_MAX_RECORD_LINES
+from storage import active_storage
+
+USER_PREFIX = 'contract-'
+PASSWORD = 'contract-password'
+# Id qu'aucune tâche ne porte (INT signé maximal)
+MISSING_TASK_ID = 2 ** 31 - 1
+# Champs d'une tâche sérialisée (serialize_task)
+TASK_KEYS = {'id', 'user_id', 'title', 'status', 'start_date', 'position', 'createdAt', 'updatedAt'}
+# Allers-retours SQL d'une écriture sans date de début (voir README, « Requêtes par écriture »)
+WRITE_QUERIES = {
+    'création': 3,
+    'modification': 3,
+    'changement de colonne': 4,
+    'suppression': 4,
+}
+
+
+def _prepare_env():
+    # Limites de débit coupées : la suite envoie des rafales de requêtes au même utilisateur
+    os.environ.setdefault('RATE_LIMIT_USER_RATE', '0')
+    os.environ.setdefault('RATE_LIMIT_AUTH_IP_RATE', '0')
+    # En-tête X-DB-Queries : le scénario « requêtes par écriture » en dépend
+    os.environ['DB_QUERY_COUNT_HEADER'] = 'true'
+
+
+class Reply:
+    __slots__ = ('status', 'headers', 'body', 'data')
+
+    def __init__(self, status, headers, body, data):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # Corps brut (réponses NDJSON)
+        self.data = data
+
+
+class WsgiClient:
+    """Client de test Flask de app.py"""
+    name = 'wsgi'
+
+    def __init__(self):
+        _prepare_env()
+        import app
+        self._client = app.app.test_client()
+
+    def request(self, method, path, json=None, headers=None, data=None):
+        response = self._client.open(path, method=method, json=json, headers=headers, data=data)
+        return Reply(response.status_code, response.headers, response.get_json(silent=True), response.get_data())
+
+    def close(self):
+        pass
+
+
+class AsgiClient:
+    """Client de test Quart de asgi_app.py, sur sa propre boucle (démarrage : pool aiomysql)"""
+    name = 'asgi'
+
+    def __init__(self):
+        _prepare_env()
+        import asgi_app
+        self._loop = asyncio.new_event_loop()
+        self._app = asgi_app.app.test_app()
+        self._loop.run_until_complete(self._app.startup())
+        self._client = self._app.test_client()
+
+    async def _request(self, method, path, json, headers, data):
+        response = await self._client.open(path, method=method, json=json, headers=headers, data=data)
+        return Reply(response.status_code, response.headers, await response.get_json(silent=True),
+                     await response.get_data())
+
+    def request(self, method, path, json=None, headers=None, data=None):
+        return self._loop.run_until_complete(self._request(method, path, json, headers, data))
+
+    def close(self):
+        self._loop.run_until_complete(self._app.shutdown())
+        self._loop.close()
+
+
+def available_clients():
+    """Applications jouables avec le moteur configuré"""
+    if active_storage().name == 'mysql':
+        return [WsgiClient, AsgiClient]
+    return [WsgiClient]
+
+
+def shape(value):
+    """Forme d'un corps JSON : clés et types, sans les valeurs"""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(value[0])] if value else []
+    return 'null' if value is None else type(value).__name__
+
+
+class Session:
+    """Client d'une application, utilisateur temporaire et transcription des réponses"""
+
+    def __init__(self, client):
+        self.client = client
+        self.username = f'{USER_PREFIX}{uuid.uuid4().hex[:8]}'
+        self.token = None
+        self.tasks = {}
+        self.problems = []
+        self.transcript = []
+
+    @property
+    def auth(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+    def call(self, step, method, path, json=None, headers=None, expect=200, auth=True, data=None):
+        if auth and self.token:
+            headers = dict(self.auth, **(headers or {}))
+        reply = self.client.request(method, path, json=json, headers=headers, data=data)
+        self.transcript.append((step, reply.status, shape(reply.body)))
+        if reply.status != expect:
+            self.problem(f'{step} : {method} {path} attendu {expect}, obtenu {reply.status} {reply.body}')
+        return reply
+
+    def problem(self, message):
+        self.problems.append(message)
+
+    def check(self, condition, message):
+        if not condition:
+            self.problem(message)
+
+
+# ============================================
+# SCÉNARIOS (exécutés dans l'ordre, chacun part de l'état laissé par le précédent)
+# ============================================
+
+def check_auth(s):
+    email = f'{s.username}@contract.invalid'
+    s.call('inscription', 'POST', '/api/register',
+           json={'username': s.username, 'email': email, 'password': PASSWORD}, expect=201)
+    s.call('inscription en double', 'POST', '/api/register',
+           json={'username': s.username, 'email': email, 'password': PASSWORD}, expect=400)
+    s.call('mauvais mot de passe', 'POST', '/api/login',
+           json={'username': s.username, 'password': 'incorrect'}, expect=401)
+    reply = s.call('connexion', 'POST', '/api/login', json={'username': s.username, 'password': PASSWORD})
+    s.token = (reply.body or {}).get('token')
+    s.check(s.token, 'connexion : pas de token')
+
+    s.call('sans token', 'GET', '/api/tasks', auth=False, expect=401)
+    reply = s.call('profil', 'GET', '/api/profile')
+    s.check((reply.body or {}).get('username') == s.username, f'profil : {reply.body}')
+
+
+def check_create(s):
+    today = date.today()
+    for title, status, start_date in [('Rapport', 'todo', today), ('Réunion', 'todo', None),
+                                      ('Démo', 'in_progress', today + timedelta(days=2))]:
+        body = {'title': title, 'status': status}
+        if start_date:
+            body['start_date'] = start_date.isoformat()
+        reply = s.call('création', 'POST', '/api/tasks', json=body, expect=201)
+        task = reply.body or {}
+        s.check(set(task) == TASK_KEYS, f'création : champs {sorted(task)}')
+        s.check(task.get('position'), 'création : tâche sans position')
+        if 'id' in task:
+            s.tasks[task['id']] = task
+    s.call('création sans titre', 'POST', '/api/tasks', json={'status': 'todo'}, expect=400)
+    s.call('date invalide', 'POST', '/api/tasks', json={'title': 'x', 'start_date': '2024-13-01'}, expect=400)
+
+
+def check_listing(s):
+    reply = s.call('liste', 'GET', '/api/tasks')
+    listed = {task['id']: task for task in reply.body or []}
+    s.check(listed == s.tasks, 'liste : tâches différentes des tâches créées')
+    etag = reply.headers.get('ETag')
+    s.check(etag, 'liste : pas d\'ETag')
+    if etag:
+        s.call('liste inchangée', 'GET', '/api/tasks', headers={'If-None-Match': etag}, expect=304)
+
+    reply = s.call('page', 'GET', '/api/tasks?status=todo&limit=1&order=position')
+    s.check(len(reply.body or []) == 1 and reply.headers.get('X-Next-Cursor'), 'page : pas de curseur suivant')
+    s.call('status invalide', 'GET', '/api/tasks?status=inconnu', expect=400)
+
+
+def check_changes(s):
+    reply = s.call('modifications', 'GET', '/api/tasks/changes')
+    body = reply.body or {}
+    upserted = {change['task']['id']: change['task'] for change in body.get('changes', [])
+                if change['type'] == 'upserted'}
+    s.check(upserted == s.tasks, 'modifications : tâches différentes des tâches créées')
+    s.check(body.get('cursor'), 'modifications : pas de curseur')
+    if body.get('cursor'):
+        reply = s.call('modifications depuis le curseur', 'GET', f"/api/tasks/changes?since={body['cursor']}")
+        s.check((reply.body or {}).get('changes') == [], f'modifications depuis le curseur : {reply.body}')
+
+
+def check_moves(s):
+    todo = sorted((task for task in s.tasks.values() if task['status'] == 'todo'), key=lambda t: t['position'])
+    moving = next(task for task in s.tasks.values() if task['status'] == 'in_progress')
+    reply = s.call('déplacement', 'PUT', f"/api/tasks/{moving['id']}/status",
+                   json={'status': 'todo', 'before_id': todo[0]['id']})
+    task = reply.body or {}
+    s.check(task.get('status') == 'todo' and task.get('position', '') < todo[0]['position'],
+            f'déplacement : {task}')
+    if 'id' in task:
+        s.tasks[task['id']] = task
+    s.call('référence absente', 'PUT', f"/api/tasks/{moving['id']}/status",
+           json={'status': 'todo', 'after_id': MISSING_TASK_ID}, expect=409)
+    s.call('status invalide', 'PUT', f"/api/tasks/{moving['id']}/status", json={'status': 'x'}, expect=400)
+    s.call('tâche absente', 'PUT', f'/api/tasks/{MISSING_TASK_ID}/status', json={'status': 'done'}, expect=404)
+
+    reply = s.call('modification', 'PUT', f"/api/tasks/{moving['id']}", json={'title': 'Démo client'})
+    s.check((reply.body or {}).get('title') == 'Démo client', f'modification : {reply.body}')
+    if reply.status == 200:
+        s.tasks[moving['id']] = reply.body
+
+
+def check_batch(s):
+    reply = s.call('lot', 'POST', '/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Lot 1'},
+        {'op': 'create', 'title': 'Lot 2', 'status': 'done'},
+    ]})
+    for result in (reply.body or {}).get('results', []):
+        s.tasks[result['task']['id']] = result['task']
+    s.call('lot rejeté', 'POST', '/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Lot 3'},
+        {'op': 'delete', 'id': MISSING_TASK_ID},
+    ]}, expect=404)
+    reply = s.call('statistiques', 'GET', '/api/tasks/stats')
+    counts = {status: sum(1 for task in s.tasks.values() if task['status'] == status)
+              for status in ('todo', 'in_progress', 'done')}
+    stats = reply.body or {}
+    s.check(all(stats.get(status) == n for status, n in counts.items()), f'statistiques : {stats}, attendu {counts}')
+
+
+def check_reads(s):
+    today = date.today()
+    s.call('à venir', 'GET', '/api/tasks/upcoming')
+    reply = s.call('calendrier', 'GET',
+                   f'/api/tasks/calendar?from={today.isoformat()}&to={(today + timedelta(days=6)).isoformat()}')
+    s.check(len((reply.body or {}).get('buckets', [])) == 7, 'calendrier : 7 jours attendus')
+    reply = s.call('recherche', 'GET', '/api/tasks/search?q=rapport')
+    s.check(any(task['title'] == 'Rapport' for task in reply.body or []),
+            f'recherche : {reply.body}')
+    s.call('archive', 'GET', '/api/tasks/archive')
+
+
+def check_stream_token(s):
+    reply = s.call('jeton de flux', 'POST', '/api/tasks/stream/token')
+    stream_token = (reply.body or {}).get('token')
+    s.check(stream_token, 'jeton de flux absent')
+    s.call('jeton de session dans l\'URL', 'GET', f'/api/tasks/stream?access_token={s.token}', auth=False,
+           expect=401)
+    if stream_token:
+        s.call('jeton de flux hors du flux', 'GET', '/api/tasks',
+               headers={'Authorization': f'Bearer {stream_token}'}, auth=False, expect=401)
+
+
+def check_delete(s):
+    task_id = max(s.tasks)
+    s.call('suppression', 'DELETE', f'/api/tasks/{task_id}')
+    s.call('suppression répétée', 'DELETE', f'/api/tasks/{task_id}', expect=404)
+    del s.tasks[task_id]
+    reply = s.call('modifications après suppression', 'GET', '/api/tasks/changes')
+    deleted = [change['id'] for change in (reply.body or {}).get('changes', []) if change['type'] == 'deleted']
+    s.check(deleted == [task_id], f'modifications après suppression : {deleted}')
+
+
+def check_write_queries(s):
+    def pinned(step, reply):
+        queries = reply.headers.get('X-DB-Queries')
+        s.check(queries == str(WRITE_QUERIES[step]),
+                f'{step} : {queries} requête(s) SQL, attendu {WRITE_QUERIES[step]}')
+
+    reply = s.call('création', 'POST', '/api/tasks', json={'title': 'Compteur'}, expect=201)
+    pinned('création', reply)
+    task_id = (reply.body or {}).get('id', MISSING_TASK_ID)
+    pinned('modification', s.call('modification', 'PUT', f'/api/tasks/{task_id}', json={'title': 'Compté'}))
+    pinned('changement de colonne', s.call('changement de colonne', 'PUT', f'/api/tasks/{task_id}/status',
+                                           json={'status': 'done'}))
+    pinned('suppression', s.call('suppression', 'DELETE', f'/api/tasks/{task_id}'))
+
+
+def check_import_limits(s):
+    # Guillemet jamais fermé : l'enregistrement est rejeté après IMPORT_MAX_RECORD_LINES lignes,
+    # puis une ligne trop longue ; la lecture reprend à chaque fois à la ligne suivante
+    extra = 10
+    lines = ['title,status', '"Ouvert,todo']
+    lines += [f'Import {n},todo' for n in range(IMPORT_MAX_RECORD_LINES + extra)]
+    oversized = len(lines) + 1
+    lines += ['x' * (IMPORT_MAX_RECORD_BYTES + 1), 'Fin,todo', '']
+    reply = s.call('import borné', 'POST', '/api/tasks/import', data='\n'.join(lines).encode(),
+                   headers={'Content-Type': 'text/csv'})
+    events = [json.loads(line) for line in reply.data.splitlines() if line.strip()]
+    errors = [event['line'] for event in events if event['type'] == 'error']
+    s.check(errors == [2, oversized], f'import borné : erreurs aux lignes {errors}, attendu [2, {oversized}]')
+    done = events[-1] if events else {}
+    s.check(done.get('type') == 'done' and done.get('imported') == extra + 1 and done.get('failed') == 2,
+            f'import borné : {done}')
+
+
+CHECKS = [
+    ('authentification', check_auth),
+    ('création', check_create),
+    ('listes et ETag', check_listing),
+    ('synchronisation', check_changes),
+    ('déplacements et modification', check_moves),
+    ('lots et statistiques', check_batch),
+    ('lectures', check_reads),
+    ('jeton de flux', check_stream_token),
+    ('suppression', check_delete),
+    ('requêtes par écriture', check_write_queries),
+    ('import borné', check_import_limits),
+]
+
+
+def cleanup(username):
+    # Tâches, archive, compteurs et tombstones suivent par ON DELETE CASCADE
+    conn = active_storage().connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM users WHERE username = %s', (username,))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def run_app(client_class):
+    """Joue la suite sur une application; retourne (nom, [(scénario, problèmes)], transcription)"""
+    client = client_class()
+    session = Session(client)
+    report = []
+    try:
+        for name, check in CHECKS:
+            before = len(session.problems)
+            try:
+                check(session)
+            except Exception as e:
+                session.problem(f'{type(e).__name__}: {e}')
+            problems = session.problems[before:]
+            report.append((name, problems))
+            if problems:
+                break
+    finally:
+        client.close()
+        cleanup(session.username)
+    return client.name, report, session.transcript
+
+
+def compare_transcripts(results):
+    """Écarts entre les transcriptions des applications (même étape, code ou forme différents)"""
+    problems = []
+    (first_name, _, first), *others = results
+    for name, _, transcript in others:
+        for expected, actual in zip(first, transcript):
+            if expected != actual:
+                problems.append(f'{expected[0]} : {first_name} {expected[1:]} / {name} {actual[1:]}')
+        if len(first) != len(transcript):
+            problems.append(f'{first_name} : {len(first)} réponses, {name} : {len(transcript)}')
+    return problems
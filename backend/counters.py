@@ -0,0 +1,230 @@
+"""Compteurs de tâches matérialisés par utilisateur.
+
+- ``task_counters`` : nombre de tâches par status, nombre de tâches archivées
+  (``tasks_archive``) et version des données (une ligne par utilisateur, la
+  version augmente à chaque écriture de tâche) ;
+- ``task_date_buckets`` : nombre de tâches non terminées par date de début,
+  qui sert à calculer « en retard » et « aujourd'hui » sans parcourir ``tasks``
+  (les lignes retombées à zéro sont purgées par ``rebuild_counters``).
+
+Les écritures de task_repository.py appliquent un ``TaskCounterDelta`` dans la
+même transaction que l'écriture de la tâche. ``verify_counters`` et
+``rebuild_counters`` (voir manage.py) recalculent les compteurs depuis ``tasks``.
+"""
+from collections import Counter
+from datetime import date
+
+from sql_dialect import current_dialect
+from sql_plan import Query
+
+COUNTER_STATUSES = ('todo', 'in_progress', 'done')
+STORED_COUNTERS = COUNTER_STATUSES + ('archived',)
+
+# Version des données en cours, lisible dans une écriture après TaskCounterDelta.apply
+CURRENT_VERSION_SQL = '(SELECT data_version FROM task_counters WHERE user_id = %s)'
+
+
+class TaskCounterDelta:
+    """Variations de compteurs produites par une ou plusieurs écritures de tâches.
+
+    Une tâche est décrite par le couple (status, start_date) ; None signifie
+    que la tâche n'existe pas (avant une création, après une suppression).
+    """
+
+    def __init__(self):
+        self.statuses = Counter()
+        self.buckets = Counter()
+        # Tâches passées dans tasks_archive (elles quittent aussi leur status)
+        self.archived = 0
+        # Ce que l'écriture a touché, pour invalider le cache des listes (cache.py)
+        self.touched_statuses = set()
+        self.touched_dates = set()
+        # Version des données après apply (None tant que rien n'est écrit)
+        self.version = None
+
+    def _add(self, task, sign):
+        if task is None:
+            return
+        status, start_date = task
+        if isinstance(start_date, str):
+            start_date = date.fromisoformat(start_date)
+        self.statuses[status] += sign
+        self.touched_statuses.add(status)
+        if start_date is not None:
+            # Toutes les tâches datées : le calendrier compte aussi les terminées
+            self.touched_dates.add(start_date)
+            if status != 'done':
+                self.buckets[start_date] += sign
+
+    def change(self, old, new):
+        """Enregistre le passage de ``old`` à ``new``"""
+        self._add(old, -1)
+        self._add(new, 1)
+        return self
+
+    def apply(self, user_id):
+        """Plan qui écrit les variations et incrémente la version des données.
+
+        À exécuter (``yield from``) pour toute écriture de tâche, avant le commit.
+        La nouvelle version, renvoyée par l'upsert lui-même, est placée dans
+        ``self.version``.
+        """
+        values = [self.statuses[status] for status in COUNTER_STATUSES] + [self.archived]
+        d = current_dialect()
+        version, returning, fetch = d.upsert_returning('data_version', 'data_version + 1')
+        result = yield Query(f'''
+            INSERT INTO task_counters (user_id, todo, in_progress, done, archived, data_version)
+            VALUES (%s, %s, %s, %s, %s, 1)
+            {d.upsert('user_id')}
+                todo = todo + {d.inserted('todo')},
+                in_progress = in_progress + {d.inserted('in_progress')},
+                done = done + {d.inserted('done')},
+                archived = archived + {d.inserted('archived')},
+                {version}
+            {returning}
+        ''', [user_id] + values, fetch=fetch)
+        self.version = int(d.returned_value(result, 'data_version', 1))
+
+        # Dates triées : les verrous sont toujours pris dans le même ordre
+        buckets = sorted((day, n) for day, n in self.buckets.items() if n)
+        if buckets:
+            yield Query(f'''
+                INSERT INTO task_date_buckets (user_id, start_date, open_count)
+                VALUES (%s, %s, %s)
+                {d.upsert('user_id, start_date')} open_count = open_count + {d.inserted('open_count')}
+            ''', [(user_id, day, n) for day, n in buckets], many=True)
+
+
+def read_data_version(user_id):
+    """Plan : version des données de l'utilisateur (0 s'il n'a jamais écrit de tâche)"""
+    row = yield Query('SELECT data_version FROM task_counters WHERE user_id = %s', (user_id,), fetch='one')
+    return int(row['data_version']) if row else 0
+
+
+def read_stats(user_id):
+    """Plan : statistiques de l'utilisateur depuis les compteurs matérialisés"""
+    counts = yield Query(
+        'SELECT todo, in_progress, done, archived FROM task_counters WHERE user_id = %s',
+        (user_id,), fetch='one'
+    )
+
+    today = current_dialect().today
+    buckets = yield Query(f'''
+        SELECT
+            COALESCE(SUM(CASE WHEN start_date < {today} THEN open_count END), 0) AS overdue,
+            COALESCE(SUM(CASE WHEN start_date = {today} THEN open_count END), 0) AS today
+        FROM task_date_buckets
+        WHERE user_id = %s AND start_date <= {today}
+    ''', (user_id,), fetch='one')
+
+    result = {status: int(counts[status]) if counts else 0 for status in COUNTER_STATUSES}
+    result['total'] = sum(result[status] for status in COUNTER_STATUSES)
+    # Hors total : les tâches archivées ne sont plus dans les colonnes
+    result['archived'] = int(counts['archived']) if counts else 0
+    result['overdue'] = int(buckets['overdue']) if buckets else 0
+    result['today'] = int(buckets['today']) if buckets else 0
+    return result
+
+
+def _user_filter(user_id):
+    if user_id is None:
+        return '', []
+    return 'WHERE user_id = %s', [user_id]
+
+
+def _expected_counters(cursor, user_id=None):
+    where, params = _user_filter(user_id)
+    cursor.execute(f'SELECT user_id, status, COUNT(*) FROM tasks {where} GROUP BY user_id, status', params)
+    statuses = {}
+    for uid, status, count in cursor.fetchall():
+        statuses.setdefault(uid, dict.fromkeys(COUNTER_STATUSES, 0))[status] = count
+
+    where = 'AND user_id = %s' if user_id is not None else ''
+    cursor.execute(f'''
+        SELECT user_id, start_date, COUNT(*) FROM tasks
+        WHERE status != 'done' AND start_date IS NOT NULL {where}
+        GROUP BY user_id, start_date
+    ''', params)
+    buckets = {(uid, day): count for uid, day, count in cursor.fetchall()}
+
+    where, params = _user_filter(user_id)
+    cursor.execute(f'SELECT user_id, COUNT(*) FROM tasks_archive {where} GROUP BY user_id', params)
+    for uid, count in cursor.fetchall():
+        statuses.setdefault(uid, dict.fromkeys(COUNTER_STATUSES, 0))['archived'] = count
+    return statuses, buckets
+
+
+def verify_counters(conn, user_id=None):
+    """Compare les compteurs à la table tasks et retourne la liste des écarts"""
+    cursor = conn.cursor()
+    expected_statuses, expected_buckets = _expected_counters(cursor, user_id)
+
+    where, params = _user_filter(user_id)
+    cursor.execute(f'SELECT user_id, todo, in_progress, done, archived FROM task_counters {where}', params)
+    stored_statuses = {row[0]: dict(zip(STORED_COUNTERS, row[1:])) for row in cursor.fetchall()}
+    cursor.execute(f'SELECT user_id, start_date, open_count FROM task_date_buckets {where}', params)
+    stored_buckets = {(uid, day): count for uid, day, count in cursor.fetchall() if count}
+    cursor.close()
+    conn.rollback()
+
+    drift = []
+    for uid in sorted(set(expected_statuses) | set(stored_statuses)):
+        expected = expected_statuses.get(uid, {})
+        stored = stored_statuses.get(uid, {})
+        for counter in STORED_COUNTERS:
+            if expected.get(counter, 0) != stored.get(counter, 0):
+                drift.append({'user_id': uid, 'counter': counter,
+                              'expected': expected.get(counter, 0), 'stored': stored.get(counter, 0)})
+    for uid, day in sorted(set(expected_buckets) | set(stored_buckets)):
+        expected = expected_buckets.get((uid, day), 0)
+        stored = stored_buckets.get((uid, day), 0)
+        if expected != stored:
+            drift.append({'user_id': uid, 'counter': f'start_date={day.isoformat()}',
+                          'expected': expected, 'stored': stored})
+    return drift
+
+
+def rebuild_counters(conn, user_id=None):
+    """Recalcule entièrement les compteurs depuis les tables tasks et tasks_archive"""
+    cursor = conn.cursor()
+    where, params = _user_filter(user_id)
+    # Les lignes de task_counters sont conservées : data_version ne doit jamais reculer
+    cursor.execute(f'''
+        UPDATE task_counters
+        SET todo = 0, in_progress = 0, done = 0, archived = 0, data_version = data_version + 1
+        {where}
+    ''', params)
+    cursor.execute(f'DELETE FROM task_date_buckets {where}', params)
+    d = current_dialect()
+    cursor.execute(f'''
+        INSERT INTO task_counters (user_id, todo, in_progress, done, data_version)
+        SELECT user_id,
+               SUM(status = 'todo'),
+               SUM(status = 'in_progress'),
+               SUM(status = 'done'),
+               1
+        FROM tasks {where}
+        GROUP BY user_id
+        {d.upsert('user_id')}
+            todo = {d.inserted('todo')},
+            in_progress = {d.inserted('in_progress')},
+            done = {d.inserted('done')}
+    ''', params)
+    cursor.execute(f'''
+        INSERT INTO task_counters (user_id, archived, data_version)
+        SELECT user_id, COUNT(*), 1
+        FROM tasks_archive {where}
+        GROUP BY user_id
+        {d.upsert('user_id')}
+            archived = {d.inserted('archived')}
+    ''', params)
+    where = 'AND user_id = %s' if user_id is not None else ''
+    cursor.execute(f'''
+        INSERT INTO task_date_buckets (user_id, start_date, open_count)
+        SELECT user_id, start_date, COUNT(*)
+        FROM tasks
+        WHERE status != 'done' AND start_date IS NOT NULL {where}
+        GROUP BY user_id, start_date
+    ''', params)
+    conn.commit()
+    cursor.close()
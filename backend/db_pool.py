@@ -0,0 +1,246 @@
+"""Pool de connexions MySQL borné et thread-safe.
+
+Chaque requête HTTP emprunte une seule connexion au pool (voir
+``get_db_connection`` dans app.py) et la rend à la fin de la requête, au lieu
+d'ouvrir et fermer une session TCP + authentification MySQL à chaque appel.
+Le même pool sert les connexions SQLite (``connect`` / ``errors``, voir storage.py).
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolExhaustedError(Exception):
+    """Aucune connexion disponible avant l'expiration du délai d'emprunt."""
+
+
+def connection_settings_from_env():
+    """Paramètres de connexion MySQL lus depuis l'environnement"""
+    return {
+        'host': os.getenv('DB_HOST'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'port': os.getenv('DB_PORT'),
+    }
+
+
+def connect_with_retry(settings=None, max_retries=10, retry_delay=2):
+    """Établit une connexion directe avec retry (à utiliser uniquement au démarrage)"""
+    settings = settings or connection_settings_from_env()
+    for attempt in range(max_retries):
+        try:
+            conn = mysql.connector.connect(**settings)
+            print(f"✅ Connexion MySQL réussie (tentative {attempt + 1}/{max_retries})")
+            return conn
+        except mysql.connector.errors.DatabaseError as e:
+            if attempt < max_retries - 1:
+                print(f"⏳ MySQL pas encore prêt, nouvelle tentative dans {retry_delay}s...")
+                time.sleep(retry_delay)
+            else:
+                print(f"❌ Impossible de se connecter à MySQL après {max_retries} tentatives")
+                raise e
+
+
+class _Slot:
+    """Connexion physique et ses horodatages de cycle de vie"""
+
+    __slots__ = ('conn', 'created_at', 'released_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    """Pool de connexions borné (min_size..max_size).
+
+    - ``acquire`` attend au plus ``timeout`` secondes une connexion libre puis
+      lève ``PoolExhaustedError`` ;
+    - une connexion restée inactive plus de ``ping_interval`` secondes est
+      vérifiée par un ping avant d'être prêtée (0 = ping à chaque emprunt) ;
+    - une connexion plus vieille que ``max_lifetime`` secondes est recyclée ;
+    - toute transaction encore ouverte est annulée au retour dans le pool.
+
+    ``connect`` ouvre une connexion (par défaut mysql.connector avec
+    ``settings``) ; ``errors`` : exceptions du pilote qui font écarter une connexion.
+    """
+
+    def __init__(self, settings, min_size=1, max_size=10, timeout=5.0,
+                 ping_interval=10.0, max_lifetime=1800.0, connect=None, errors=(mysql.connector.Error,)):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Taille de pool invalide')
+        self.settings = settings
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.max_lifetime = max_lifetime
+        self._connect = connect or (lambda: mysql.connector.connect(**settings))
+        self._errors = errors
+        self._cond = threading.Condition()
+        self._reset()
+
+    @classmethod
+    def from_env(cls, connect=None, errors=(mysql.connector.Error,)):
+        """Construit le pool à partir des variables DB_* et DB_POOL_*"""
+        return cls(
+            connection_settings_from_env(),
+            connect=connect,
+            errors=errors,
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', 10)),
+            max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+        )
+
+    def _reset(self):
+        # Les connexions héritées d'un processus parent (fork) ne sont pas
+        # réutilisées : le socket est partagé avec le parent.
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _open(self):
+        return _Slot(self._connect())
+
+    def _discard(self, slot):
+        try:
+            slot.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, slot, now):
+        return self.max_lifetime > 0 and now - slot.created_at >= self.max_lifetime
+
+    def _healthy(self, slot, now):
+        if self.ping_interval and now - slot.released_at < self.ping_interval:
+            return True
+        try:
+            slot.conn.ping(reconnect=False)
+            return True
+        except self._errors:
+            return False
+
+    def warmup(self):
+        """Ouvre les connexions jusqu'à min_size"""
+        with self._cond:
+            self._check_pid()
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                slot = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(slot)
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Emprunte une connexion; lève PoolExhaustedError après ``timeout`` secondes"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            slot = None
+            with self._cond:
+                self._check_pid()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(
+                            f'Pool de connexions saturé ({self.max_size} connexions)'
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    slot = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if slot is None:
+                try:
+                    slot = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._expired(slot, now) or not self._healthy(slot, now):
+                    self._discard(slot)
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    continue
+
+            with self._cond:
+                self._in_use[id(slot.conn)] = slot
+            return slot.conn
+
+    def release(self, conn):
+        """Rend une connexion au pool (les transactions ouvertes sont annulées)"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            slot = self._in_use.pop(id(conn), None)
+        if slot is None:
+            return
+
+        keep = not self._expired(slot, time.monotonic())
+        if keep:
+            try:
+                # Termine aussi le snapshot REPEATABLE READ d'une simple lecture
+                if conn.in_transaction:
+                    conn.rollback()
+            except self._errors:
+                keep = False
+
+        with self._cond:
+            if keep:
+                slot.released_at = time.monotonic()
+                self._idle.append(slot)
+            else:
+                self._size -= 1
+            self._cond.notify()
+        if not keep:
+            self._discard(slot)
+
+    def close_all(self):
+        """Ferme les connexions inactives du pool"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for slot in idle:
+            self._discard(slot)
+
+    def stats(self):
+        """Instantané de l'occupation du pool"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+            }
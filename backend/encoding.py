@@ -0,0 +1,96 @@
+"""Encodage des réponses : JSON compact et compression négociée.
+
+- ``dumps`` sérialise directement les lignes MySQL : date et datetime sont
+  écrits au format ISO par orjson (ou par ``json`` si orjson est absent), sans
+  conversion ligne par ligne en Python ;
+- ``FastJSONProvider`` branche ce sérialiseur sur ``jsonify`` (Flask et Quart) ;
+- ``negotiate`` / ``compress`` compressent les réponses JSON d'au moins
+  ``COMPRESS_MIN_SIZE`` octets en brotli (si le paquet est installé) ou gzip,
+  selon l'en-tête Accept-Encoding du client.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import measure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+# Par ordre de préférence à qualité égale
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # SUM() MySQL : entier si possible
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f'Type non sérialisable en JSON : {type(value).__name__}')
+
+
+def dumps(obj):
+    """JSON compact (UTF-8, octets) ; date / datetime en ISO 8601"""
+    with measure('serialize'):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de l'application (``app.json``) basé sur ``dumps``"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def negotiate(accept_encodings):
+    """Encodage à utiliser d'après Accept-Encoding (werkzeug MIMEAccept / Accept), ou None"""
+    best, best_quality = None, 0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    with measure('compress'):
+        if encoding == 'br':
+            return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+        # mtime=0 : même corps compressé pour une même réponse
+        return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compressible(status_code, mimetype, headers):
+    """Réponse candidate à la compression (le corps doit en plus atteindre COMPRESS_MIN_SIZE)"""
+    return status_code == 200 and mimetype == 'application/json' and 'Content-Encoding' not in headers
@@ -0,0 +1,441 @@
+"""Flux d'événements des tâches (Server-Sent Events) pour GET /api/tasks/stream.
+
+Les routes d'écriture publient un événement par tâche modifiée après le
+commit (``created``, ``updated``, ``status_changed``, ``deleted``) ; le hub le
+diffuse aux abonnés de l'utilisateur. Chaque abonné a une file bornée : un
+client trop lent est déconnecté et reprend au dernier événement reçu
+(en-tête Last-Event-ID) grâce à l'historique récent gardé par utilisateur.
+Si l'historique ne couvre plus ce point, un événement ``reset`` demande au
+client de recharger la liste complète.
+
+Le hub est propre à chaque processus ; les écritures servies par les autres
+workers (ou par manage.py : archivage, renumérotation) sont retrouvées par
+scrutation du flux de synchronisation (``poll_plan``) : toutes les
+``poll_interval`` secondes, une requête lit la data_version des utilisateurs
+abonnés dans ce processus, puis ``list_changes`` relit ce qui a changé depuis
+la version connue (événements ``updated`` et ``deleted``, ou ``reset`` au-delà
+de ``poll_limit`` changements). Les versions écrites par ce processus, déjà
+publiées, sont ignorées ; une écriture relue avant sa publication locale peut
+arriver deux fois, les événements décrivent l'état de la tâche et peuvent être
+rejoués sans effet.
+
+Chaque flux ouvert occupe un thread d'un worker gthread : au-delà de
+``max_streams`` flux par processus, l'abonnement est refusé (503, le client
+réessaie plus tard) pour garder des threads aux autres requêtes.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from admission import OverloadedError
+from sql_plan import Query
+from task_repository import list_changes, serialize_task
+
+TASK_EVENT_TYPES = ('created', 'updated', 'status_changed', 'deleted')
+BATCH_EVENT_TYPES = {'create': 'created', 'update': 'updated', 'status': 'status_changed', 'delete': 'deleted'}
+# Flux ouverts par processus en mode WSGI (EVENTS_MAX_STREAMS) : un thread
+# gthread chacun, comptés en plus des threads de l'admission (admission.wsgi_threads)
+WSGI_MAX_STREAMS = 8
+
+
+def format_sse(event):
+    """Encode un événement au format text/event-stream"""
+    data = json.dumps(event['data'], separators=(',', ':'), ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+RESET_MESSAGE = 'event: reset\ndata: {}\n\n'
+HEARTBEAT_MESSAGE = ': ping\n\n'
+RECONNECT_DELAY_MS = 3000
+# Id qu'aucune tâche ne dépasse (INT signé maximal) : curseur « après la version N » de list_changes
+MAX_TASK_ID = 2 ** 31 - 1
+
+
+class Subscription:
+    """Abonné servi par un thread (app.py)"""
+
+    def __init__(self, user_id, max_queue):
+        self.user_id = user_id
+        self.overflowed = False
+        self._queue = queue.Queue(max_queue)
+
+    def push(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Prochain événement, ou None après ``timeout`` secondes"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription:
+    """Abonné servi par la boucle asyncio (asgi_app.py)"""
+
+    def __init__(self, user_id, max_queue):
+        self.user_id = user_id
+        self.overflowed = False
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(max_queue)
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def push(self, event):
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+
+class _UserChannel:
+    __slots__ = ('subscribers', 'backlog', 'dropped_upto', 'version', 'local_versions')
+
+    def __init__(self, backlog):
+        self.subscribers = set()
+        self.backlog = deque(maxlen=backlog)
+        # Plus grand numéro d'événement sorti de l'historique
+        self.dropped_upto = 0
+        # data_version déjà diffusée aux abonnés (None : pas encore lue)
+        self.version = None
+        # Versions écrites par ce processus : déjà publiées, ignorées par la scrutation
+        self.local_versions = deque(maxlen=backlog)
+
+
+class EventHub:
+    """Diffusion des événements par utilisateur, avec historique pour la reprise"""
+
+    def __init__(self, queue_size=100, backlog=200, max_users=1024, heartbeat=15.0, max_streams=64,
+                 poll_interval=1.0, poll_limit=100):
+        self.queue_size = queue_size
+        self.backlog = backlog
+        self.max_users = max_users
+        self.heartbeat = heartbeat
+        self.max_streams = max_streams
+        self.poll_interval = poll_interval
+        self.poll_limit = poll_limit
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    @classmethod
+    def from_env(cls, max_streams):
+        """Construit le hub à partir des variables EVENTS_* (``max_streams`` : défaut de EVENTS_MAX_STREAMS)"""
+        return cls(
+            queue_size=int(os.getenv('EVENTS_QUEUE_SIZE', 100)),
+            backlog=int(os.getenv('EVENTS_BACKLOG', 200)),
+            max_users=int(os.getenv('EVENTS_MAX_USERS', 1024)),
+            heartbeat=float(os.getenv('EVENTS_HEARTBEAT', 15)),
+            max_streams=int(os.getenv('EVENTS_MAX_STREAMS', max_streams)),
+            poll_interval=float(os.getenv('EVENTS_POLL_INTERVAL', 1)),
+            poll_limit=int(os.getenv('EVENTS_POLL_LIMIT', 100)),
+        )
+
+    def _reset(self):
+        self._channels = OrderedDict()
+        self._seq = 0
+        self._evicted_upto = 0
+        # Les ids d'un autre processus (ou d'avant un redémarrage) ne sont jamais rejoués
+        self._instance = uuid.uuid4().hex[:8]
+        self._streams = 0
+        # Thread (ou tâche asyncio) de scrutation, démarré au premier abonnement du processus
+        self._poller = None
+        self.published = 0
+        self.dropped_subscribers = 0
+        self.rejected_streams = 0
+        self.polled_events = 0
+        self.poll_errors = 0
+
+    def _check_pid(self):
+        # Hub hérité d'un fork : ses abonnés et ses ids appartiennent au parent
+        if self._pid != os.getpid():
+            self._reset()
+            self._pid = os.getpid()
+
+    def _channel(self, user_id, create):
+        channel = self._channels.get(user_id)
+        if channel is None:
+            if not create:
+                return None
+            channel = self._channels[user_id] = _UserChannel(self.backlog)
+            self._evict()
+        else:
+            self._channels.move_to_end(user_id)
+        return channel
+
+    def _evict(self):
+        # Les utilisateurs sans abonné les moins récemment actifs perdent leur historique
+        while len(self._channels) > self.max_users:
+            for user_id, channel in self._channels.items():
+                if not channel.subscribers:
+                    break
+            else:
+                return
+            del self._channels[user_id]
+            self._evicted_upto = self._seq
+
+    def record_local_version(self, user_id, version):
+        """Version des données écrite par ce processus : la scrutation ne la republiera pas"""
+        if version is None:
+            return
+        with self._lock:
+            self._check_pid()
+            channel = self._channels.get(user_id)
+            if channel is not None:
+                channel.local_versions.append(version)
+
+    def publish(self, user_id, event_type, data, version=None):
+        """Diffuse un événement; à appeler après le commit de l'écriture.
+
+        ``version`` : data_version de l'écriture (TaskCounterDelta.version).
+        """
+        self.record_local_version(user_id, version)
+        with self._lock:
+            self._check_pid()
+            self._seq += 1
+            event = {'id': f'{self._instance}-{self._seq}', 'seq': self._seq, 'type': event_type, 'data': data}
+            channel = self._channel(user_id, create=True)
+            if len(channel.backlog) == channel.backlog.maxlen:
+                channel.dropped_upto = channel.backlog[0]['seq']
+            channel.backlog.append(event)
+            subscribers = list(channel.subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            subscriber.push(event)
+        return event
+
+    def publish_batch(self, user_id, results, version=None):
+        """Un événement par opération appliquée d'un lot (résultats de apply_batch)"""
+        self.record_local_version(user_id, version)
+        for index in sorted(results):
+            result = results[index]
+            if result['status'] >= 400:
+                continue
+            if result['op'] == 'delete':
+                self.publish(user_id, 'deleted', {'id': result['id']})
+            else:
+                self.publish(user_id, BATCH_EVENT_TYPES[result['op']], {'task': result['task']})
+
+    def _replay(self, channel, last_event_id):
+        """Événements postérieurs à ``last_event_id``, ou None si la reprise est impossible"""
+        if not last_event_id:
+            return []
+        instance, _, seq = last_event_id.partition('-')
+        if instance != self._instance or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if channel is None:
+            return [] if seq >= self._evicted_upto else None
+        if seq < channel.dropped_upto:
+            return None
+        return [event for event in channel.backlog if event['seq'] > seq]
+
+    def subscribe(self, user_id, version, last_event_id=None, asynchronous=False):
+        """Abonne un client; retourne (abonnement, événements à rejouer ou None si reset).
+
+        ``version`` : data_version de l'utilisateur lue avant l'abonnement,
+        point de départ de la scrutation. Lève OverloadedError au-delà de
+        ``max_streams`` flux ouverts dans le processus.
+        """
+        subscription_class = AsyncSubscription if asynchronous else Subscription
+        subscription = subscription_class(user_id, self.queue_size)
+        with self._lock:
+            self._check_pid()
+            if self._streams >= self.max_streams:
+                self.rejected_streams += 1
+                raise OverloadedError(RECONNECT_DELAY_MS / 1000)
+            replay = self._replay(self._channels.get(user_id), last_event_id)
+            channel = self._channel(user_id, create=True)
+            if not channel.subscribers:
+                channel.version = version
+            channel.subscribers.add(subscription)
+            self._streams += 1
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            channel = self._channels.get(subscription.user_id)
+            if channel is not None and subscription in channel.subscribers:
+                channel.subscribers.discard(subscription)
+                self._streams -= 1
+            if subscription.overflowed:
+                self.dropped_subscribers += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._channels),
+                'subscribers': self._streams,
+                'max_streams': self.max_streams,
+                'rejected_streams': self.rejected_streams,
+                'published': self.published,
+                'dropped_subscribers': self.dropped_subscribers,
+                'polled_events': self.polled_events,
+                'poll_errors': self.poll_errors,
+            }
+
+    # ============================================
+    # ÉCRITURES DES AUTRES PROCESSUS (scrutation)
+    # ============================================
+
+    def _watched(self):
+        """{user_id: version diffusée} des utilisateurs abonnés dans ce processus"""
+        with self._lock:
+            self._check_pid()
+            return {user_id: channel.version for user_id, channel in self._channels.items()
+                    if channel.subscribers and channel.version is not None}
+
+    def poll_plan(self):
+        """Plan : publie les écritures des autres processus pour les utilisateurs abonnés ici.
+
+        Une requête pour toutes les versions, puis une lecture de list_changes
+        par utilisateur dont la version a avancé. Retourne le nombre
+        d'événements publiés.
+        """
+        watched = self._watched()
+        if not watched:
+            return 0
+        placeholders = ', '.join(['%s'] * len(watched))
+        rows = yield Query(f'SELECT user_id, data_version FROM task_counters WHERE user_id IN ({placeholders})',
+                           list(watched), fetch='all')
+        published = 0
+        for row in rows:
+            user_id, version = row['user_id'], int(row['data_version'])
+            known = watched[user_id]
+            if version <= known:
+                continue
+            # Curseur (known, 1, MAX_TASK_ID) : tout ce dont change_seq > known
+            changes = yield from list_changes(user_id, (known, 1, MAX_TASK_ID), self.poll_limit + 1)
+            published += self._catch_up(user_id, known, version, changes)
+        return published
+
+    def _catch_up(self, user_id, known, version, changes):
+        with self._lock:
+            channel = self._channels.get(user_id)
+            # Canal remplacé ou déjà avancé entre-temps (nouvel abonnement après le départ des autres)
+            if channel is None or channel.version != known:
+                return 0
+            channel.version = max([version] + [row['change_seq'] for row in changes])
+            local = set(channel.local_versions)
+        if len(changes) > self.poll_limit:
+            events = [('reset', {})]
+        else:
+            events = [('deleted', {'id': row['id']}) if row['deleted'] else ('updated', {'task': serialize_task(row)})
+                      for row in changes if row['change_seq'] not in local]
+        for event_type, data in events:
+            self.publish(user_id, event_type, data)
+        with self._lock:
+            self.polled_events += len(events)
+        return len(events)
+
+    def _poll_failed(self, error):
+        with self._lock:
+            self.poll_errors += 1
+        print(f"⚠️  Scrutation des événements en échec: {error}")
+
+    def start_poller(self, run):
+        """Démarre (une fois par processus) le thread qui exécute poll_plan avec ``run(plan)``"""
+        with self._lock:
+            self._check_pid()
+            if self._poller is not None or self.poll_interval <= 0:
+                return
+            self._poller = threading.Thread(target=self._poll_forever, args=(run,), name='task-events-poller',
+                                            daemon=True)
+        self._poller.start()
+
+    def _poll_forever(self, run):
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._watched():
+                continue
+            try:
+                run(self.poll_plan())
+            except Exception as e:
+                self._poll_failed(e)
+
+    def start_poller_async(self, run):
+        """Comme start_poller, sur la boucle asyncio en cours (``run`` : coroutine)"""
+        self._check_pid()
+        if self._poller is not None or self.poll_interval <= 0:
+            return
+        self._poller = asyncio.get_running_loop().create_task(self._poll_forever_async(run))
+
+    async def _poll_forever_async(self, run):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._watched():
+                continue
+            try:
+                await run(self.poll_plan())
+            except Exception as e:
+                self._poll_failed(e)
+
+    # ============================================
+    # FLUX text/event-stream
+    # ============================================
+
+    def _opening(self, replay):
+        # Délai de reconnexion du navigateur, puis rattrapage (ou reset)
+        opening = f'retry: {RECONNECT_DELAY_MS}\n\n'
+        if replay is None:
+            return opening + RESET_MESSAGE
+        return opening + ''.join(format_sse(event) for event in replay)
+
+    def _closing(self, subscription):
+        # Abonné trop lent : la file est vidée puis la connexion fermée ; le
+        # client reprend au dernier id reçu (rattrapage depuis l'historique)
+        events = []
+        event = subscription.get_nowait()
+        while event is not None:
+            events.append(format_sse(event))
+            event = subscription.get_nowait()
+        return ''.join(events)
+
+    def stream(self, subscription, replay):
+        """Générateur du flux SSE d'un abonné (thread)"""
+        try:
+            yield self._opening(replay)
+            while not subscription.overflowed:
+                event = subscription.get(self.heartbeat)
+                yield HEARTBEAT_MESSAGE if event is None else format_sse(event)
+            yield self._closing(subscription)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription, replay):
+        """Générateur du flux SSE d'un abonné (asyncio)"""
+        try:
+            yield self._opening(replay)
+            while not subscription.overflowed:
+                event = await subscription.get(self.heartbeat)
+                yield HEARTBEAT_MESSAGE if event is None else format_sse(event)
+            yield self._closing(subscription)
+        finally:
+            self.unsubscribe(subscription)
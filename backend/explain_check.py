@@ -0,0 +1,182 @@
+"""Contrôle des plans d'exécution des requêtes de lecture (python manage.py explain).
+
+Les requêtes de GET /api/tasks (chaque colonne et chaque ordre, avec et sans curseur),
+/api/tasks/stats, /api/tasks/upcoming, /api/tasks/calendar (comptes par jour),
+/api/tasks/archive, de l'ETag et de
+la recherche des tâches à archiver (manage.py archive) sont générées par leurs
+plans (voir sql_plan.py) puis passées à EXPLAIN. Une requête échoue si MySQL
+parcourt toute une table ou tout un index, ou s'il doit trier (filesort) ou
+passer par une table temporaire : chaque tri doit suivre un index.
+
+Les recherches (/api/tasks/search) doivent passer par l'index FULLTEXT ; leur
+tri (pertinence ou date) porte sur les seules lignes trouvées et peut se faire
+hors index.
+
+Avec ``seed_users`` > 0, des utilisateurs temporaires et leurs tâches sont
+créés d'abord (puis supprimés) pour que l'optimiseur travaille sur une table
+représentative : sur une table presque vide, un parcours complet est moins
+cher et le contrôle n'aurait pas de sens.
+"""
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+from api_common import UPCOMING_DAYS
+from counters import read_data_version, read_stats, rebuild_counters
+from positions import sequential_keys
+from task_repository import (LIST_ORDERS, SEARCH_ORDERINGS, TASK_ORDERINGS, TASK_STATUSES, count_by_day,
+                             fetch_upcoming, find_archivable, list_archive, list_tasks, search_tasks, task_ordering)
+
+SEED_PREFIX = 'explain-check-'
+FORBIDDEN_ACCESS = {'ALL': 'parcours complet de la table', 'index': 'parcours complet d\'un index'}
+FORBIDDEN_EXTRA = {'Using filesort': 'tri hors index (filesort)', 'Using temporary': 'table temporaire'}
+SEARCH_PREFIX = 'search'
+
+
+def collect_queries(plan):
+    """Requêtes d'un plan de lecture, sans les exécuter (chaque résultat vaut None)"""
+    queries = []
+    try:
+        query = next(plan)
+        while True:
+            queries.append(query)
+            query = plan.send(None)
+    except StopIteration:
+        pass
+    return queries
+
+
+def _position(status, task, order):
+    return [getter(task) for _, _, _, getter in task_ordering(status, order)]
+
+
+def read_queries(user_id, sample_tasks):
+    """Requêtes à contrôler : liste de (nom, Query)"""
+    checked = [('etag data_version', read_data_version(user_id)),
+               ('stats', read_stats(user_id)),
+               ('upcoming', fetch_upcoming(user_id, UPCOMING_DAYS)),
+               ('calendar', count_by_day(user_id, date.today() - timedelta(days=31),
+                                         date.today() + timedelta(days=61))),
+               ('archive page', list_archive(user_id, None, 100)),
+               ('archivables', find_archivable(datetime.now() - timedelta(days=90), 500))]
+    for order in LIST_ORDERS:
+        for status in TASK_ORDERINGS:
+            name = f'tasks {status}' if order == 'date' else f'tasks {status} {order}'
+            checked.append((name, list_tasks(user_id, status, order=order)))
+            checked.append((f'{name} page', list_tasks(user_id, status, None, 100, order)))
+            for task in sample_tasks:
+                if status == 'all' or task['status'] == status:
+                    label = 'sans date' if task['start_date'] is None else 'avec date'
+                    after = _position(status, task, order)
+                    checked.append((f'{name} curseur ({label})', list_tasks(user_id, status, after, 100, order)))
+    for order in SEARCH_ORDERINGS:
+        # Les titres des données de contrôle commencent tous par « tâche »
+        checked.append((f'{SEARCH_PREFIX} {order}', search_tasks(user_id, 'tâch', order=order)))
+
+    queries = []
+    for name, plan in checked:
+        for index, query in enumerate(collect_queries(plan)):
+            queries.append((name if index == 0 else f'{name} #{index + 1}', query))
+    return queries
+
+
+def explain_problems(rows, search=False):
+    """Problèmes relevés dans les lignes d'un EXPLAIN (curseur dictionnaire)"""
+    problems = []
+    for row in rows:
+        if not row.get('table'):
+            continue
+        access = row.get('type')
+        if access in FORBIDDEN_ACCESS:
+            problems.append(f"{row['table']}: {FORBIDDEN_ACCESS[access]}")
+        if search and access != 'fulltext':
+            problems.append(f"{row['table']}: index FULLTEXT non utilisé")
+        extra = row.get('Extra') or ''
+        for marker, message in FORBIDDEN_EXTRA.items():
+            if marker in extra and not (search and marker == 'Using filesort'):
+                problems.append(f"{row['table']}: {message}")
+    return problems
+
+
+def check_queries(conn, user_id, sample_tasks):
+    """EXPLAIN de chaque requête; retourne une liste de (nom, index utilisés, problèmes)"""
+    cursor = conn.cursor(dictionary=True)
+    report = []
+    for name, query in read_queries(user_id, sample_tasks):
+        cursor.execute('EXPLAIN ' + query.sql, query.params)
+        rows = cursor.fetchall()
+        keys = ', '.join(str(row.get('key')) for row in rows if row.get('table'))
+        report.append((name, keys, explain_problems(rows, search=name.startswith(SEARCH_PREFIX))))
+    cursor.close()
+    return report
+
+
+def seed(conn, users, tasks_per_user, user_ids):
+    """Crée des utilisateurs temporaires et leurs tâches; leurs ids sont ajoutés à ``user_ids``"""
+    cursor = conn.cursor()
+    rng = random.Random(42)
+    today = date.today()
+    now = datetime.now().replace(microsecond=0)
+    for _ in range(users):
+        name = SEED_PREFIX + uuid.uuid4().hex[:12]
+        cursor.execute('INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)',
+                       (name, f'{name}@example.invalid', '!'))
+        user_id = cursor.lastrowid
+        user_ids.append(user_id)
+        conn.commit()
+        rows = []
+        positions = {status: iter(sequential_keys(tasks_per_user)) for status in TASK_STATUSES}
+        for i in range(tasks_per_user):
+            start_date = None if i % 5 == 0 else today + timedelta(days=rng.randint(-60, 60))
+            created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            status = rng.choice(TASK_STATUSES)
+            rows.append((user_id, f'tâche {i}', status, start_date, next(positions[status]), created, created))
+        cursor.executemany('''
+            INSERT INTO tasks (user_id, title, status, start_date, position, createdAt, updatedAt)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ''', rows)
+        conn.commit()
+        rebuild_counters(conn, user_id)
+    for table in ('tasks', 'task_counters', 'task_date_buckets'):
+        cursor.execute(f'ANALYZE TABLE {table}')
+        cursor.fetchall()
+    cursor.close()
+
+
+def remove_seed(conn, user_ids):
+    if not user_ids:
+        return
+    cursor = conn.cursor()
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    # Tâches, compteurs et tombstones suivent par ON DELETE CASCADE
+    cursor.execute(f'DELETE FROM users WHERE id IN ({placeholders})', user_ids)
+    conn.commit()
+    cursor.close()
+
+
+def sample_positions(conn, user_id):
+    """Quelques tâches de l'utilisateur, avec et sans date, pour les requêtes avec curseur"""
+    cursor = conn.cursor(dictionary=True)
+    samples = []
+    for condition in ('start_date IS NOT NULL', 'start_date IS NULL'):
+        cursor.execute(f'''
+            SELECT id, status, start_date, position, createdAt FROM tasks
+            WHERE user_id = %s AND {condition}
+            ORDER BY id LIMIT 3
+        ''', (user_id,))
+        samples.extend(cursor.fetchall())
+    cursor.close()
+    return samples
+
+
+def run(conn, user_id=None, seed_users=20, tasks_per_user=500):
+    """Contrôle complet; retourne le rapport de check_queries"""
+    seeded = []
+    try:
+        if user_id is None:
+            # Rempli au fur et à mesure : un échec en cours de route est aussi nettoyé
+            seed(conn, seed_users, tasks_per_user, seeded)
+            user_id = seeded[len(seeded) // 2]
+        return check_queries(conn, user_id, sample_positions(conn, user_id))
+    finally:
+        remove_seed(conn, seeded)
@@ -0,0 +1,258 @@
+"""Import et export en masse des tâches d'un utilisateur (NDJSON et CSV).
+
+- Export (GET /api/tasks/export) : les lignes sont lues par lots sur un
+  curseur non bufferisé et encodées lot par lot (``export_chunk``) : la
+  mémoire ne dépend pas du nombre de tâches.
+- Import (POST /api/tasks/import) : ``TaskImportParser`` reçoit le corps de
+  la requête au fil de la lecture (``feed``) et retourne les enregistrements
+  complets, validés comme une création du lot (validate_batch_operation). Les
+  tâches valides sont insérées par morceaux de ``IMPORT_CHUNK_SIZE``, une
+  transaction par morceau (task_repository.import_tasks) ; la réponse est un
+  flux NDJSON d'événements (``error`` par ligne rejetée, ``progress`` après
+  chaque morceau validé, ``done`` à la fin).
+
+Le parseur ne fait aucune entrée/sortie : app.py et asgi_app.py lui passent
+les octets lus, chacun à sa manière.
+"""
+import csv
+import io
+import json
+import os
+
+from api_common import ApiError, validate_batch_operation
+from encoding import dumps
+from task_repository import TASK_FIELDS, TASK_ORDERINGS
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_COLUMNS = ('id', 'title', 'status', 'start_date', 'createdAt', 'updatedAt')
+# Content-Type acceptés par POST /api/tasks/import
+IMPORT_MIMETYPES = {'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson', 'text/csv': 'csv'}
+# Tâches insérées par transaction
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+# Octets lus à la fois dans le corps de la requête
+IMPORT_READ_SIZE = 64 * 1024
+# Taille max d'une ligne, et d'un enregistrement CSV sur plusieurs lignes (octets, lignes) : au-delà,
+# erreur sur la ligne et reprise à la ligne suivante ; la mémoire du parseur reste bornée
+IMPORT_MAX_RECORD_BYTES = 64 * 1024
+IMPORT_MAX_RECORD_LINES = 100
+TITLE_MAX_LENGTH = 255
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def parse_export_params(args):
+    """Paramètres de GET /api/tasks/export : (status, format)"""
+    status = args.get('status', 'all')
+    if status not in TASK_ORDERINGS:
+        raise ApiError('Status invalide. Valeurs acceptées: all, todo, in_progress, done')
+    fmt = args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        raise ApiError('Format invalide. Valeurs acceptées: ndjson, csv')
+    return status, fmt
+
+
+def export_headers(status, fmt):
+    """En-têtes de la réponse d'export (téléchargement d'un fichier)"""
+    return {'Content-Disposition': f'attachment; filename="tasks-{status}.{fmt}"'}
+
+
+def export_header(fmt):
+    """Début du fichier exporté (ligne d'en-tête CSV)"""
+    return _csv_line(EXPORT_COLUMNS) if fmt == 'csv' else b''
+
+
+def export_chunk(rows, fmt):
+    """Lot de lignes de tasks (TASK_COLUMNS) encodé dans le format ``fmt``"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for row in rows:
+            writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS])
+        return buffer.getvalue().encode('utf-8')
+    return b''.join(dumps({column: row[column] for column in EXPORT_COLUMNS}) + b'\n' for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(values)
+    return buffer.getvalue().encode('utf-8')
+
+
+# ============================================
+# IMPORT
+# ============================================
+
+def parse_import_format(mimetype, args):
+    """Format du corps de POST /api/tasks/import : Content-Type, sinon paramètre format"""
+    fmt = IMPORT_MIMETYPES.get(mimetype) or args.get('format')
+    if fmt not in EXPORT_FORMATS:
+        raise ApiError('Corps NDJSON (application/x-ndjson) ou CSV (text/csv) attendu', 415)
+    return fmt
+
+
+def import_event(event_type, **data):
+    """Ligne NDJSON de la réponse d'un import"""
+    return dumps(dict(type=event_type, **data)) + b'\n'
+
+
+def validate_import_record(item):
+    """Valide une tâche importée; retourne ((title, status, start_date), None) ou (None, erreur)"""
+    if not isinstance(item, dict):
+        return None, 'Objet JSON attendu'
+    fields = {key: item[key] for key in TASK_FIELDS if key in item}
+    operation, error = validate_batch_operation(dict(fields, op='create'))
+    if error:
+        return None, error
+    title = operation['fields']['title']
+    if not isinstance(title, str) or len(title) > TITLE_MAX_LENGTH:
+        return None, f'Le titre doit être un texte de {TITLE_MAX_LENGTH} caractères maximum'
+    fields = operation['fields']
+    return (title, fields['status'], fields['start_date']), None
+
+
+class TaskImportParser:
+    """Découpe incrémentale du corps d'un import en tâches validées.
+
+    ``feed`` et ``close`` retournent des (numéro de ligne, tâche, erreur) :
+    tâche = (title, status, start_date) si l'enregistrement est valide,
+    sinon erreur = message. Les lignes vides sont ignorées. En CSV, la
+    première ligne est l'en-tête (colonne ``title`` obligatoire, ``status`` et
+    ``start_date`` facultatives, les autres ignorées) et un champ entre
+    guillemets peut contenir des retours à la ligne. Une ligne de plus de
+    ``IMPORT_MAX_RECORD_BYTES`` octets, ou un enregistrement CSV de plus de
+    ``IMPORT_MAX_RECORD_LINES`` lignes ou ``IMPORT_MAX_RECORD_BYTES`` octets
+    (guillemet jamais fermé), est rejeté et la lecture reprend à la ligne
+    suivante.
+    """
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.line = 0
+        self.valid = 0
+        self.failed = 0
+        self._buffer = b''
+        # Ligne trop longue déjà rejetée : octets ignorés jusqu'au prochain retour à la ligne
+        self._skipping = False
+        self._columns = None
+        # Lignes d'un enregistrement CSV dont un guillemet n'est pas encore fermé
+        self._record = []
+        self._record_line = 0
+        self._record_size = 0
+        # Nombre impair de guillemets lus dans l'enregistrement en cours
+        self._quote_open = False
+
+    def feed(self, data):
+        if self._skipping:
+            end = data.find(b'\n')
+            if end < 0:
+                return []
+            data = data[end + 1:]
+            self._skipping = False
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\n')
+        outcomes = self._parse(lines)
+        if len(self._buffer) > IMPORT_MAX_RECORD_BYTES:
+            # Ligne déjà trop longue sans sa fin : rejetée sans attendre le reste
+            self._buffer = b''
+            self._skipping = True
+            self.line += 1
+            outcomes.append(self._line_too_long())
+        return outcomes
+
+    def close(self):
+        """Fin du corps : dernière ligne sans retour à la ligne, enregistrement inachevé"""
+        lines = [self._buffer] if self._buffer else []
+        self._buffer = b''
+        outcomes = self._parse(lines)
+        if self._record:
+            self._record = []
+            outcomes.append(self._fail(self._record_line, 'Guillemet non fermé'))
+        return outcomes
+
+    def _fail(self, line, error):
+        self.failed += 1
+        return line, None, error
+
+    def _line_too_long(self):
+        # Un enregistrement CSV en cours est perdu avec sa ligne
+        line = self._record_line if self._record else self.line
+        self._record = []
+        return self._fail(line, f'Ligne trop longue ({IMPORT_MAX_RECORD_BYTES} octets maximum)')
+
+    def _parse(self, lines):
+        outcomes = []
+        for raw in lines:
+            self.line += 1
+            if len(raw) > IMPORT_MAX_RECORD_BYTES:
+                outcomes.append(self._line_too_long())
+                continue
+            try:
+                text = raw.decode('utf-8-sig' if self.line == 1 else 'utf-8').rstrip('\r')
+            except UnicodeDecodeError:
+                outcomes.append(self._fail(self.line, 'Encodage invalide (UTF-8 attendu)'))
+                continue
+
+            if self.fmt == 'csv':
+                line, item, error = self._csv_record(text, len(raw))
+                if error:
+                    outcomes.append(self._fail(line, error))
+                    continue
+                if line is None:
+                    continue
+            elif not text.strip():
+                continue
+            else:
+                line = self.line
+                try:
+                    item = json.loads(text)
+                except ValueError:
+                    outcomes.append(self._fail(line, 'JSON invalide'))
+                    continue
+
+            task, error = validate_import_record(item)
+            if error:
+                outcomes.append(self._fail(line, error))
+            else:
+                self.valid += 1
+                outcomes.append((line, task, None))
+        return outcomes
+
+    def _csv_record(self, text, size):
+        """(numéro de ligne, champs, erreur) d'un enregistrement complet, ou (None, None, None)"""
+        if not self._record:
+            if not text.strip():
+                return None, None, None
+            self._record_line = self.line
+            self._record_size = 0
+            self._quote_open = False
+        self._record.append(text)
+        self._record_size += size + 1
+        # Parité tenue ligne par ligne : seuls les guillemets de la nouvelle ligne sont comptés
+        if text.count('"') % 2:
+            self._quote_open = not self._quote_open
+        if self._quote_open:
+            # Guillemet impair : un champ continue sur la ligne suivante, dans la limite d'un enregistrement
+            if len(self._record) <= IMPORT_MAX_RECORD_LINES and self._record_size <= IMPORT_MAX_RECORD_BYTES:
+                return None, None, None
+            self._record = []
+            return self._record_line, None, (f'Guillemet non fermé après {IMPORT_MAX_RECORD_LINES} lignes '
+                                             f'ou {IMPORT_MAX_RECORD_BYTES} octets')
+        record = '\n'.join(self._record)
+        self._record = []
+
+        values = next(csv.reader([record]))
+        if self._columns is None:
+            if 'title' not in values:
+                raise ApiError('En-tête CSV sans colonne title')
+            self._columns = values
+            return None, None, None
+        # Champ vide = valeur par défaut (status todo, pas de date de début)
+        return self._record_line, {column: value for column, value in zip(self._columns, values) if value != ''}, None
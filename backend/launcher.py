@@ -0,0 +1,146 @@
+"""Lanceur de production (gunicorn) pour app.py ou asgi_app.py.
+
+Le processus maître initialise le schéma une seule fois, charge l'application
+(preload) puis démarre les workers par fork ; chaque worker ouvre ensuite ses
+propres connexions MySQL (les pools vérifient le pid après un fork).
+
+    python launcher.py                # WSGI : workers gthread
+    APP_MODE=asgi python launcher.py  # ASGI : workers uvicorn
+
+Signaux du maître :
+    HUP   relance les workers (les anciens terminent leurs requêtes en cours)
+    TERM  arrêt gracieux : plus de nouvelles connexions, les requêtes en cours
+          ont WEB_GRACEFUL_TIMEOUT secondes pour se terminer
+    TTIN / TTOU  ajoute / retire un worker
+"""
+import logging
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+from admission import ConcurrencyGate, wsgi_threads
+from events import WSGI_MAX_STREAMS
+
+APP_MODES = {
+    'wsgi': ('app', 'gthread'),
+    'asgi': ('asgi_app', 'uvicorn.workers.UvicornWorker'),
+}
+
+# Format gunicorn par défaut, chemin sans la chaîne de requête (%(U)s au lieu de
+# %(r)s) : le jeton de ?access_token= (flux SSE) n'apparaît pas dans le journal
+ACCESS_LOG_FORMAT = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+class StripQueryString(logging.Filter):
+    """Retire la chaîne de requête des lignes du journal d'accès d'uvicorn"""
+
+    def filter(self, record):
+        # Arguments d'uvicorn.access : (client, méthode, chemin complet, version HTTP, status)
+        if isinstance(record.args, tuple) and len(record.args) == 5:
+            client, method, path, version, status = record.args
+            record.args = (client, method, str(path).split('?', 1)[0], version, status)
+        return True
+
+
+def threads_from_env():
+    """Threads d'un worker gthread : WEB_THREADS, sinon de quoi remplir la barrière d'admission"""
+    gate = ConcurrencyGate.from_env()
+    needed = wsgi_threads(gate, int(os.getenv('EVENTS_MAX_STREAMS', WSGI_MAX_STREAMS)))
+    threads = int(os.getenv('WEB_THREADS', needed))
+    if gate.enabled and threads < needed:
+        print(f"⚠️  WEB_THREADS={threads} < {needed} : les requêtes en trop attendront dans la file "
+              f"d'accept de gunicorn au lieu de la file d'admission (pas de 503)")
+    return threads
+
+
+def server_options_from_env(mode):
+    """Options gunicorn lues depuis l'environnement (WEB_*)"""
+    _, worker_class = APP_MODES[mode]
+    return {
+        'bind': os.getenv('WEB_BIND', '0.0.0.0:5000'),
+        'workers': int(os.getenv('WEB_WORKERS', 2)),
+        # Workers uvicorn : une seule boucle, l'option ne s'applique pas
+        'threads': threads_from_env() if mode == 'wsgi' else 1,
+        'worker_class': worker_class,
+        'timeout': int(os.getenv('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(os.getenv('WEB_KEEPALIVE', 5)),
+        'max_requests': int(os.getenv('WEB_MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(os.getenv('WEB_MAX_REQUESTS_JITTER', 0)),
+        'preload_app': True,
+        'accesslog': '-',
+        'access_log_format': ACCESS_LOG_FORMAT,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+
+def _served_module(server):
+    """(mode, module de l'application servie s'il est chargé) d'après la classe de worker"""
+    for mode, (module_name, worker_class) in APP_MODES.items():
+        if worker_class == server.cfg.worker_class_str:
+            return mode, sys.modules.get(module_name)
+    return None, None
+
+
+def post_fork(server, worker):
+    """Dans le worker : ouvre ses connexions MySQL avant la première requête"""
+    # Workers uvicorn : leur journal d'accès n'utilise pas access_log_format
+    logging.getLogger('uvicorn.access').addFilter(StripQueryString())
+    mode, app_module = _served_module(server)
+    # Mode ASGI : le pool aiomysql est ouvert par before_serving, sur la boucle du worker
+    if mode == 'wsgi' and app_module is not None:
+        app_module.db_pool.warmup()
+
+
+def worker_exit(server, worker):
+    """Dans le worker : ferme proprement ses connexions à l'arrêt"""
+    mode, app_module = _served_module(server)
+    # Mode ASGI : pool aiomysql et exécuteur bcrypt fermés par after_serving
+    if mode == 'wsgi' and app_module is not None:
+        app_module.db_pool.close_all()
+        app_module.password_hasher.shutdown()
+
+
+class TaskManagerServer(BaseApplication):
+    """Application gunicorn configurée par code plutôt que par fichier"""
+
+    def __init__(self, mode, options):
+        self.mode = mode
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        module_name, _ = APP_MODES[self.mode]
+        return __import__(module_name).app
+
+
+def main():
+    mode = os.getenv('APP_MODE', 'wsgi')
+    if mode not in APP_MODES:
+        print(f"❌ APP_MODE invalide: {mode} (valeurs acceptées: {', '.join(APP_MODES)})")
+        return 1
+
+    print(f"🚀 Démarrage de l'application ({mode}) avec gunicorn...")
+    print("=" * 60)
+
+    # Schéma initialisé une seule fois, dans le maître, avant le fork des workers
+    from migrate import initialize_database
+    if not initialize_database():
+        print("❌ Échec de l'initialisation de la base de données")
+        return 1
+
+    options = server_options_from_env(mode)
+    print(f"🌐 {options['workers']} worker(s) {options['worker_class']} sur {options['bind']}")
+    print("=" * 60)
+    TaskManagerServer(mode, options).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
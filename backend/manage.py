@@ -0,0 +1,360 @@
+"""Commandes de maintenance du backend.
+
+Exemples :
+    python manage.py migrate
+    python manage.py migrate --status
+    python manage.py explain                 # plans des requêtes de lecture
+    python manage.py counters verify
+    python manage.py counters rebuild --user 42
+    python manage.py tombstones compact --days 30
+    python manage.py tombstones compact --every 3600   # tâche périodique
+    python manage.py archive --days 90 --every 3600    # archivage des tâches terminées
+    python manage.py rebalance --length 24 --every 3600  # clés de position trop longues
+    python manage.py conformance             # suite de conformité du moteur configuré
+    python manage.py contract                # contrat HTTP commun de app.py et asgi_app.py
+    python manage.py admission               # barrière d'admission sous charge (threads)
+
+Le moteur de stockage est celui de STORAGE_BACKEND (voir storage.py).
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import admission_check
+import conformance
+import contract
+from counters import rebuild_counters, verify_counters
+import explain_check
+from migrate import current_version, discover, migrate
+from sql_plan import execute_plan
+from storage import active_storage
+from task_repository import (archive_tasks, compact_tombstones, find_archivable, find_long_positions,
+                             rebalance_column)
+
+
+def cmd_migrate(args):
+    conn = active_storage().connect()
+    try:
+        if args.status:
+            version = current_version(conn)
+            for number, name, _ in discover():
+                state = 'appliquée' if number <= version else 'en attente'
+                print(f"{number:04d} {name} : {state}")
+            return 0
+
+        applied = migrate(conn)
+        print(f"✅ {len(applied)} migration(s) appliquée(s), schéma en version {current_version(conn)}")
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_explain(args):
+    if args.user is None and args.seed_users < 1:
+        print("❌ --user ou --seed-users >= 1 requis")
+        return 2
+    if active_storage().name != 'mysql':
+        print("❌ Le contrôle des plans d'exécution (EXPLAIN) ne concerne que MySQL")
+        return 2
+
+    conn = active_storage().connect()
+    try:
+        report = explain_check.run(conn, args.user, args.seed_users, args.seed_tasks)
+    finally:
+        conn.close()
+
+    failures = 0
+    for name, keys, problems in report:
+        if problems:
+            failures += 1
+            print(f"❌ {name} [{keys}] : {'; '.join(problems)}")
+        else:
+            print(f"✅ {name} [{keys}]")
+    if failures:
+        print(f"❌ {failures} requête(s) sans plan indexé sur {len(report)}")
+        return 1
+    print(f"✅ {len(report)} requête(s) servies par un index")
+    return 0
+
+
+def cmd_counters(args):
+    conn = active_storage().connect()
+    try:
+        if args.action == 'rebuild':
+            rebuild_counters(conn, args.user)
+            print("✅ Compteurs recalculés depuis les tables tasks et tasks_archive")
+            return 0
+
+        drift = verify_counters(conn, args.user)
+        for item in drift:
+            print(f"⚠️  user {item['user_id']} {item['counter']}: "
+                  f"attendu {item['expected']}, stocké {item['stored']}")
+        if drift:
+            print(f"❌ {len(drift)} écart(s) détecté(s) (python manage.py counters rebuild pour corriger)")
+            return 1
+        print("✅ Compteurs cohérents avec la table tasks")
+        return 0
+    finally:
+        conn.close()
+
+
+def compact_once(days):
+    conn = active_storage().connect()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        purged = execute_plan(compact_tombstones(days), cursor)
+        conn.commit()
+        cursor.close()
+        print(f"🧹 {purged} tombstone(s) de plus de {days} jour(s) purgée(s)")
+    finally:
+        conn.close()
+
+
+def cmd_tombstones(args):
+    if not args.every:
+        compact_once(args.days)
+        return 0
+
+    while True:
+        try:
+            compact_once(args.days)
+        except Exception as e:
+            # La tâche périodique survit à une indisponibilité passagère de MySQL
+            print(f"❌ Purge des tombstones: {e}")
+        time.sleep(args.every)
+
+
+def archive_once(days, batch_size):
+    """Archive par lots de ``batch_size`` les tâches terminées depuis plus de ``days`` jours.
+
+    Une transaction par utilisateur et par lot : les verrous restent courts
+    et une interruption ne perd rien (le lot suivant reprend où on s'est arrêté).
+    """
+    cutoff = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    conn = active_storage().connect()
+    archived = 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            rows = execute_plan(find_archivable(cutoff, batch_size), cursor)
+            conn.rollback()
+            if not rows:
+                break
+            by_user = defaultdict(list)
+            for row in rows:
+                by_user[row['user_id']].append(row['id'])
+            moved = 0
+            for user_id, task_ids in by_user.items():
+                moved += execute_plan(archive_tasks(user_id, task_ids, cutoff), cursor)
+                conn.commit()
+            archived += moved
+            if not moved:
+                # Lot entièrement modifié entre-temps : il sera repris au prochain passage
+                break
+        cursor.close()
+        print(f"📦 {archived} tâche(s) terminée(s) depuis plus de {days} jour(s) archivée(s)")
+    finally:
+        conn.close()
+
+
+def cmd_archive(args):
+    if not args.every:
+        archive_once(args.days, args.batch)
+        return 0
+
+    while True:
+        try:
+            archive_once(args.days, args.batch)
+        except Exception as e:
+            print(f"❌ Archivage des tâches: {e}")
+        time.sleep(args.every)
+
+
+def rebalance_once(length, batch_size):
+    """Renumérote les colonnes dont une clé de position dépasse ``length`` caractères.
+
+    Une transaction par colonne ; l'ordre des tâches ne change pas.
+    """
+    conn = active_storage().connect()
+    done = set()
+    renumbered = 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            rows = execute_plan(find_long_positions(length, batch_size), cursor)
+            conn.rollback()
+            # Une colonne déjà renumérotée reste longue si elle compte trop de tâches pour ``length``
+            columns = {(row['user_id'], row['status']) for row in rows} - done
+            if not columns:
+                break
+            for user_id, status in columns:
+                renumbered += execute_plan(rebalance_column(user_id, status), cursor)
+                conn.commit()
+            done |= columns
+        cursor.close()
+        print(f"🔢 {len(done)} colonne(s) renumérotée(s) ({renumbered} tâche(s))")
+    finally:
+        conn.close()
+
+
+def cmd_rebalance(args):
+    if not args.every:
+        rebalance_once(args.length, args.batch)
+        return 0
+
+    while True:
+        try:
+            rebalance_once(args.length, args.batch)
+        except Exception as e:
+            print(f"❌ Renumérotation des positions: {e}")
+        time.sleep(args.every)
+
+
+def cmd_conformance(args):
+    storage = active_storage()
+    conn = storage.connect()
+    try:
+        # Schéma à jour d'abord : une base SQLite neuve est utilisable directement
+        migrate(conn)
+        report = conformance.run(conn)
+    finally:
+        conn.close()
+
+    for name, problems in report:
+        if problems:
+            print(f"❌ {name} :")
+            for problem in problems:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {name}")
+    if len(report) < len(conformance.CHECKS) or any(problems for _, problems in report):
+        print(f"❌ {storage.describe()} : suite de conformité en échec")
+        return 1
+    print(f"✅ {storage.describe()} : {len(report)} scénario(s) conformes")
+    return 0
+
+
+def cmd_contract(args):
+    # Schéma à jour d'abord, comme pour la suite de conformité
+    conn = active_storage().connect()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+    clients = [client for client in contract.available_clients() if args.app in ('all', client.name)]
+    if not clients:
+        print(f"❌ {args.app} : application indisponible avec {active_storage().describe()}")
+        return 1
+    results = [contract.run_app(client) for client in clients]
+    failed = False
+    for name, report, _ in results:
+        for scenario, problems in report:
+            if problems:
+                print(f"❌ {name} {scenario} :")
+                for problem in problems:
+                    print(f"   {problem}")
+            else:
+                print(f"✅ {name} {scenario}")
+        failed = failed or len(report) < len(contract.CHECKS) or any(problems for _, problems in report)
+    if len(results) > 1:
+        differences = contract.compare_transcripts(results)
+        for difference in differences:
+            print(f"❌ écart entre applications : {difference}")
+        failed = failed or bool(differences)
+    names = ', '.join(name for name, _, _ in results)
+    if failed:
+        print(f"❌ {names} : contrat HTTP non respecté")
+        return 1
+    print(f"✅ {names} : {len(contract.CHECKS)} scénario(s) conformes au contrat")
+    return 0
+
+
+def cmd_admission(args):
+    report = admission_check.run()
+    for name, problems in report:
+        if problems:
+            print(f"❌ {name} :")
+            for problem in problems:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {name}")
+    if any(problems for _, problems in report):
+        print("❌ barrière d'admission : scénario(s) en échec")
+        return 1
+    print(f"✅ barrière d'admission : {len(report)} scénario(s) conformes")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Maintenance du Task Manager')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrations = commands.add_parser('migrate', help='Appliquer les migrations du schéma en attente')
+    migrations.add_argument('--status', action='store_true', help='Lister les migrations sans rien appliquer')
+    migrations.set_defaults(func=cmd_migrate)
+
+    explain = commands.add_parser('explain', help='Vérifier que les lectures sont servies par un index (EXPLAIN)')
+    explain.add_argument('--user', type=int,
+                         help='Contrôler sur les tâches de cet utilisateur (sans données de test)')
+    explain.add_argument('--seed-users', type=int, default=20,
+                         help='Utilisateurs temporaires créés pour le contrôle (défaut : 20)')
+    explain.add_argument('--seed-tasks', type=int, default=500,
+                         help='Tâches par utilisateur temporaire (défaut : 500)')
+    explain.set_defaults(func=cmd_explain)
+
+    counters = commands.add_parser('counters', help='Vérifier ou recalculer les compteurs de tâches')
+    counters.add_argument('action', choices=['verify', 'rebuild'])
+    counters.add_argument('--user', type=int, help='Limiter à un utilisateur')
+    counters.set_defaults(func=cmd_counters)
+
+    tombstones = commands.add_parser('tombstones', help='Purger les traces des tâches supprimées')
+    tombstones.add_argument('action', choices=['compact'])
+    tombstones.add_argument('--days', type=int, default=int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30)),
+                            help='Rétention en jours (défaut : TOMBSTONE_RETENTION_DAYS ou 30)')
+    tombstones.add_argument('--every', type=int, default=0,
+                            help='Répéter toutes les N secondes (tâche périodique)')
+    tombstones.set_defaults(func=cmd_tombstones)
+
+    archive = commands.add_parser('archive', help='Déplacer les anciennes tâches terminées dans tasks_archive')
+    archive.add_argument('--days', type=int, default=int(os.getenv('ARCHIVE_AFTER_DAYS', 90)),
+                         help='Âge minimal (jours sans modification) des tâches terminées '
+                              '(défaut : ARCHIVE_AFTER_DAYS ou 90)')
+    archive.add_argument('--batch', type=int, default=int(os.getenv('ARCHIVE_BATCH_SIZE', 500)),
+                         help='Tâches lues par lot (défaut : ARCHIVE_BATCH_SIZE ou 500)')
+    archive.add_argument('--every', type=int, default=0,
+                         help='Répéter toutes les N secondes (tâche périodique)')
+    archive.set_defaults(func=cmd_archive)
+
+    rebalance = commands.add_parser('rebalance', help='Raccourcir les clés de position trop longues')
+    rebalance.add_argument('--length', type=int, default=int(os.getenv('POSITION_REBALANCE_LENGTH', 24)),
+                           help='Longueur de clé à partir de laquelle une colonne est renumérotée '
+                                '(défaut : POSITION_REBALANCE_LENGTH ou 24)')
+    rebalance.add_argument('--batch', type=int, default=100, help='Colonnes lues par lot (défaut : 100)')
+    rebalance.add_argument('--every', type=int, default=0,
+                           help='Répéter toutes les N secondes (tâche périodique)')
+    rebalance.set_defaults(func=cmd_rebalance)
+
+    checks = commands.add_parser('conformance', help='Exécuter la suite de conformité sur le moteur configuré')
+    checks.set_defaults(func=cmd_conformance)
+
+    http_contract = commands.add_parser('contract', help='Jouer le contrat HTTP sur app.py et asgi_app.py')
+    http_contract.add_argument('--app', choices=['all', 'wsgi', 'asgi'], default='all',
+                               help='Application à jouer (défaut : toutes celles que le moteur permet)')
+    http_contract.set_defaults(func=cmd_contract)
+
+    gate = commands.add_parser('admission', help='Vérifier la barrière d\'admission sous charge concurrente')
+    gate.set_defaults(func=cmd_admission)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
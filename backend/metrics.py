@@ -0,0 +1,367 @@
+"""Instrumentation des requêtes HTTP et exposition au format texte Prometheus.
+
+Pour chaque requête, une ``RequestTrace`` (portée par une ContextVar : un
+thread en WSGI, une tâche asyncio en ASGI) accumule le temps passé par phase :
+
+- ``jwt`` : décodage du token ;
+- ``auth_lookup`` : utilisateur courant (cache ou table ``users``) ;
+- ``db_acquire`` : attente d'une connexion du pool ;
+- ``db`` : exécution et lecture des requêtes SQL (curseur ``TimedCursor``) ;
+- ``bcrypt`` : hachage / vérification des mots de passe ;
+- ``serialize`` / ``compress`` : encodage JSON et compression de la réponse.
+
+Les phases peuvent s'imbriquer (``auth_lookup`` contient son ``db``). À la fin
+de la requête, ``RequestMetrics.finish`` reporte la trace dans les
+histogrammes par route (durée, phases, nombre de requêtes SQL, taille de la
+réponse) rendus par ``render`` pour ``GET /api/metrics``. Les métriques sont
+propres à chaque processus, comme les caches.
+
+Journal des requêtes lentes (désactivé par défaut) : au-delà de
+``METRICS_SLOW_REQUEST_MS``, la requête est affichée avec ses phases et le
+temps de chaque requête SQL ; une fraction ``METRICS_PROFILE_SAMPLE`` des
+requêtes est profilée (cProfile) pour joindre un profil au journal. En ASGI,
+le profil couvre aussi les autres tâches de la boucle pendant la requête.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+_current_trace = ContextVar('request_trace', default=None)
+# cProfile ne supporte qu'un profil actif à la fois par processus
+_profile_lock = threading.Lock()
+
+
+class RequestTrace:
+    """Temps et requêtes SQL d'une requête HTTP"""
+
+    __slots__ = ('started', 'phases', 'queries', 'query_log', 'profiler')
+
+    def __init__(self, record_queries=False):
+        self.started = perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.query_log = [] if record_queries else None
+        self.profiler = None
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.add_phase('db', seconds)
+        if self.query_log is not None:
+            self.query_log.append((' '.join(sql.split())[:200], seconds))
+
+
+def current_trace():
+    """Trace de la requête en cours, ou None (hors requête)"""
+    return _current_trace.get()
+
+
+@contextmanager
+def measure(phase):
+    """Ajoute la durée du bloc à la phase ``phase`` de la requête en cours"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(phase, perf_counter() - started)
+
+
+class TimedCursor:
+    """Curseur mysql.connector dont les requêtes et lectures sont comptées dans la trace"""
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, params=()):
+        started = perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            self._trace.add_query(sql, perf_counter() - started)
+
+    def executemany(self, sql, params):
+        started = perf_counter()
+        try:
+            return self._cursor.executemany(sql, params)
+        finally:
+            self._trace.add_query(sql, perf_counter() - started)
+
+    def _fetch(self, method, *args):
+        started = perf_counter()
+        try:
+            return getattr(self._cursor, method)(*args)
+        finally:
+            self._trace.add_phase('db', perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def fetchmany(self, size=1):
+        return self._fetch('fetchmany', size)
+
+
+class AsyncTimedCursor(TimedCursor):
+    """Équivalent de ``TimedCursor`` pour les curseurs aiomysql"""
+
+    async def execute(self, sql, params=()):
+        started = perf_counter()
+        try:
+            return await self._cursor.execute(sql, params)
+        finally:
+            self._trace.add_query(sql, perf_counter() - started)
+
+    async def executemany(self, sql, params):
+        started = perf_counter()
+        try:
+            return await self._cursor.executemany(sql, params)
+        finally:
+            self._trace.add_query(sql, perf_counter() - started)
+
+    async def _fetch(self, method, *args):
+        started = perf_counter()
+        try:
+            return await getattr(self._cursor, method)(*args)
+        finally:
+            self._trace.add_phase('db', perf_counter() - started)
+
+
+def timed_cursor(cursor):
+    """Curseur instrumenté pour la requête en cours (tel quel hors requête)"""
+    trace = _current_trace.get()
+    return cursor if trace is None else TimedCursor(cursor, trace)
+
+
+def timed_async_cursor(cursor):
+    trace = _current_trace.get()
+    return cursor if trace is None else AsyncTimedCursor(cursor, trace)
+
+
+# ============================================
+# REGISTRE ET FORMAT PROMETHEUS
+# ============================================
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes étiquetés, plus des jauges lues à la demande"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+        self._values = {}
+        self._gauges = []
+
+    def counter(self, name, help_text):
+        self._families[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        self._families[name] = ('histogram', help_text, buckets)
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self._families[name][2]
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            histogram = values.get(labels)
+            if histogram is None:
+                histogram = values[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_gauges(self, prefix, help_text, collect):
+        """Jauges ``<prefix>_<clé>`` lues dans le dictionnaire renvoyé par ``collect()``
+        (par exemple ``db_pool.stats``) ; les valeurs non numériques sont ignorées."""
+        self._gauges.append((prefix, help_text, collect))
+
+    def render(self):
+        """Toutes les métriques au format texte Prometheus (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in self._families.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in self._values.get(name, {}).items():
+                    if kind == 'counter':
+                        lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {value.count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(value.sum)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {value.count}')
+
+        for prefix, help_text, collect in self._gauges:
+            for key, value in collect().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{prefix}_{key}'
+                lines.append(f'# HELP {name} {help_text} ({key})')
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# ============================================
+# MÉTRIQUES PAR REQUÊTE
+# ============================================
+
+class RequestMetrics:
+    """Traces des requêtes HTTP et leurs métriques par route"""
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, slow_request_ms=0.0, profile_sample=0.0, profile_lines=25):
+        self.slow_request_ms = slow_request_ms
+        self.profile_sample = profile_sample
+        self.profile_lines = profile_lines
+        self.registry = MetricsRegistry()
+        self.registry.counter('http_requests_total', 'Requêtes HTTP traitées')
+        self.registry.histogram('http_request_duration_seconds', 'Durée de traitement des requêtes HTTP')
+        self.registry.histogram('http_response_size_bytes', 'Taille des corps de réponse', SIZE_BUCKETS)
+        self.registry.histogram('http_request_phase_seconds',
+                                'Temps par phase (jwt, auth_lookup, db_acquire, db, bcrypt, serialize, compress)',
+                                PHASE_BUCKETS)
+        self.registry.histogram('db_queries_per_request', 'Requêtes SQL par requête HTTP', QUERY_COUNT_BUCKETS)
+        self.registry.counter('http_slow_requests_total', 'Requêtes au-delà de METRICS_SLOW_REQUEST_MS')
+
+    @classmethod
+    def from_env(cls):
+        """Construit l'instrumentation à partir de METRICS_SLOW_REQUEST_MS, METRICS_PROFILE_SAMPLE
+        et METRICS_PROFILE_LINES"""
+        return cls(
+            slow_request_ms=float(os.getenv('METRICS_SLOW_REQUEST_MS', 0)),
+            profile_sample=float(os.getenv('METRICS_PROFILE_SAMPLE', 0)),
+            profile_lines=int(os.getenv('METRICS_PROFILE_LINES', 25)),
+        )
+
+    @property
+    def slow_log_enabled(self):
+        return self.slow_request_ms > 0
+
+    def start(self):
+        """Ouvre la trace de la requête en cours"""
+        trace = RequestTrace(record_queries=self.slow_log_enabled)
+        if self.slow_log_enabled and self.profile_sample > 0 and random.random() < self.profile_sample:
+            if _profile_lock.acquire(blocking=False):
+                trace.profiler = cProfile.Profile()
+                trace.profiler.enable()
+        _current_trace.set(trace)
+        return trace
+
+    def _stop_profiler(self, trace):
+        if trace.profiler is not None:
+            trace.profiler.disable()
+            _profile_lock.release()
+
+    def finish(self, route, method, status, size=None):
+        """Reporte la trace en cours dans les métriques; retourne-la (ou None)"""
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        elapsed = perf_counter() - trace.started
+        self._stop_profiler(trace)
+
+        registry = self.registry
+        labels = (('route', route), ('method', method))
+        registry.inc('http_requests_total', labels + (('status', str(status)),))
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        if size is not None:
+            registry.observe('http_response_size_bytes', labels, size)
+        registry.observe('db_queries_per_request', (('route', route),), trace.queries)
+        for phase, seconds in trace.phases.items():
+            registry.observe('http_request_phase_seconds', (('route', route), ('phase', phase)), seconds)
+
+        if self.slow_log_enabled and elapsed * 1000 >= self.slow_request_ms:
+            registry.inc('http_slow_requests_total', labels)
+            print(self.slow_report(trace, f'{method} {route}', status, elapsed))
+        trace.profiler = None
+        return trace
+
+    def clear(self):
+        """Ferme la trace (fin de requête, même après une erreur)"""
+        trace = _current_trace.get()
+        if trace is not None:
+            # Requête interrompue avant finish : le profil ne doit pas rester actif
+            self._stop_profiler(trace)
+            _current_trace.set(None)
+
+    def slow_report(self, trace, name, status, elapsed):
+        db_ms = trace.phases.get('db', 0.0) * 1000
+        lines = [f"🐢 Requête lente : {name} {elapsed * 1000:.1f} ms (status {status}, "
+                 f"{trace.queries} requête(s) SQL, {db_ms:.1f} ms en base)"]
+        if trace.phases:
+            phases = ', '.join(f'{phase} {seconds * 1000:.1f} ms' for phase, seconds in sorted(trace.phases.items()))
+            lines.append(f'   phases : {phases}')
+        for sql, seconds in trace.query_log or ():
+            lines.append(f'   SQL {seconds * 1000:8.1f} ms  {sql}')
+        if trace.profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(trace.profiler, stream=output).sort_stats('cumulative').print_stats(self.profile_lines)
+            lines.append('   profil :')
+            lines.extend('   ' + line for line in output.getvalue().strip().splitlines())
+        return '\n'.join(lines)
+
+    def register_gauges(self, prefix, help_text, collect):
+        self.registry.register_gauges(prefix, help_text, collect)
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,167 @@
+"""Migrations versionnées du schéma.
+
+Chaque fichier ``migrations/NNNN_nom.py`` définit ``upgrade(conn)`` (MySQL) et
+``upgrade_sqlite(conn)`` (voir storage.py) ; les versions appliquées sont
+enregistrées dans ``schema_version``. Au démarrage (``initialize_database``)
+ou via ``python manage.py migrate`` :
+
+- rien en attente : une seule requête (``SELECT MAX(version)``) ;
+- sinon les migrations manquantes sont appliquées dans l'ordre, sous un verrou
+  (``GET_LOCK`` pour MySQL, verrou de fichier pour SQLite) pour qu'un seul
+  processus migre à la fois (les autres attendent puis constatent que tout est
+  appliqué).
+
+Une migration doit rester rejouable : un arrêt entre son DDL et son
+enregistrement dans ``schema_version`` la fait simplement réexécuter. Les mises
+à jour de données passent par ``update_in_batches`` (lots bornés, un commit
+par lot) pour ne pas verrouiller toute une table.
+"""
+import importlib
+import os
+import pkgutil
+import re
+
+import migrations
+from storage import active_storage
+
+MIGRATION_LOCK_NAME = 'task_manager_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', 60))
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', 5000))
+
+_MIGRATION_NAME = re.compile(r'^(\d{4})_(\w+)$')
+
+
+class MigrationError(Exception):
+    """Migrations impossibles à appliquer (verrou indisponible, fichiers incohérents)."""
+
+
+def discover():
+    """Migrations disponibles, triées : liste de (version, nom, module)"""
+    found = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        match = _MIGRATION_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f'migrations.{info.name}')
+            if not (hasattr(module, 'upgrade') and hasattr(module, 'upgrade_sqlite')):
+                raise MigrationError(f"{info.name} doit définir upgrade et upgrade_sqlite")
+            found.append((int(match.group(1)), match.group(2), module))
+    found.sort(key=lambda migration: migration[0])
+
+    versions = [version for version, _, _ in found]
+    if versions != list(range(1, len(versions) + 1)):
+        raise MigrationError(f"Numéros de migration non consécutifs : {versions}")
+    return found
+
+
+def current_version(conn):
+    """Dernière version appliquée (0 si schema_version n'existe pas encore)"""
+    storage = active_storage()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        row = cursor.fetchone()
+    except storage.Error as e:
+        if not storage.missing_table(e):
+            raise
+        return 0
+    finally:
+        cursor.close()
+    return row[0] or 0
+
+
+def pending(conn, available=None):
+    available = discover() if available is None else available
+    version = current_version(conn)
+    return [migration for migration in available if migration[0] > version]
+
+
+def update_in_batches(conn, table, assignments, condition='1 = 1', batch_size=None):
+    """UPDATE ``table`` SET ``assignments`` WHERE ``condition``, par tranches d'id.
+
+    Chaque tranche est validée séparément : les verrous de ligne ne portent
+    jamais sur plus de ``batch_size`` ids. Retourne le nombre de lignes modifiées.
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table}')
+    first_id, last_id = cursor.fetchone()
+    updated = 0
+    if first_id is not None:
+        for start in range(first_id, last_id + 1, batch_size):
+            cursor.execute(f'''
+                UPDATE {table} SET {assignments}
+                WHERE id >= %s AND id < %s AND ({condition})
+            ''', (start, start + batch_size))
+            updated += cursor.rowcount
+            conn.commit()
+    cursor.close()
+    return updated
+
+
+def _apply(conn, version, name, module):
+    print(f"🔧 Migration {version:04d} {name}...")
+    getattr(module, active_storage().migration_function)(conn)
+    cursor = conn.cursor()
+    cursor.execute('INSERT INTO schema_version (version, name) VALUES (%s, %s)', (version, name))
+    conn.commit()
+    cursor.close()
+    print(f"✅ Migration {version:04d} appliquée")
+
+
+def migrate(conn, lock_timeout=None):
+    """Applique les migrations en attente; retourne la liste des versions appliquées"""
+    available = discover()
+    if not pending(conn, available):
+        return []
+
+    lock_timeout = MIGRATION_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+    storage = active_storage()
+    if not storage.acquire_lock(conn, MIGRATION_LOCK_NAME, lock_timeout):
+        raise MigrationError(f"Verrou de migration non obtenu après {lock_timeout}s")
+    applied = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(storage.schema_version_table)
+        cursor.close()
+        # Relu sous le verrou : un autre processus a pu migrer pendant l'attente
+        for version, name, module in pending(conn, available):
+            _apply(conn, version, name, module)
+            applied.append(version)
+    finally:
+        storage.release_lock(conn, MIGRATION_LOCK_NAME)
+    return applied
+
+
+def initialize_database():
+    """Met le schéma à jour au démarrage de app.py, asgi_app.py ou launcher.py.
+
+    Si rien n'est en attente, une seule requête est exécutée. Avec
+    MIGRATE_ON_START=false, les migrations sont laissées à
+    ``python manage.py migrate`` et le démarrage échoue si le schéma est en retard.
+    """
+    print("🔧 Vérification du schéma de la base de données...")
+    storage = active_storage()
+
+    try:
+        # Connexion directe : seul le démarrage attend que la base soit prête
+        conn = storage.connect()
+        try:
+            if os.getenv('MIGRATE_ON_START', 'true').lower() in ('1', 'true', 'yes'):
+                applied = migrate(conn)
+            else:
+                waiting = pending(conn)
+                if waiting:
+                    print(f"❌ {len(waiting)} migration(s) en attente : lancer python manage.py migrate")
+                    return False
+                applied = []
+        finally:
+            conn.close()
+    except (storage.Error, MigrationError) as e:
+        print(f"❌ Erreur lors de l'initialisation: {e}")
+        return False
+
+    if applied:
+        print(f"🎉 {len(applied)} migration(s) appliquée(s)")
+    else:
+        print("✅ Schéma à jour")
+    return True
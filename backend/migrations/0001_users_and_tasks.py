@@ -0,0 +1,60 @@
+"""Tables users et tasks (structure d'origine, avec date de début)."""
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            status ENUM('todo', 'in_progress', 'done') DEFAULT 'todo',
+            start_date DATE NULL,
+            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_user_id (user_id),
+            INDEX idx_status (status),
+            INDEX idx_start_date (start_date),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    cursor = conn.cursor()
+    # AUTOINCREMENT : un id supprimé n'est jamais réattribué (comme AUTO_INCREMENT),
+    # sans quoi une tombstone pourrait désigner une nouvelle tâche.
+    # NOCASE : noms d'utilisateur et emails comparés sans la casse (utf8mb4_unicode_ci).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) NOT NULL UNIQUE COLLATE NOCASE,
+            email VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            title VARCHAR(255) NOT NULL,
+            status VARCHAR(11) DEFAULT 'todo' CHECK (status IN ('todo', 'in_progress', 'done')),
+            start_date DATE NULL,
+            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_id ON tasks (user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON tasks (status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_start_date ON tasks (start_date)')
+    conn.commit()
+    cursor.close()
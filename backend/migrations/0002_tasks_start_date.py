@@ -0,0 +1,20 @@
+"""Colonne start_date pour les bases créées avant son introduction.
+
+Les tâches existantes reçoivent la date de leur création, par lots.
+"""
+from migrate import update_in_batches
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW COLUMNS FROM tasks LIKE 'start_date'")
+    if not cursor.fetchone():
+        cursor.execute('ALTER TABLE tasks ADD COLUMN start_date DATE NULL')
+        updated = update_in_batches(conn, 'tasks', 'start_date = DATE(createdAt)', 'start_date IS NULL')
+        print(f"✅ Dates de début initialisées pour {updated} tâche(s) existante(s)")
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    # Aucune base SQLite n'est antérieure à start_date (créée par 0001)
+    pass
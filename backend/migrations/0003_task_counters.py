@@ -0,0 +1,89 @@
+"""Compteurs matérialisés (task_counters, task_date_buckets), voir counters.py."""
+from sqlite_db import table_exists
+
+
+def _build_counters(conn):
+    """Premiers compteurs calculés depuis tasks (tables vides, schéma de cette migration)"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO task_counters (user_id, todo, in_progress, done, data_version)
+        SELECT user_id,
+               SUM(status = 'todo'),
+               SUM(status = 'in_progress'),
+               SUM(status = 'done'),
+               1
+        FROM tasks
+        GROUP BY user_id
+    ''')
+    cursor.execute('''
+        INSERT INTO task_date_buckets (user_id, start_date, open_count)
+        SELECT user_id, start_date, COUNT(*)
+        FROM tasks
+        WHERE status != 'done' AND start_date IS NOT NULL
+        GROUP BY user_id, start_date
+    ''')
+    conn.commit()
+    cursor.close()
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW TABLES LIKE 'task_counters'")
+    counters_exist = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_counters (
+            user_id INT PRIMARY KEY,
+            todo INT NOT NULL DEFAULT 0,
+            in_progress INT NOT NULL DEFAULT 0,
+            done INT NOT NULL DEFAULT 0,
+            data_version BIGINT NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_date_buckets (
+            user_id INT NOT NULL,
+            start_date DATE NOT NULL,
+            open_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, start_date),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    # Compteurs créés avant l'ajout de data_version (ETag)
+    cursor.execute("SHOW COLUMNS FROM task_counters LIKE 'data_version'")
+    if not cursor.fetchone():
+        cursor.execute('ALTER TABLE task_counters ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0')
+    cursor.close()
+
+    if not counters_exist:
+        _build_counters(conn)
+        print("✅ Compteurs de tâches calculés")
+
+
+def upgrade_sqlite(conn):
+    counters_exist = table_exists(conn, 'task_counters')
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_counters (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            todo INTEGER NOT NULL DEFAULT 0,
+            in_progress INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            data_version BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_date_buckets (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            start_date DATE NOT NULL,
+            open_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, start_date)
+        )
+    ''')
+    conn.commit()
+    cursor.close()
+
+    if not counters_exist:
+        _build_counters(conn)
+        print("✅ Compteurs de tâches calculés")
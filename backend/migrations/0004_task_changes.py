@@ -0,0 +1,67 @@
+"""Suivi des modifications pour GET /api/tasks/changes.
+
+updatedAt et change_seq sur tasks, table task_tombstones et horizon de
+purge ``tombstones_purged_seq`` ; updatedAt des tâches existantes = createdAt.
+"""
+from migrate import update_in_batches
+from sqlite_db import table_columns
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW COLUMNS FROM tasks LIKE 'change_seq'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            ALTER TABLE tasks
+                ADD COLUMN updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0,
+                ADD INDEX idx_user_change_seq (user_id, change_seq)
+        ''')
+        # updatedAt est fixé explicitement pour ne pas être remplacé par ON UPDATE
+        update_in_batches(conn, 'tasks', 'updatedAt = createdAt')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            user_id INT NOT NULL,
+            task_id INT NOT NULL,
+            change_seq BIGINT NOT NULL,
+            deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, task_id),
+            INDEX idx_tombstones_user_seq (user_id, change_seq),
+            INDEX idx_tombstones_deleted_at (deleted_at),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+    cursor.execute("SHOW COLUMNS FROM task_counters LIKE 'tombstones_purged_seq'")
+    if not cursor.fetchone():
+        cursor.execute('ALTER TABLE task_counters ADD COLUMN tombstones_purged_seq BIGINT NOT NULL DEFAULT 0')
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    cursor = conn.cursor()
+    if 'change_seq' not in table_columns(conn, 'tasks'):
+        # Pas de DEFAULT CURRENT_TIMESTAMP ni de ON UPDATE sur une colonne ajoutée :
+        # updatedAt est toujours fixé par les écritures (task_repository.py)
+        cursor.execute('ALTER TABLE tasks ADD COLUMN updatedAt TIMESTAMP')
+        cursor.execute('ALTER TABLE tasks ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0')
+        update_in_batches(conn, 'tasks', 'updatedAt = createdAt')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_change_seq ON tasks (user_id, change_seq)')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            task_id INTEGER NOT NULL,
+            change_seq BIGINT NOT NULL,
+            deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, task_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_user_seq ON task_tombstones (user_id, change_seq)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_deleted_at ON task_tombstones (deleted_at)')
+
+    if 'tombstones_purged_seq' not in table_columns(conn, 'task_counters'):
+        cursor.execute('ALTER TABLE task_counters ADD COLUMN tombstones_purged_seq BIGINT NOT NULL DEFAULT 0')
+    conn.commit()
+    cursor.close()
@@ -0,0 +1,77 @@
+"""Index composites des listes de tâches (voir TASK_ORDERINGS dans task_repository.py).
+
+- idx_user_status_start : colonnes To Do / In Progress, tâches sans date en
+  dernier grâce à la colonne générée no_start_date ;
+- idx_user_status_created : liste complète (status dans l'ordre de l'ENUM) et
+  colonne Done, createdAt / id décroissants ;
+- idx_user_start_date : tâches à venir (status lu dans l'index).
+
+Les index mono-colonne idx_user_id, idx_status et idx_start_date deviennent
+inutiles (la clé étrangère sur user_id s'appuie sur les nouveaux index).
+
+SQLite n'a pas d'ENUM : les mêmes index portent sur la colonne générée
+status_rank (rang de l'ENUM MySQL, voir sql_dialect.py).
+"""
+from sqlite_db import table_columns
+
+INDEXES = {
+    'idx_user_status_start': '(user_id, status, no_start_date, start_date, createdAt, id)',
+    'idx_user_status_created': '(user_id, status, createdAt DESC, id DESC)',
+    'idx_user_start_date': '(user_id, start_date, createdAt, status)',
+}
+OBSOLETE_INDEXES = ('idx_user_id', 'idx_status', 'idx_start_date')
+SQLITE_INDEXES = {
+    'idx_user_status_start': '(user_id, status_rank, no_start_date, start_date, createdAt, id)',
+    'idx_user_status_created': '(user_id, status_rank, createdAt DESC, id DESC)',
+    'idx_user_start_date': '(user_id, start_date, createdAt, status)',
+}
+
+
+def _existing_indexes(cursor):
+    cursor.execute('SHOW INDEX FROM tasks')
+    names = cursor.column_names.index('Key_name')
+    return {row[names] for row in cursor.fetchall()}
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW COLUMNS FROM tasks LIKE 'no_start_date'")
+    if not cursor.fetchone():
+        # Colonne virtuelle : rien n'est réécrit, seule l'entrée d'index est stockée
+        cursor.execute('''
+            ALTER TABLE tasks
+                ADD COLUMN no_start_date TINYINT AS (start_date IS NULL) VIRTUAL
+        ''')
+
+    existing = _existing_indexes(cursor)
+    changes = [f'ADD INDEX {name} {columns}' for name, columns in INDEXES.items() if name not in existing]
+    changes += [f'DROP INDEX {name}' for name in OBSOLETE_INDEXES if name in existing]
+    if changes:
+        # Une seule instruction : la clé étrangère n'est jamais sans index
+        cursor.execute(f"ALTER TABLE tasks {', '.join(changes)}")
+        print(f"✅ Index des tâches : {', '.join(changes)}")
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    columns = table_columns(conn, 'tasks')
+    cursor = conn.cursor()
+    if 'no_start_date' not in columns:
+        cursor.execute('''
+            ALTER TABLE tasks
+                ADD COLUMN no_start_date INTEGER GENERATED ALWAYS AS (start_date IS NULL) VIRTUAL
+        ''')
+    if 'status_rank' not in columns:
+        cursor.execute('''
+            ALTER TABLE tasks
+                ADD COLUMN status_rank INTEGER GENERATED ALWAYS AS (
+                    CASE status WHEN 'todo' THEN 1 WHEN 'in_progress' THEN 2 WHEN 'done' THEN 3 END
+                ) VIRTUAL
+        ''')
+    for name, index_columns in SQLITE_INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON tasks {index_columns}')
+    for name in OBSOLETE_INDEXES:
+        cursor.execute(f'DROP INDEX IF EXISTS {name}')
+    cursor.execute('ANALYZE tasks')
+    conn.commit()
+    cursor.close()
@@ -0,0 +1,48 @@
+"""Index FULLTEXT sur tasks.title pour GET /api/tasks/search.
+
+Le premier index FULLTEXT d'une table InnoDB ajoute la colonne cachée
+FTS_DOC_ID : la table est reconstruite une fois. Les mots plus courts que
+innodb_ft_min_token_size ne sont pas indexés (voir la commande du service
+MySQL dans docker-compose.yml).
+
+SQLite : table FTS5 ``tasks_fts`` adossée à tasks (contenu externe, seul
+l'index est stocké), tenue à jour par des triggers. Le tokenizer ignore la
+casse et les accents, comme la collation utf8mb4_unicode_ci.
+"""
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW INDEX FROM tasks WHERE Key_name = 'ft_tasks_title'")
+    if not cursor.fetchall():
+        cursor.execute('ALTER TABLE tasks ADD FULLTEXT INDEX ft_tasks_title (title)')
+        print("✅ Index FULLTEXT ft_tasks_title créé")
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+    conn.commit()
+    cursor.close()
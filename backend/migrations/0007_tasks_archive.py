@@ -0,0 +1,70 @@
+"""Archive des tâches terminées (voir ARCHIVAGE dans task_repository.py).
+
+- tasks_archive : mêmes colonnes que tasks (ids conservés) + archivedAt,
+  parcourue par GET /api/tasks/archive dans l'ordre de idx_archive_user_created ;
+- idx_status_updated sur tasks : tâches terminées depuis plus de N jours,
+  recherchées par ``manage.py archive`` ;
+- task_counters.archived : nombre de tâches archivées par utilisateur.
+
+Une table séparée plutôt qu'un partitionnement de tasks : InnoDB refuse les
+clés étrangères sur une table partitionnée.
+"""
+from sqlite_db import table_columns
+
+
+def _existing_indexes(cursor):
+    cursor.execute('SHOW INDEX FROM tasks')
+    names = cursor.column_names.index('Key_name')
+    return {row[names] for row in cursor.fetchall()}
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            status ENUM('todo', 'in_progress', 'done') DEFAULT 'done',
+            start_date DATE NULL,
+            createdAt TIMESTAMP NULL,
+            updatedAt TIMESTAMP NULL,
+            archivedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_archive_user_created (user_id, createdAt DESC, id DESC),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+    if 'idx_status_updated' not in _existing_indexes(cursor):
+        cursor.execute('ALTER TABLE tasks ADD INDEX idx_status_updated (status, updatedAt)')
+
+    cursor.execute("SHOW COLUMNS FROM task_counters LIKE 'archived'")
+    if not cursor.fetchone():
+        cursor.execute('ALTER TABLE task_counters ADD COLUMN archived INT NOT NULL DEFAULT 0')
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            title VARCHAR(255) NOT NULL,
+            status VARCHAR(11) DEFAULT 'done' CHECK (status IN ('todo', 'in_progress', 'done')),
+            start_date DATE NULL,
+            createdAt TIMESTAMP NULL,
+            updatedAt TIMESTAMP NULL,
+            archivedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archive_user_created
+        ON tasks_archive (user_id, createdAt DESC, id DESC)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_updated ON tasks (status, updatedAt)')
+
+    if 'archived' not in table_columns(conn, 'task_counters'):
+        cursor.execute('ALTER TABLE task_counters ADD COLUMN archived INTEGER NOT NULL DEFAULT 0')
+    conn.commit()
+    cursor.close()
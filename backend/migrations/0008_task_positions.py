@@ -0,0 +1,90 @@
+"""Ordre manuel des tâches dans les colonnes (voir positions.py).
+
+- tasks.position : clé fractionnaire, comparée octet par octet (ascii_bin) ;
+  les tâches existantes reçoivent des clés dans l'ordre actuel de leur
+  colonne (date de début pour To Do / In Progress, création décroissante
+  pour Done), une transaction par utilisateur qui incrémente aussi sa
+  data_version (caches des listes, synchronisation par delta) ;
+- idx_user_status_position : chaque colonne dans l'ordre manuel, parcours
+  d'une seule plage d'index ;
+- tasks_archive.position : l'archive garde les mêmes colonnes que tasks.
+"""
+from positions import sequential_keys
+from sqlite_db import table_columns
+
+# Ordre des colonnes au moment de la migration (TASK_ORDERINGS, migration 0005)
+COLUMN_ORDERS = {
+    'todo': 'no_start_date, start_date, createdAt, id',
+    'in_progress': 'no_start_date, start_date, createdAt, id',
+    'done': 'createdAt DESC, id DESC',
+}
+
+
+def _existing_indexes(cursor):
+    cursor.execute('SHOW INDEX FROM tasks')
+    names = cursor.column_names.index('Key_name')
+    return {row[names] for row in cursor.fetchall()}
+
+
+def _assign_positions(conn):
+    """Clés dans l'ordre actuel de chaque colonne, pour les tâches qui n'en ont pas"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT user_id FROM tasks WHERE position = ''")
+    user_ids = [row[0] for row in cursor.fetchall()]
+    for user_id in user_ids:
+        # Nouvelle version des données : listes en cache et clients synchronisés reçoivent les positions
+        cursor.execute('UPDATE task_counters SET data_version = data_version + 1 WHERE user_id = %s', (user_id,))
+        for status, order_by in COLUMN_ORDERS.items():
+            cursor.execute(f'''
+                SELECT id FROM tasks
+                WHERE user_id = %s AND status = %s
+                ORDER BY {order_by}
+            ''', (user_id, status))
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                # updatedAt recopié : ON UPDATE CURRENT_TIMESTAMP changerait l'âge d'archivage
+                cursor.executemany('''
+                    UPDATE tasks SET position = %s, updatedAt = updatedAt,
+                        change_seq = (SELECT data_version FROM task_counters WHERE user_id = %s)
+                    WHERE id = %s
+                ''', [(position, user_id, task_id) for position, task_id in zip(sequential_keys(len(ids)), ids)])
+        conn.commit()
+    cursor.close()
+    if user_ids:
+        print(f'✅ Positions attribuées aux tâches de {len(user_ids)} utilisateur(s)')
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW COLUMNS FROM tasks LIKE 'position'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            ALTER TABLE tasks
+                ADD COLUMN position VARCHAR(128) CHARACTER SET ascii COLLATE ascii_bin NOT NULL DEFAULT ''
+        ''')
+    cursor.execute("SHOW COLUMNS FROM tasks_archive LIKE 'position'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            ALTER TABLE tasks_archive
+                ADD COLUMN position VARCHAR(128) CHARACTER SET ascii COLLATE ascii_bin NOT NULL DEFAULT ''
+        ''')
+    if 'idx_user_status_position' not in _existing_indexes(cursor):
+        cursor.execute('ALTER TABLE tasks ADD INDEX idx_user_status_position (user_id, status, position)')
+    cursor.close()
+    _assign_positions(conn)
+
+
+def upgrade_sqlite(conn):
+    cursor = conn.cursor()
+    if 'position' not in table_columns(conn, 'tasks'):
+        cursor.execute("ALTER TABLE tasks ADD COLUMN position VARCHAR(128) NOT NULL DEFAULT ''")
+    if 'position' not in table_columns(conn, 'tasks_archive'):
+        cursor.execute("ALTER TABLE tasks_archive ADD COLUMN position VARCHAR(128) NOT NULL DEFAULT ''")
+    # Même ordre que l'ENUM MySQL : colonne générée status_rank (migration 0005)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_status_position
+        ON tasks (user_id, status_rank, position)
+    ''')
+    conn.commit()
+    cursor.close()
+    _assign_positions(conn)
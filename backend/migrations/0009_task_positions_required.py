@@ -0,0 +1,83 @@
+"""Clé de position obligatoire (suite de la migration 0008).
+
+Le DEFAULT '' de la migration 0008 laissait passer les insertions qui
+n'indiquent pas de position (jeux de données, scripts externes) : '' n'est pas
+une clé valide et bloquait tout ajout en fin de colonne.
+
+- les tâches sans clé reçoivent une clé après les tâches déjà ordonnées de
+  leur colonne, dans l'ordre par date de la colonne ; une transaction par
+  utilisateur qui incrémente aussi sa data_version ;
+- MySQL : plus de valeur par défaut, contrainte chk_tasks_position ;
+- SQLite (ADD COLUMN impose une valeur par défaut) : déclencheurs qui
+  refusent une position vide à l'insertion et à la modification.
+"""
+from positions import sequential_keys
+
+# Ordre par date des colonnes (TASK_ORDERINGS, migration 0005)
+COLUMN_ORDERS = {
+    'todo': 'no_start_date, start_date, createdAt, id',
+    'in_progress': 'no_start_date, start_date, createdAt, id',
+    'done': 'createdAt DESC, id DESC',
+}
+
+
+def _assign_missing_positions(conn):
+    """Renumérote chaque colonne qui contient des tâches sans clé : ordonnées d'abord, puis sans clé"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT user_id, status FROM tasks WHERE position = ''")
+    columns = {}
+    for user_id, status in cursor.fetchall():
+        columns.setdefault(user_id, []).append(status)
+    for user_id, statuses in columns.items():
+        cursor.execute('UPDATE task_counters SET data_version = data_version + 1 WHERE user_id = %s', (user_id,))
+        for status in statuses:
+            cursor.execute(f'''
+                SELECT id FROM tasks
+                WHERE user_id = %s AND status = %s
+                ORDER BY position = '', position, {COLUMN_ORDERS[status]}
+            ''', (user_id, status))
+            ids = [row[0] for row in cursor.fetchall()]
+            # updatedAt recopié : ON UPDATE CURRENT_TIMESTAMP changerait l'âge d'archivage
+            cursor.executemany('''
+                UPDATE tasks SET position = %s, updatedAt = updatedAt,
+                    change_seq = (SELECT data_version FROM task_counters WHERE user_id = %s)
+                WHERE id = %s
+            ''', [(position, user_id, task_id) for position, task_id in zip(sequential_keys(len(ids)), ids)])
+        conn.commit()
+    cursor.close()
+    if columns:
+        print(f'✅ Positions attribuées aux tâches sans clé de {len(columns)} utilisateur(s)')
+
+
+def upgrade(conn):
+    _assign_missing_positions(conn)
+    cursor = conn.cursor()
+    cursor.execute('ALTER TABLE tasks ALTER COLUMN position DROP DEFAULT')
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'tasks' AND CONSTRAINT_NAME = 'chk_tasks_position'
+    ''')
+    if not cursor.fetchone()[0]:
+        cursor.execute("ALTER TABLE tasks ADD CONSTRAINT chk_tasks_position CHECK (position <> '')")
+    cursor.close()
+
+
+def upgrade_sqlite(conn):
+    _assign_missing_positions(conn)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_position_insert BEFORE INSERT ON tasks
+        WHEN new.position = ''
+        BEGIN
+            SELECT RAISE(ABORT, 'position vide');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_position_update BEFORE UPDATE OF position ON tasks
+        WHEN new.position = ''
+        BEGIN
+            SELECT RAISE(ABORT, 'position vide');
+        END
+    ''')
+    conn.commit()
+    cursor.close()
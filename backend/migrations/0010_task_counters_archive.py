@@ -0,0 +1,81 @@
+"""Compteurs recalculés avec l'archive (suite des migrations 0003 et 0007).
+
+La migration 0003 calcule les premiers compteurs avec le schéma de l'époque,
+sans tasks_archive ni colonne archived. Cette migration les recalcule depuis
+tasks et tasks_archive, SQL figé ici plutôt que ``counters.rebuild_counters``
+(le code vivant peut changer après la migration) :
+
+- par tranches de ``USERS_PER_BATCH`` utilisateurs, une transaction par
+  tranche : les verrous ne portent jamais sur toute la table ;
+- les lignes de task_counters sont conservées et leur data_version
+  incrémentée (elle ne doit jamais reculer : ETag, synchronisation par delta).
+"""
+USERS_PER_BATCH = 100
+
+# Début de la clause d'upsert sur user_id et valeur proposée par l'INSERT, par moteur
+UPSERTS = {
+    'mysql': ('ON DUPLICATE KEY UPDATE', 'VALUES({})'),
+    'sqlite': ('ON CONFLICT (user_id) DO UPDATE SET', 'excluded.{}'),
+}
+
+
+def _upsert(engine, columns):
+    clause, inserted = UPSERTS[engine]
+    return f"{clause} {', '.join(f'{column} = {inserted.format(column)}' for column in columns)}"
+
+
+def _rebuild_counters(conn, engine):
+    cursor = conn.cursor()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    first_id, last_id = cursor.fetchone()
+    if first_id is None:
+        cursor.close()
+        return
+
+    users = 'user_id >= %s AND user_id < %s'
+    for start in range(first_id, last_id + 1, USERS_PER_BATCH):
+        bounds = (start, start + USERS_PER_BATCH)
+        cursor.execute(f'''
+            UPDATE task_counters
+            SET todo = 0, in_progress = 0, done = 0, archived = 0, data_version = data_version + 1
+            WHERE {users}
+        ''', bounds)
+        cursor.execute(f'DELETE FROM task_date_buckets WHERE {users}', bounds)
+        cursor.execute(f'''
+            INSERT INTO task_counters (user_id, todo, in_progress, done, data_version)
+            SELECT user_id,
+                   SUM(status = 'todo'),
+                   SUM(status = 'in_progress'),
+                   SUM(status = 'done'),
+                   1
+            FROM tasks
+            WHERE {users}
+            GROUP BY user_id
+            {_upsert(engine, ('todo', 'in_progress', 'done'))}
+        ''', bounds)
+        cursor.execute(f'''
+            INSERT INTO task_counters (user_id, archived, data_version)
+            SELECT user_id, COUNT(*), 1
+            FROM tasks_archive
+            WHERE {users}
+            GROUP BY user_id
+            {_upsert(engine, ('archived',))}
+        ''', bounds)
+        cursor.execute(f'''
+            INSERT INTO task_date_buckets (user_id, start_date, open_count)
+            SELECT user_id, start_date, COUNT(*)
+            FROM tasks
+            WHERE status != 'done' AND start_date IS NOT NULL AND {users}
+            GROUP BY user_id, start_date
+        ''', bounds)
+        conn.commit()
+    cursor.close()
+    print("✅ Compteurs de tâches recalculés avec l'archive")
+
+
+def upgrade(conn):
+    _rebuild_counters(conn, 'mysql')
+
+
+def upgrade_sqlite(conn):
+    _rebuild_counters(conn, 'sqlite')
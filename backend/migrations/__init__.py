@@ -0,0 +1,6 @@
+"""Migrations du schéma, appliquées dans l'ordre par migrate.py.
+
+Ajouter une migration : créer ``NNNN_nom.py`` (numéro suivant) avec les
+fonctions ``upgrade(conn)`` (MySQL) et ``upgrade_sqlite(conn)`` (SQLite, même
+schéma et mêmes index), rejouables sans erreur.
+"""
@@ -0,0 +1,164 @@
+"""Hachage bcrypt des mots de passe dans un pool de processus borné.
+
+bcrypt est volontairement lent : exécuté sur le thread de la requête, une
+vague de connexions occupe tous les workers et retarde les routes des tâches.
+``PasswordHasher`` envoie ce travail à quelques processus dédiés et limite le
+nombre d'opérations en attente : au-delà, ``PasswordHasherBusyError`` est levée
+(réponse 503) au lieu d'allonger la file.
+
+Le coût (BCRYPT_LOG_ROUNDS) est réglable ; un hash stocké avec un autre coût
+est signalé par ``needs_rehash`` pour être recalculé à la connexion suivante.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from metrics import measure
+
+
+class PasswordHasherBusyError(Exception):
+    """Trop d'opérations de mot de passe en attente."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Hash corrompu ou d'un autre format
+        return False
+
+
+def hash_cost(password_hash):
+    """Coût d'un hash bcrypt ($2b$12$...), ou None s'il est illisible"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Pool de ``workers`` processus, au plus ``max_pending`` opérations en cours ou en file"""
+
+    def __init__(self, rounds=12, workers=2, max_pending=16):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit le pool à partir de BCRYPT_LOG_ROUNDS, PASSWORD_WORKERS et PASSWORD_MAX_PENDING"""
+        return cls(
+            rounds=int(os.getenv('BCRYPT_LOG_ROUNDS', 12)),
+            workers=int(os.getenv('PASSWORD_WORKERS', 2)),
+            max_pending=int(os.getenv('PASSWORD_MAX_PENDING', 16)),
+        )
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Pool hérité d'un fork (workers gunicorn) : inutilisable, on en recrée un
+                self._executor = None
+                self.pending = 0
+                self._pid = os.getpid()
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusyError(f"{self.pending} opérations de mot de passe en attente")
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def hash(self, password):
+        """Hash bcrypt du mot de passe au coût configuré"""
+        with measure('bcrypt'):
+            return self._submit(_hash, password, self.rounds).result()
+
+    def check(self, password_hash, password):
+        with measure('bcrypt'):
+            return self._submit(_check, password_hash, password).result()
+
+    async def hash_async(self, password):
+        with measure('bcrypt'):
+            return await asyncio.wrap_future(self._submit(_hash, password, self.rounds))
+
+    async def check_async(self, password_hash, password):
+        with measure('bcrypt'):
+            return await asyncio.wrap_future(self._submit(_check, password_hash, password))
+
+    def needs_rehash(self, password_hash):
+        """True si le hash n'a pas été calculé avec le coût configuré"""
+        return hash_cost(password_hash) != self.rounds
+
+    def _count_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def upgrade(self, password_hash, password):
+        """Nouveau hash au coût configuré si nécessaire, sinon None.
+
+        À appeler après une vérification réussie ; si le pool est saturé la
+        mise à niveau est simplement remise à une prochaine connexion.
+        """
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except PasswordHasherBusyError:
+            return None
+        self._count_rehash()
+        return new_hash
+
+    async def upgrade_async(self, password_hash, password):
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            new_hash = await self.hash_async(password)
+        except PasswordHasherBusyError:
+            return None
+        self._count_rehash()
+        return new_hash
+
+    def stats(self):
+        """Instantané de la file d'attente"""
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,143 @@
+"""Clés de position fractionnaires : ordre manuel des tâches dans une colonne.
+
+Une clé est une chaîne comparée octet par octet (collation ascii_bin en
+MySQL, BINARY en SQLite, comparaison de chaînes en Python). Entre deux clés
+``a < b`` il existe toujours une clé ``key_between(a, b)`` : déplacer une
+tâche ne réécrit que sa propre ligne, les autres gardent leur clé.
+
+Format (algorithme « fractional indexing » de D. Greenspan) : une partie
+entière de longueur variable, dont le premier caractère donne la longueur
+(``a`` : 1 chiffre, ``b`` : 2, ... ; ``Z``, ``Y``... pour les valeurs
+négatives), suivie d'une partie fractionnaire en base 62 sans zéro final.
+Ajouter en fin ou en tête de colonne incrémente la partie entière (``a0``,
+``a1``... ``az``, ``b00``) : la clé ne grandit que quand la partie entière
+change de longueur (après 62, puis 3 844, puis 238 328 ajouts). Insérer toujours au même endroit
+allonge la partie fractionnaire d'un caractère toutes les ~6 insertions ;
+``manage.py rebalance`` réattribue alors des clés courtes à la colonne.
+"""
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+# Plus petite partie entière : aucune clé ne peut la précéder
+SMALLEST_INTEGER = 'A' + DIGITS[0] * 26
+# Taille de la colonne position (migration 0008) : au-delà, la colonne est renumérotée
+POSITION_MAX_LENGTH = 128
+
+
+def _midpoint(a, b):
+    """Partie fractionnaire strictement entre ``a`` et ``b`` (b = None : sans borne haute)"""
+    zero = DIGITS[0]
+    if b is not None:
+        # Préfixe commun recopié, le milieu est cherché après
+        n = 0
+        while (a[n] if n < len(a) else zero) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Chiffres consécutifs
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head):
+    if 'a' <= head <= 'z':
+        return ord(head) - ord('a') + 2
+    if 'A' <= head <= 'Z':
+        return ord('Z') - ord(head) + 2
+    raise ValueError(f'Clé de position invalide : {head!r}')
+
+
+def _split(key):
+    """(partie entière, partie fractionnaire) d'une clé; ValueError si elle est invalide"""
+    if not key:
+        raise ValueError('Clé de position vide')
+    length = _integer_length(key[0])
+    integer, fraction = key[:length], key[length:]
+    if (len(integer) != length or key == SMALLEST_INTEGER or fraction.endswith(DIGITS[0])
+            or any(char not in DIGITS for char in key[1:])):
+        raise ValueError(f'Clé de position invalide : {key!r}')
+    return integer, fraction
+
+
+def _increment(integer):
+    """Partie entière suivante, ou None après la plus grande"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[0]
+    # Retenue sur toute la longueur : un chiffre de plus (ou de moins côté négatif)
+    if head == 'Z':
+        return 'a' + DIGITS[0]
+    if head == 'z':
+        return None
+    head = chr(ord(head) + 1)
+    if head > 'a':
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _decrement(integer):
+    """Partie entière précédente, ou None avant la plus petite"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[-1]
+    if head == 'a':
+        return 'Z' + DIGITS[-1]
+    if head == 'A':
+        return None
+    head = chr(ord(head) - 1)
+    if head < 'Z':
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def key_between(a, b):
+    """Clé strictement entre ``a`` et ``b`` (None : début ou fin de colonne).
+
+    Lève ValueError si une clé est invalide ou si ``a >= b``.
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f'Clés de position non ordonnées : {a!r} >= {b!r}')
+    if a is None:
+        if b is None:
+            return 'a' + DIGITS[0]
+        integer, fraction = _split(b)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint('', fraction)
+        if fraction:
+            return integer
+        return _decrement(integer)
+    integer, fraction = _split(a)
+    if b is None:
+        following = _increment(integer)
+        return integer + _midpoint(fraction, None) if following is None else following
+    integer_b, fraction_b = _split(b)
+    if integer == integer_b:
+        return integer + _midpoint(fraction, fraction_b)
+    following = _increment(integer)
+    if following is not None and following < b:
+        return following
+    return integer + _midpoint(fraction, None)
+
+
+def sequential_keys(count, after=None):
+    """``count`` clés croissantes après ``after`` (None : depuis le début), les plus courtes possibles"""
+    keys = []
+    for _ in range(count):
+        after = key_between(after, None)
+        keys.append(after)
+    return keys
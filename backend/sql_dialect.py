@@ -0,0 +1,133 @@
+"""Fragments SQL propres à chaque moteur de stockage (voir storage.py).
+
+Les plans (sql_plan.py) sont écrits une seule fois, en SQL commun aux deux
+moteurs. Les rares constructions qui diffèrent sont demandées au dialecte
+actif (``current_dialect()``) au moment de construire la requête :
+
+- date du jour et date dans N jours ;
+- upsert (``ON DUPLICATE KEY UPDATE`` / ``ON CONFLICT ... DO UPDATE``) et
+  valeur écrite par l'upsert, renvoyée sans relire la ligne ;
+- rang du status : l'ENUM MySQL se trie et se compare par son rang, SQLite
+  passe par la colonne générée ``status_rank`` (migration 0005) ;
+- recherche plein texte : index FULLTEXT MySQL / table FTS5 SQLite (migration 0006) ;
+- ids générés par une insertion multi-lignes.
+
+Les placeholders ``%s`` et ``FOR UPDATE`` restent écrits à la manière de
+MySQL : l'adaptateur SQLite s'en charge (voir sqlite_db.py).
+"""
+from sql_plan import Query
+
+STATUS_RANK = {'todo': 1, 'in_progress': 2, 'done': 3}
+
+
+class MySQLDialect:
+    name = 'mysql'
+    today = 'CURDATE()'
+    today_plus_days = 'DATE_ADD(CURDATE(), INTERVAL %s DAY)'
+    greatest = 'GREATEST'
+    analyze = 'ANALYZE TABLE'
+    # ENUM : trié dans l'ordre de déclaration, comparé par rang quand le paramètre est un entier
+    status_column = 'status'
+    search_source = 'tasks'
+    search_condition = 'MATCH(tasks.title) AGAINST (%s IN BOOLEAN MODE)'
+
+    def upsert(self, key):
+        """Début de la clause d'upsert sur la clé unique ``key``, suivi des affectations"""
+        return 'ON DUPLICATE KEY UPDATE'
+
+    def inserted(self, column):
+        """Valeur proposée par l'INSERT pour ``column``, dans la clause d'upsert"""
+        return f'VALUES({column})'
+
+    def upsert_returning(self, column, expression):
+        """Affectation ``column = expression`` d'un upsert qui renvoie la valeur écrite.
+
+        Retourne (affectation, fin de la requête, fetch du Query); la valeur se
+        lit ensuite avec ``returned_value``.
+        """
+        # LAST_INSERT_ID(expr) : la valeur revient comme lastrowid, dans la même réponse
+        return f'{column} = LAST_INSERT_ID({expression})', '', None
+
+    def returned_value(self, result, column, inserted):
+        """Valeur renvoyée par ``upsert_returning`` (``inserted`` : valeur de l'INSERT sans conflit)"""
+        # Ligne insérée : pas d'AUTO_INCREMENT dans la table, lastrowid vaut 0
+        return result or inserted
+
+    def status_value(self, status):
+        return status
+
+    def fulltext_query(self, terms):
+        """Mode booléen : chaque mot requis, en préfixe"""
+        return ' '.join(f'+{term}*' for term in terms)
+
+    def search_score(self, match):
+        """Expression de pertinence (plus grand = meilleur) et ses paramètres"""
+        return self.search_condition, [match]
+
+    def filter_selected(self, select, condition):
+        """``select`` restreint par ``condition`` sur ses colonnes calculées (alias)"""
+        return f'{select}\nHAVING {condition}'
+
+    def inserted_ids(self, lastrowid, count):
+        """Plan : ids d'une insertion multi-lignes (lastrowid = premier id généré)"""
+        row = yield Query('SELECT @@SESSION.auto_increment_increment AS step', fetch='one')
+        return [lastrowid + i * row['step'] for i in range(count)]
+
+
+class SQLiteDialect:
+    name = 'sqlite'
+    today = "date('now', 'localtime')"
+    today_plus_days = "date('now', 'localtime', '+' || %s || ' days')"
+    greatest = 'MAX'
+    analyze = 'ANALYZE'
+    status_column = 'status_rank'
+    search_source = 'tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid'
+    search_condition = 'tasks_fts MATCH %s'
+
+    def upsert(self, key):
+        return f'ON CONFLICT ({key}) DO UPDATE SET'
+
+    def inserted(self, column):
+        return f'excluded.{column}'
+
+    def upsert_returning(self, column, expression):
+        return f'{column} = {expression}', f'RETURNING {column}', 'one'
+
+    def returned_value(self, result, column, inserted):
+        return result[column]
+
+    def status_value(self, status):
+        return STATUS_RANK[status]
+
+    def fulltext_query(self, terms):
+        # Syntaxe FTS5 : mots entre guillemets (jamais lus comme opérateurs), * = préfixe
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def search_score(self, match):
+        # bm25 : plus petit = plus pertinent
+        return '-bm25(tasks_fts)', []
+
+    def filter_selected(self, select, condition):
+        # HAVING sans agrégat est refusé par SQLite
+        return f'SELECT * FROM ({select}) AS selected\nWHERE {condition}'
+
+    def inserted_ids(self, lastrowid, count):
+        """lastrowid = dernier id; l'écriture est exclusive en SQLite : les ids se suivent"""
+        yield from ()
+        return list(range(lastrowid - count + 1, lastrowid + 1))
+
+
+MYSQL = MySQLDialect()
+SQLITE = SQLiteDialect()
+
+_dialect = MYSQL
+
+
+def use_dialect(dialect):
+    """Dialecte des plans construits ensuite (appelé par storage.use_storage)"""
+    global _dialect
+    _dialect = dialect
+
+
+def current_dialect():
+    return _dialect
@@ -0,0 +1,79 @@
+"""Plans de requêtes SQL indépendants du pilote MySQL.
+
+Un plan est un générateur qui produit des ``Query`` et reçoit leur résultat ::
+
+    def rename_task(user_id, task_id, title):
+        row = yield Query('SELECT id FROM tasks WHERE id = %s AND user_id = %s',
+                          (task_id, user_id), fetch='one')
+        if row is None:
+            return False
+        yield Query('UPDATE tasks SET title = %s WHERE id = %s', (title, task_id))
+        return True
+
+Le même plan est exécuté par ``execute_plan`` (mysql.connector, app.py) ou par
+``execute_plan_async`` (aiomysql, asgi_app.py) : le SQL des deux modes de
+service est donc écrit une seule fois. Les curseurs doivent renvoyer des
+dictionnaires.
+"""
+
+
+class Query:
+    """Requête produite par un plan.
+
+    - ``fetch='one'`` / ``'all'`` : le plan reçoit la ligne / les lignes ;
+    - ``fetch=None`` : le plan reçoit ``lastrowid`` ;
+    - ``fetch='rowcount'`` : le plan reçoit le nombre de lignes touchées ;
+    - ``many=True`` : ``params`` est une liste de jeux de paramètres (executemany).
+    """
+
+    __slots__ = ('sql', 'params', 'fetch', 'many')
+
+    def __init__(self, sql, params=(), fetch=None, many=False):
+        self.sql = sql
+        self.params = params
+        self.fetch = fetch
+        self.many = many
+
+
+def execute_plan(plan, cursor):
+    """Exécute un plan avec un curseur synchrone et retourne sa valeur de retour"""
+    result = None
+    while True:
+        try:
+            query = plan.send(result)
+        except StopIteration as stop:
+            return stop.value
+        if query.many:
+            cursor.executemany(query.sql, query.params)
+        else:
+            cursor.execute(query.sql, query.params)
+        if query.fetch == 'one':
+            result = cursor.fetchone()
+        elif query.fetch == 'all':
+            result = cursor.fetchall()
+        elif query.fetch == 'rowcount':
+            result = cursor.rowcount
+        else:
+            result = cursor.lastrowid
+
+
+async def execute_plan_async(plan, cursor):
+    """Exécute un plan avec un curseur asyncio (aiomysql)"""
+    result = None
+    while True:
+        try:
+            query = plan.send(result)
+        except StopIteration as stop:
+            return stop.value
+        if query.many:
+            await cursor.executemany(query.sql, query.params)
+        else:
+            await cursor.execute(query.sql, query.params)
+        if query.fetch == 'one':
+            result = await cursor.fetchone()
+        elif query.fetch == 'all':
+            result = await cursor.fetchall()
+        elif query.fetch == 'rowcount':
+            result = cursor.rowcount
+        else:
+            result = cursor.lastrowid
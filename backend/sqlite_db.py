@@ -0,0 +1,147 @@
+"""Moteur SQLite embarqué (STORAGE_BACKEND=sqlite, voir storage.py).
+
+Les connexions imitent l'interface de mysql.connector utilisée par le reste du
+backend (``cursor(dictionary=True)``, ``commit``, ``rollback``,
+``in_transaction``, ``ping``), si bien que le pool de db_pool.py, les plans de
+sql_plan.py et les migrations les utilisent sans changement :
+
+- journal WAL : les lectures ne bloquent pas l'écriture en cours ;
+- requêtes préparées : le SQL est traduit une fois (``%s`` -> ``?``) et
+  sqlite3 garde les instructions compilées de chaque connexion en cache ;
+- ``SELECT ... FOR UPDATE`` (verrou de ligne MySQL) ouvre la transaction en
+  ``BEGIN IMMEDIATE`` : le verrou d'écriture de la base est pris avant la
+  lecture, les écritures concurrentes attendent (``busy_timeout``) ;
+- DATE / TIMESTAMP sont relues en ``date`` / ``datetime``, comme avec MySQL.
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_STATEMENT_CACHE = 256
+
+_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.IGNORECASE)
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """SQL écrit pour MySQL -> (SQL SQLite, verrou d'écriture demandé)"""
+    locking = _FOR_UPDATE.search(sql) is not None
+    if locking:
+        sql = _FOR_UPDATE.sub('', sql)
+    return sql.replace('%s', '?'), locking
+
+
+class SQLiteCursor:
+    """Curseur aux placeholders ``%s``; lignes en dictionnaires si ``dictionary``"""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    def execute(self, sql, params=()):
+        sql, locking = translate(sql)
+        if locking and not self._conn.raw.in_transaction:
+            self._cursor.execute('BEGIN IMMEDIATE')
+        self._cursor.execute(sql, tuple(params))
+        return self
+
+    def executemany(self, sql, params):
+        sql, _ = translate(sql)
+        self._cursor.executemany(sql, [tuple(row) for row in params])
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connexion sqlite3 avec l'interface de mysql.connector dont le backend a besoin"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        """Rien à vérifier : pas de serveur ni de socket"""
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path):
+    """Ouvre la base ``path`` (créée si absente) en mode WAL, clés étrangères actives"""
+    raw = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,  # une connexion ne sert qu'à une requête à la fois (pool)
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
+    raw.execute('PRAGMA journal_mode = WAL')
+    # Durable à chaque checkpoint du WAL, sans fsync à chaque commit
+    raw.execute('PRAGMA synchronous = NORMAL')
+    raw.execute('PRAGMA foreign_keys = ON')
+    return SQLiteConnection(raw)
+
+
+def table_columns(conn, table):
+    """Noms des colonnes de ``table`` (y compris les colonnes générées)"""
+    cursor = conn.cursor()
+    cursor.execute(f'PRAGMA table_xinfo({table})')
+    names = {row[1] for row in cursor.fetchall()}
+    cursor.close()
+    return names
+
+
+def table_exists(conn, name):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", (name,))
+    found = cursor.fetchone() is not None
+    cursor.close()
+    return found
@@ -0,0 +1,158 @@
+"""Moteur de stockage choisi par configuration (STORAGE_BACKEND).
+
+- ``mysql`` (défaut) : serveur MySQL 8, variables DB_* (voir db_pool.py) ;
+- ``sqlite`` : fichier SQLite embarqué ``SQLITE_PATH`` (voir sqlite_db.py),
+  sans serveur à démarrer : développement local et mesures de performance
+  (bench/) à moindre coût.
+
+Les routes ne connaissent que l'objet retourné par ``active_storage()`` :
+connexion de démarrage, pool des requêtes, exceptions du pilote et verrou des
+migrations. Le SQL des plans est commun aux deux moteurs, à quelques
+fragments près (sql_dialect.py) ; chaque migration fournit ``upgrade`` (MySQL)
+et ``upgrade_sqlite``. Les deux moteurs passent la même suite de conformité
+(``python manage.py conformance``, voir conformance.py).
+
+asgi_app.py (aiomysql) ne fonctionne qu'avec MySQL.
+"""
+import os
+import sqlite3
+import time
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import sqlite_db
+from db_pool import ConnectionPool, connect_with_retry
+from sql_dialect import MYSQL, SQLITE, use_dialect
+
+try:
+    import fcntl
+except ImportError:  # Windows : une seule instance à la fois
+    fcntl = None
+
+
+class MySQLStorage:
+    name = 'mysql'
+    dialect = MYSQL
+    Error = mysql.connector.Error
+    migration_function = 'upgrade'
+    schema_version_table = '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    '''
+
+    def describe(self):
+        return f"MySQL {os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+    def connect(self):
+        """Connexion directe avec retry (démarrage et manage.py)"""
+        return connect_with_retry()
+
+    def create_pool(self):
+        return ConnectionPool.from_env()
+
+    def missing_table(self, error):
+        return error.errno == errorcode.ER_NO_SUCH_TABLE
+
+    def acquire_lock(self, conn, name, timeout):
+        """Verrou consultatif nommé (GET_LOCK); False si non obtenu dans le délai"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT GET_LOCK(%s, %s)', (name, timeout))
+        acquired = cursor.fetchone()[0] == 1
+        cursor.close()
+        return acquired
+
+    def release_lock(self, conn, name):
+        cursor = conn.cursor()
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (name,))
+        cursor.fetchone()
+        cursor.close()
+
+
+class SQLiteStorage:
+    name = 'sqlite'
+    dialect = SQLITE
+    Error = sqlite3.Error
+    migration_function = 'upgrade_sqlite'
+    schema_version_table = '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._locks = {}
+
+    def describe(self):
+        return f'SQLite {self.path}'
+
+    def connect(self):
+        conn = sqlite_db.connect(self.path)
+        print(f"✅ Base SQLite ouverte ({self.path})")
+        return conn
+
+    def create_pool(self):
+        return ConnectionPool.from_env(connect=lambda: sqlite_db.connect(self.path), errors=(sqlite3.Error,))
+
+    def missing_table(self, error):
+        return isinstance(error, sqlite3.OperationalError) and 'no such table' in str(error)
+
+    def acquire_lock(self, conn, name, timeout):
+        """Verrou de fichier à côté de la base (les migrations valident en cours de route)"""
+        if fcntl is None or self.path == ':memory:':
+            return True
+        lock_file = open(f'{self.path}.{name}.lock', 'w')
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    return False
+                time.sleep(0.1)
+        self._locks[name] = lock_file
+        return True
+
+    def release_lock(self, conn, name):
+        lock_file = self._locks.pop(name, None)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+STORAGE_BACKENDS = ('mysql', 'sqlite')
+
+_storage = None
+
+
+def storage_from_env():
+    """Moteur décrit par STORAGE_BACKEND (et SQLITE_PATH pour sqlite)"""
+    name = os.getenv('STORAGE_BACKEND', 'mysql').lower()
+    if name == 'mysql':
+        return MySQLStorage()
+    if name == 'sqlite':
+        return SQLiteStorage(os.getenv('SQLITE_PATH', 'task_manager.db'))
+    raise ValueError(f"STORAGE_BACKEND invalide: {name} (valeurs acceptées: {', '.join(STORAGE_BACKENDS)})")
+
+
+def use_storage(storage):
+    """Active ``storage`` pour le processus (dialecte des plans compris)"""
+    global _storage
+    _storage = storage
+    use_dialect(storage.dialect)
+    return storage
+
+
+def active_storage():
+    """Moteur du processus, lu depuis l'environnement au premier appel"""
+    if _storage is None:
+        use_storage(storage_from_env())
+    return _storage
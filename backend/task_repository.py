@@ -0,0 +1,950 @@
+"""Accès aux données de la table tasks.
+
+Toutes les requêtes sur ``tasks`` passent par ce module : listes triées et
+paginées, écritures et lots. Les fonctions sont des plans (voir sql_plan.py)
+exécutés par app.py ou asgi_app.py sur la connexion de la requête ; les
+écritures s'exécutent dans la transaction en cours (le commit reste à la
+charge de l'appelant) et tiennent à jour les compteurs de counters.py.
+
+Les écritures ne relisent jamais la tâche : la réponse est construite à partir
+des valeurs déjà connues (ligne verrouillée + modifications, ou valeurs insérées).
+
+Dans chaque colonne, ``position`` (clé fractionnaire, voir positions.py)
+donne l'ordre manuel du tableau : une tâche déplacée reçoit une clé entre
+celles de ses nouvelles voisines, les autres lignes ne changent pas (voir
+ORDRE MANUEL).
+
+Les tâches terminées depuis longtemps quittent ``tasks`` pour ``tasks_archive``
+(voir ARCHIVAGE) : les listes, les compteurs par status et les index ne
+portent que sur les tâches actives.
+
+Chaque écriture marque les lignes touchées avec la nouvelle version des données
+de l'utilisateur (``change_seq`` = task_counters.data_version, incrémentée par
+le même plan) et une suppression laisse une trace dans ``task_tombstones`` :
+``list_changes`` retrouve ainsi tout ce qui a changé depuis un curseur.
+"""
+import base64
+import binascii
+import json
+import re
+from datetime import date, datetime, timedelta
+
+from counters import CURRENT_VERSION_SQL, TaskCounterDelta
+from positions import POSITION_MAX_LENGTH, key_between, sequential_keys
+from sql_dialect import STATUS_RANK, current_dialect
+from sql_plan import Query
+
+TASK_COLUMNS = 'id, user_id, title, status, start_date, position, createdAt, updatedAt'
+TASK_STATUSES = ['todo', 'in_progress', 'done']
+TASK_FIELDS = ('title', 'status', 'start_date')
+
+# Clés de tri de chaque colonne : (expression SQL, décroissant, type, valeur de la ligne).
+# L'id termine chaque tri pour que le curseur désigne une position unique.
+# Chaque tri suit l'ordre d'un index composite (migration 0005) : pas de filesort.
+#
+# - status est un ENUM : trié dans l'ordre de déclaration (todo, in_progress,
+#   done) et comparé par ce rang quand le paramètre est un entier (SQLite :
+#   colonne générée status_rank, voir sql_dialect.py) ;
+# - no_start_date (colonne générée = start_date IS NULL) place les tâches sans
+#   date en dernier, ce qu'un tri direct sur start_date ne fait pas (NULL en premier).
+_START_DATE_ORDER = [
+    ('no_start_date', False, 'int', lambda t: 1 if t['start_date'] is None else 0),
+    ('start_date', False, 'date', lambda t: t['start_date']),
+    ('createdAt', False, 'datetime', lambda t: t['createdAt']),
+    ('id', False, 'int', lambda t: t['id']),
+]
+TASK_ORDERINGS = {
+    # Toutes les tâches : par colonne puis les plus récentes d'abord
+    'all': [
+        ('status', False, 'int', lambda t: STATUS_RANK[t['status']]),
+        ('createdAt', True, 'datetime', lambda t: t['createdAt']),
+        ('id', True, 'int', lambda t: t['id']),
+    ],
+    # À faire / en cours : date de début la plus proche, tâches sans date en dernier
+    'todo': _START_DATE_ORDER,
+    'in_progress': _START_DATE_ORDER,
+    # Terminées : tri chronologique inverse
+    'done': [
+        ('createdAt', True, 'datetime', lambda t: t['createdAt']),
+        ('id', True, 'int', lambda t: t['id']),
+    ],
+}
+# Ordre manuel (?order=position) : clé de position dans chaque colonne,
+# idx_user_status_position (migration 0008)
+_POSITION_ORDER = [
+    ('position', False, 'str', lambda t: t['position']),
+    ('id', False, 'int', lambda t: t['id']),
+]
+POSITION_ORDERINGS = {
+    'all': [('status', False, 'int', lambda t: STATUS_RANK[t['status']])] + _POSITION_ORDER,
+    'todo': _POSITION_ORDER,
+    'in_progress': _POSITION_ORDER,
+    'done': _POSITION_ORDER,
+}
+LIST_ORDERS = ('date', 'position')
+
+
+def task_ordering(status, order='date'):
+    """Clés de tri de la colonne ``status`` : ordre par date (défaut) ou ordre manuel"""
+    return (POSITION_ORDERINGS if order == 'position' else TASK_ORDERINGS)[status]
+
+
+def serialize_task(task):
+    """Convertit une ligne de la table tasks en dictionnaire JSON"""
+    return {
+        'id': task['id'],
+        'user_id': task['user_id'],
+        'title': task['title'],
+        'status': task['status'],
+        'start_date': task['start_date'].isoformat() if task['start_date'] else None,
+        'position': task['position'],
+        'createdAt': task['createdAt'].isoformat() if task['createdAt'] else None,
+        'updatedAt': task['updatedAt'].isoformat() if task.get('updatedAt') else None
+    }
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+# ============================================
+# LECTURES
+# ============================================
+
+def _encode_token(payload):
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    padded = token + '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def _encode_position(tag, keys, row):
+    values = []
+    for _, _, _, getter in keys:
+        value = getter(row)
+        values.append(value.isoformat() if isinstance(value, (date, datetime)) else value)
+    return _encode_token({'s': tag, 'k': values})
+
+
+def _decode_position(tag, keys, cursor_str):
+    try:
+        payload = _decode_token(cursor_str)
+        if payload['s'] != tag or len(payload['k']) != len(keys):
+            raise ValueError('Curseur d\'une autre liste')
+        values = []
+        for (_, _, kind, _), value in zip(keys, payload['k']):
+            if value is None:
+                values.append(None)
+            elif kind == 'date':
+                values.append(date.fromisoformat(value))
+            elif kind == 'datetime':
+                values.append(datetime.fromisoformat(value))
+            elif kind == 'float':
+                values.append(float(value))
+            elif kind == 'str':
+                values.append(str(value))
+            else:
+                values.append(int(value))
+        return values
+    except (KeyError, TypeError, ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError('Curseur invalide') from e
+
+
+def _cursor_tag(status, order):
+    return status if order == 'date' else f'{status}:{order}'
+
+
+def encode_cursor(status, task, order='date'):
+    """Curseur opaque désignant la position de ``task`` dans le tri de ``status``"""
+    return _encode_position(_cursor_tag(status, order), task_ordering(status, order), task)
+
+
+def decode_cursor(status, cursor_str, order='date'):
+    """Décode un curseur; lève ValueError s'il est invalide ou d'une autre colonne"""
+    return _decode_position(_cursor_tag(status, order), task_ordering(status, order), cursor_str)
+
+
+def keyset_condition(keys, values):
+    """Condition SQL « après la position values » pour un tri multi-colonnes"""
+    clauses, params = [], []
+    equal_sql, equal_params = [], []
+    for (expr, desc, _, _), value in zip(keys, values):
+        if value is None:
+            # Groupe sans date : déjà isolé par la clé précédente
+            continue
+        op = '<' if desc else '>'
+        clauses.append('(' + ' AND '.join(equal_sql + [f'{expr} {op} %s']) + ')')
+        params.extend(equal_params + [value])
+        equal_sql.append(f'{expr} = %s')
+        equal_params.append(value)
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def build_tasks_query(user_id, status, after=None, limit=None, order='date'):
+    """Requête de la colonne ``status`` à partir de la position ``after``"""
+    d = current_dialect()
+    keys = [(d.status_column if expr == 'status' else expr, desc, kind, getter)
+            for expr, desc, kind, getter in task_ordering(status, order)]
+    where = ['user_id = %s']
+    params = [user_id]
+    if status != 'all':
+        where.append(f'{d.status_column} = %s')
+        params.append(d.status_value(status))
+    if after is not None:
+        condition, condition_params = keyset_condition(keys, after)
+        where.append(condition)
+        params.extend(condition_params)
+
+    order_by = ',\n                '.join(f'{expr} {"DESC" if desc else "ASC"}' for expr, desc, _, _ in keys)
+    query = f'''
+            SELECT {TASK_COLUMNS} FROM tasks
+            WHERE {' AND '.join(where)}
+            ORDER BY
+                {order_by}
+        '''
+    if limit is not None:
+        query += ' LIMIT %s'
+        params.append(limit)
+    return query, params
+
+
+def list_tasks(user_id, status, after=None, limit=None, order='date'):
+    """Plan : lignes de la colonne ``status`` (voir build_tasks_query pour le mode streaming)"""
+    query, params = build_tasks_query(user_id, status, after, limit, order)
+    return (yield Query(query, params, fetch='all'))
+
+
+def fetch_upcoming(user_id, days=7):
+    """Plan : tâches non terminées dont la date de début est dans les ``days`` prochains jours"""
+    # Parcours de idx_user_start_date dans l'ordre du tri; status est filtré dans l'index
+    d = current_dialect()
+    return (yield Query(f'''
+        SELECT {TASK_COLUMNS} FROM tasks
+        WHERE user_id = %s
+        AND status != 'done'
+        AND start_date IS NOT NULL
+        AND start_date >= {d.today}
+        AND start_date <= {d.today_plus_days}
+        ORDER BY start_date ASC, createdAt ASC
+    ''', (user_id, days), fetch='all'))
+
+
+# ============================================
+# CALENDRIER
+# ============================================
+# Une requête groupée par jour sur idx_user_start_date (user_id, start_date,
+# createdAt, status) : plage sur start_date, status lu dans l'index, groupes
+# dans l'ordre de l'index (ni table temporaire ni filesort). Les semaines
+# (du lundi au dimanche) sont regroupées ici, à partir des jours.
+
+CALENDAR_BUCKETS = ('day', 'week')
+
+
+def bucket_start(day, bucket):
+    """Premier jour du groupe (jour, ou lundi de la semaine) qui contient ``day``"""
+    return day - timedelta(days=day.weekday()) if bucket == 'week' else day
+
+
+def _calendar_bucket(start, end, bucket, first):
+    last = first + timedelta(days=6) if bucket == 'week' else first
+    # Les semaines aux bords de la fenêtre sont coupées à [start, end]
+    return {
+        'start': max(first, start).isoformat(),
+        'end': min(last, end).isoformat(),
+        'counts': {status: 0 for status in TASK_STATUSES},
+        'total': 0,
+    }
+
+
+def read_calendar(user_id, start, end, bucket='day', tasks_per_bucket=0):
+    """Plan : groupes (jours ou semaines) de ``start`` à ``end`` inclus, avec le nombre de
+    tâches par status dont la date de début tombe dans chaque groupe.
+
+    Tous les groupes de la fenêtre sont présents, vides compris. Avec
+    ``tasks_per_bucket`` > 0, chaque groupe porte aussi ses premières tâches
+    (ordre de date de début puis de création).
+    """
+    start, end = _as_date(start), _as_date(end)
+    rows = yield from count_by_day(user_id, start, end)
+
+    buckets = {}
+    first = bucket_start(start, bucket)
+    while first <= end:
+        buckets[first] = _calendar_bucket(start, end, bucket, first)
+        first += timedelta(days=7 if bucket == 'week' else 1)
+
+    for row in rows:
+        entry = buckets[bucket_start(_as_date(row['start_date']), bucket)]
+        for status in TASK_STATUSES:
+            # SUM est un DECIMAL côté MySQL
+            count = int(row[status] or 0)
+            entry['counts'][status] += count
+            entry['total'] += count
+
+    if tasks_per_bucket > 0:
+        for entry in buckets.values():
+            entry['tasks'] = []
+        tasks = yield from first_tasks_by_day(user_id, start, end, tasks_per_bucket)
+        # Les N premières d'une semaine sont parmi les N premières de chacun de ses jours
+        for task in tasks:
+            entry = buckets[bucket_start(_as_date(task['start_date']), bucket)]
+            if len(entry['tasks']) < tasks_per_bucket:
+                entry['tasks'].append(task)
+
+    return list(buckets.values())
+
+
+def count_by_day(user_id, start, end):
+    """Plan : nombre de tâches par status pour chaque date de début entre ``start`` et ``end``"""
+    counts = ',\n            '.join(f"SUM(CASE WHEN status = '{status}' THEN 1 ELSE 0 END) AS {status}"
+                                    for status in TASK_STATUSES)
+    return (yield Query(f'''
+        SELECT start_date,
+            {counts}
+        FROM tasks
+        WHERE user_id = %s
+        AND start_date >= %s
+        AND start_date <= %s
+        GROUP BY start_date
+        ORDER BY start_date
+    ''', (user_id, start, end), fetch='all'))
+
+
+def first_tasks_by_day(user_id, start, end, per_day):
+    """Plan : au plus ``per_day`` tâches par date de début entre ``start`` et ``end``"""
+    # ROW_NUMBER suit l'ordre de idx_user_start_date (l'id termine l'index InnoDB)
+    return (yield Query(f'''
+        SELECT {TASK_COLUMNS} FROM (
+            SELECT {TASK_COLUMNS},
+                ROW_NUMBER() OVER (PARTITION BY start_date ORDER BY createdAt, id) AS day_rank
+            FROM tasks
+            WHERE user_id = %s
+            AND start_date >= %s
+            AND start_date <= %s
+        ) AS ranked
+        WHERE day_rank <= %s
+        ORDER BY start_date, createdAt, id
+    ''', (user_id, start, end, per_day), fetch='all'))
+
+
+# ============================================
+# RECHERCHE PLEIN TEXTE
+# ============================================
+
+# Index FULLTEXT ft_tasks_title / table FTS5 tasks_fts (migration 0006)
+SEARCH_MAX_TERMS = 8
+SEARCH_COLUMNS = ', '.join(f'tasks.{column}' for column in TASK_COLUMNS.split(', '))
+# Tris de search_tasks, comme TASK_ORDERINGS ; score = pertinence calculée par la base
+SEARCH_ORDERINGS = {
+    'relevance': [
+        ('score', True, 'float', lambda t: t['score']),
+        ('id', True, 'int', lambda t: t['id']),
+    ],
+    'date': [
+        ('createdAt', True, 'datetime', lambda t: t['createdAt']),
+        ('id', True, 'int', lambda t: t['id']),
+    ],
+}
+
+
+def boolean_query(text):
+    """« rapport mens » -> « +rapport* +mens* » (MySQL) : chaque mot requis, en préfixe.
+
+    Seuls les mots sont gardés : les opérateurs de recherche (+ - " ( ) ~ < >)
+    saisis par l'utilisateur ne sont pas interprétés. Chaîne vide s'il n'y a aucun mot.
+    """
+    terms = re.findall(r'\w+', text)[:SEARCH_MAX_TERMS]
+    return current_dialect().fulltext_query(terms) if terms else ''
+
+
+def encode_search_cursor(order, task):
+    return _encode_position(f'search:{order}', SEARCH_ORDERINGS[order], task)
+
+
+def decode_search_cursor(order, cursor_str):
+    return _decode_position(f'search:{order}', SEARCH_ORDERINGS[order], cursor_str)
+
+
+def search_tasks(user_id, text, status=None, start_from=None, start_to=None, order='relevance',
+                 after=None, limit=100):
+    """Plan : tâches dont le titre contient les mots de ``text`` (en préfixe).
+
+    Filtres optionnels sur le status et la date de début (bornes incluses).
+    Chaque ligne porte en plus son ``score`` de pertinence, qui sert au curseur.
+    """
+    d = current_dialect()
+    match = boolean_query(text)
+    keys = SEARCH_ORDERINGS[order]
+    score, params = d.search_score(match)
+    where = ['tasks.user_id = %s', d.search_condition]
+    params += [user_id, match]
+    if status is not None:
+        where.append('tasks.status = %s')
+        params.append(status)
+    if start_from is not None:
+        where.append('tasks.start_date >= %s')
+        params.append(start_from)
+    if start_to is not None:
+        where.append('tasks.start_date <= %s')
+        params.append(start_to)
+
+    select = f'''
+        SELECT {SEARCH_COLUMNS}, {score} AS score FROM {d.search_source}
+        WHERE {' AND '.join(where)}'''
+    # score n'existe qu'une fois la ligne sélectionnée : la position se compare après
+    if after is not None:
+        condition, condition_params = keyset_condition(keys, after)
+        select = d.filter_selected(select, condition)
+        params.extend(condition_params)
+
+    order_by = ', '.join(f'{expr} {"DESC" if desc else "ASC"}' for expr, desc, _, _ in keys)
+    params.append(limit)
+    return (yield Query(f'''{select}
+        ORDER BY {order_by}
+        LIMIT %s
+    ''', params, fetch='all'))
+
+
+# ============================================
+# ÉCRITURES
+# ============================================
+
+def _lock_task(user_id, task_id):
+    """Ligne de la tâche verrouillée pour la transaction, ou None si elle n'appartient pas à l'utilisateur.
+
+    Les anciennes valeurs servent à ajuster les compteurs et à construire la réponse.
+    """
+    return (yield Query(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = %s AND user_id = %s FOR UPDATE',
+                        (task_id, user_id), fetch='one'))
+
+
+def create_task(user_id, title, status='todo', start_date=None, delta=None):
+    """Plan : insère une tâche et retourne la ligne créée.
+
+    ``delta`` : TaskCounterDelta vide à remplir, pour que l'appelant sache ce
+    que l'écriture a touché (invalidation du cache, voir cache.py).
+    """
+    # createdAt est fixé ici pour ne pas avoir à relire la ligne insérée
+    task = {
+        'user_id': user_id,
+        'title': title,
+        'status': status,
+        'start_date': _as_date(start_date),
+        'createdAt': datetime.now().replace(microsecond=0),
+    }
+    task['updatedAt'] = task['createdAt']
+
+    task['position'] = yield from _next_position(user_id, status)
+
+    # Compteurs d'abord : la nouvelle version des données devient le change_seq de la ligne
+    delta = TaskCounterDelta() if delta is None else delta
+    yield from delta.change(None, (status, task['start_date'])).apply(user_id)
+    task['id'] = yield Query(f'''
+        INSERT INTO tasks (user_id, title, status, start_date, position, createdAt, updatedAt, change_seq)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, {CURRENT_VERSION_SQL})
+    ''', (user_id, title, status, task['start_date'], task['position'], task['createdAt'], task['updatedAt'],
+          user_id))
+    return task
+
+
+def update_task(user_id, task_id, fields, delta=None):
+    """Plan : modifie les champs donnés (title, status, start_date); None si la tâche est introuvable"""
+    old = yield from _lock_task(user_id, task_id)
+    if old is None:
+        return None
+
+    columns = [column for column in TASK_FIELDS if column in fields]
+    task = dict(old, **{column: fields[column] for column in columns})
+    task['start_date'] = _as_date(task['start_date'])
+    task['updatedAt'] = datetime.now().replace(microsecond=0)
+    if task['status'] != old['status']:
+        # Changement de colonne : la tâche passe en fin de sa nouvelle colonne
+        task['position'] = yield from _next_position(user_id, task['status'])
+        columns.append('position')
+    delta = TaskCounterDelta() if delta is None else delta
+    yield from delta.change(
+        (old['status'], old['start_date']), (task['status'], task['start_date'])
+    ).apply(user_id)
+
+    assignments = ', '.join(f'{column} = %s' for column in columns)
+    yield Query(f'''
+        UPDATE tasks SET {assignments}, updatedAt = %s, change_seq = {CURRENT_VERSION_SQL}
+        WHERE id = %s AND user_id = %s
+    ''', [task[column] for column in columns] + [task['updatedAt'], user_id, task_id, user_id])
+    return task
+
+
+def delete_task(user_id, task_id, delta=None):
+    """Plan : supprime une tâche (en laissant une tombstone); False si elle est introuvable"""
+    old = yield from _lock_task(user_id, task_id)
+    if old is None:
+        return False
+
+    delta = TaskCounterDelta() if delta is None else delta
+    yield from delta.change((old['status'], old['start_date']), None).apply(user_id)
+    yield from _bury(user_id, [task_id])
+    yield Query('DELETE FROM tasks WHERE id = %s AND user_id = %s', (task_id, user_id))
+    return True
+
+
+def import_tasks(user_id, tasks, delta=None):
+    """Plan : insère ``tasks`` (liste de (title, status, start_date) validés) en une requête.
+
+    Utilisé par l'import en masse, morceau par morceau : ni ids ni lignes en
+    retour, seulement le nombre de tâches insérées. ``delta`` : voir create_task.
+    """
+    if not tasks:
+        return 0
+    now = datetime.now().replace(microsecond=0)
+    # Tâches importées à la suite, en fin de leur colonne
+    positions = {}
+    for _, status, _ in tasks:
+        if status not in positions:
+            positions[status] = yield from _last_position(user_id, status)
+    delta = TaskCounterDelta() if delta is None else delta
+    for _, status, start_date in tasks:
+        delta.change(None, (status, _as_date(start_date)))
+    yield from delta.apply(user_id)
+
+    # Version relue par apply : un littéral plutôt qu'une sous-requête par ligne
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(tasks))
+    params = []
+    for title, status, start_date in tasks:
+        positions[status] = key_between(positions[status], None)
+        params += [user_id, title, status, start_date, positions[status], now, now, delta.version]
+    yield Query(f'''
+        INSERT INTO tasks (user_id, title, status, start_date, position, createdAt, updatedAt, change_seq)
+        VALUES {values}
+    ''', params)
+    return len(tasks)
+
+
+def _bury(user_id, task_ids):
+    """Plan : enregistre la suppression des tâches pour la synchronisation (list_changes)"""
+    rows = ', '.join([f'(%s, %s, {CURRENT_VERSION_SQL}, %s)'] * len(task_ids))
+    deleted_at = datetime.now().replace(microsecond=0)
+    params = []
+    for task_id in task_ids:
+        params += [user_id, task_id, user_id, deleted_at]
+    yield Query(f'''
+        INSERT INTO task_tombstones (user_id, task_id, change_seq, deleted_at)
+        VALUES {rows}
+    ''', params)
+
+
+def apply_batch(user_id, operations, delta=None):
+    """Plan : applique des opérations validées dans la transaction en cours.
+
+    ``operations`` : liste de (index, {'op', 'id', 'fields'}). Retourne les
+    résultats par index; les opérations sur des tâches absentes ou d'un autre
+    utilisateur reçoivent une erreur 404 et ne sont pas appliquées.
+    ``delta`` : voir create_task.
+    """
+    results = {}
+    delta = TaskCounterDelta() if delta is None else delta
+    now = datetime.now().replace(microsecond=0)
+
+    # Propriété et valeurs actuelles de toutes les tâches visées : une seule requête
+    ids = [operation['id'] for _, operation in operations if operation['op'] != 'create']
+    existing = {}
+    if ids:
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = yield Query(f'''
+            SELECT {TASK_COLUMNS} FROM tasks
+            WHERE user_id = %s AND id IN ({placeholders})
+            FOR UPDATE
+        ''', [user_id] + ids, fetch='all')
+        existing = {row['id']: row for row in rows}
+
+    # Créations et changements de colonne vont en fin de colonne, dans l'ordre du lot
+    positions = {}
+    for _, operation in operations:
+        status = operation['fields'].get('status')
+        if status is not None and status not in positions:
+            positions[status] = yield from _last_position(user_id, status)
+
+    creates, deletes, updates = [], [], {}
+    for index, operation in operations:
+        op, fields = operation['op'], operation['fields']
+        if op == 'create':
+            positions[fields['status']] = key_between(positions[fields['status']], None)
+            fields = dict(fields, position=positions[fields['status']])
+            creates.append((index, fields))
+            delta.change(None, (fields['status'], _as_date(fields['start_date'])))
+            continue
+
+        old = existing.get(operation['id'])
+        if old is None:
+            results[index] = {'index': index, 'op': op, 'status': 404,
+                              'error': 'Tâche non trouvée ou non autorisée'}
+            continue
+
+        if op == 'delete':
+            deletes.append(old['id'])
+            delta.change((old['status'], old['start_date']), None)
+            results[index] = {'index': index, 'op': op, 'status': 200, 'id': old['id']}
+            continue
+
+        if fields.get('status', old['status']) != old['status']:
+            positions[fields['status']] = key_between(positions[fields['status']], None)
+            fields = dict(fields, position=positions[fields['status']])
+
+        # update / status : regroupées par ensemble de colonnes pour executemany
+        columns = tuple(column for column in TASK_FIELDS + ('position',) if column in fields)
+        updates.setdefault(columns, []).append(
+            [fields[column] for column in columns] + [now, user_id, old['id'], user_id]
+        )
+        new = dict(old, **fields, updatedAt=now)
+        new['start_date'] = _as_date(new['start_date'])
+        delta.change((old['status'], old['start_date']), (new['status'], new['start_date']))
+        results[index] = {'index': index, 'op': op, 'status': 200, 'task': serialize_task(new)}
+
+    if not (updates or deletes or creates):
+        return results
+
+    # Une seule version pour tout le lot : c'est le change_seq de toutes les lignes touchées
+    yield from delta.apply(user_id)
+
+    for columns, rows in updates.items():
+        assignments = ', '.join(f'{column} = %s' for column in columns)
+        yield Query(f'''
+            UPDATE tasks SET {assignments}, updatedAt = %s, change_seq = {CURRENT_VERSION_SQL}
+            WHERE id = %s AND user_id = %s
+        ''', rows, many=True)
+
+    if deletes:
+        yield from _bury(user_id, deletes)
+        placeholders = ', '.join(['%s'] * len(deletes))
+        yield Query(f'DELETE FROM tasks WHERE user_id = %s AND id IN ({placeholders})',
+                    [user_id] + deletes)
+
+    if creates:
+        # Insertion multi-lignes : les ids générés se suivent (voir inserted_ids du dialecte)
+        values = ', '.join([f'(%s, %s, %s, %s, %s, %s, %s, {CURRENT_VERSION_SQL})'] * len(creates))
+        params = []
+        for _, fields in creates:
+            params += [user_id, fields['title'], fields['status'], fields['start_date'], fields['position'],
+                       now, now, user_id]
+        lastrowid = yield Query(f'''
+            INSERT INTO tasks (user_id, title, status, start_date, position, createdAt, updatedAt, change_seq)
+            VALUES {values}
+        ''', params)
+        ids = yield from current_dialect().inserted_ids(lastrowid, len(creates))
+        for task_id, (index, fields) in zip(ids, creates):
+            task = dict(fields, id=task_id, user_id=user_id, createdAt=now, updatedAt=now)
+            task['start_date'] = _as_date(task['start_date'])
+            results[index] = {'index': index, 'op': 'create', 'status': 201, 'task': serialize_task(task)}
+
+    return results
+
+
+# ============================================
+# ORDRE MANUEL
+# ============================================
+# Une tâche créée ou changée de colonne sans place précise va en fin de
+# colonne. move_task la place juste après ou juste avant une autre tâche de la
+# colonne : seule sa ligne est réécrite. Quand les clés voisines ne laissent
+# pas de place (clés égales après deux déplacements concurrents, clé plus
+# longue que la colonne), toute la colonne est renumérotée dans la même
+# transaction ; rebalance_column fait de même en tâche de fond pour les
+# colonnes aux clés longues (manage.py rebalance).
+
+class PlacementError(ValueError):
+    """Tâche de référence d'un déplacement absente de la colonne visée"""
+
+
+def _last_position(user_id, status):
+    """Plan : plus grande clé de la colonne ``status`` (None si elle est vide)"""
+    # Dernière entrée de la plage (user_id, status) de idx_user_status_position
+    d = current_dialect()
+    row = yield Query(f'''
+        SELECT MAX(position) AS position FROM tasks
+        WHERE user_id = %s AND {d.status_column} = %s
+    ''', (user_id, d.status_value(status)), fetch='one')
+    return row['position'] if row else None
+
+
+def _next_position(user_id, status):
+    """Plan : clé d'une tâche ajoutée en fin de colonne"""
+    return key_between((yield from _last_position(user_id, status)), None)
+
+
+def _neighbour_position(user_id, status, anchor, task_id, before):
+    """Plan : clé de la voisine de ``anchor`` (suivante, ou précédente si ``before``), hors ``task_id``"""
+    d = current_dialect()
+    keys = [(expr, before, kind, getter) for expr, _, kind, getter in _POSITION_ORDER]
+    condition, params = keyset_condition(keys, [anchor['position'], anchor['id']])
+    direction = 'DESC' if before else 'ASC'
+    row = yield Query(f'''
+        SELECT position FROM tasks
+        WHERE user_id = %s AND {d.status_column} = %s AND id != %s AND {condition}
+        ORDER BY position {direction}, id {direction}
+        LIMIT 1
+    ''', [user_id, d.status_value(status), task_id] + params, fetch='one')
+    return row['position'] if row else None
+
+
+def _column_ids(user_id, status, exclude_id=None):
+    """Plan : ids de la colonne dans l'ordre manuel, lignes verrouillées"""
+    d = current_dialect()
+    rows = yield Query(f'''
+        SELECT id FROM tasks
+        WHERE user_id = %s AND {d.status_column} = %s AND id != %s
+        ORDER BY position, id
+        FOR UPDATE
+    ''', (user_id, d.status_value(status), exclude_id or 0), fetch='all')
+    return [row['id'] for row in rows]
+
+
+def _write_positions(user_id, positions):
+    """Plan : nouvelles clés ``positions`` (liste de (clé, id)), sans toucher à updatedAt"""
+    # updatedAt recopié : sinon ON UPDATE CURRENT_TIMESTAMP (MySQL, migration 0004) le remplace
+    yield Query(f'''
+        UPDATE tasks SET position = %s, updatedAt = updatedAt, change_seq = {CURRENT_VERSION_SQL}
+        WHERE id = %s AND user_id = %s
+    ''', [(position, user_id, task_id, user_id) for position, task_id in positions], many=True)
+
+
+def move_task(user_id, task_id, status, after_id=None, before_id=None, delta=None):
+    """Plan : passe la tâche dans la colonne ``status``, juste après ``after_id`` ou juste avant ``before_id``.
+
+    Sans tâche de référence, une tâche qui change de colonne va en fin de
+    colonne et une tâche qui n'en change pas garde sa place. Retourne
+    (tâche, nombre d'autres tâches renumérotées), ou (None, 0) si la tâche est
+    introuvable ; lève PlacementError si la tâche de référence n'est pas une
+    autre tâche de la colonne ``status``. ``delta`` : voir create_task.
+    """
+    old = yield from _lock_task(user_id, task_id)
+    if old is None:
+        return None, 0
+
+    task = dict(old, status=status, updatedAt=datetime.now().replace(microsecond=0))
+    anchor_id = after_id if after_id is not None else before_id
+    renumbered = []
+    if anchor_id is None:
+        if status != old['status']:
+            task['position'] = yield from _next_position(user_id, status)
+    else:
+        anchor = None if anchor_id == task_id else (yield from _lock_task(user_id, anchor_id))
+        if anchor is None or anchor['status'] != status:
+            raise PlacementError('La tâche de référence doit être une autre tâche de la colonne visée')
+        before = before_id is not None
+        neighbour = yield from _neighbour_position(user_id, status, anchor, task_id, before)
+        low, high = (neighbour, anchor['position']) if before else (anchor['position'], neighbour)
+        try:
+            position = key_between(low, high)
+        except ValueError:
+            position = None
+        if position is not None and len(position) <= POSITION_MAX_LENGTH:
+            task['position'] = position
+        else:
+            # Pas de place entre les voisines : la colonne est renumérotée avec la tâche à sa place
+            renumbered = yield from _column_ids(user_id, status, task_id)
+            renumbered.insert(renumbered.index(anchor_id) + (0 if before else 1), task_id)
+
+    delta = TaskCounterDelta() if delta is None else delta
+    yield from delta.change(
+        (old['status'], old['start_date']), (task['status'], task['start_date'])
+    ).apply(user_id)
+
+    if renumbered:
+        positions = list(zip(sequential_keys(len(renumbered)), renumbered))
+        task['position'] = positions[renumbered.index(task_id)][0]
+        yield from _write_positions(user_id, [(key, other) for key, other in positions if other != task_id])
+    yield Query(f'''
+        UPDATE tasks SET status = %s, position = %s, updatedAt = %s, change_seq = {CURRENT_VERSION_SQL}
+        WHERE id = %s AND user_id = %s
+    ''', (status, task['position'], task['updatedAt'], user_id, task_id, user_id))
+    return task, max(len(renumbered) - 1, 0)
+
+
+def find_long_positions(min_length, limit):
+    """Plan : colonnes (user_id, status) dont une clé dépasse ``min_length`` caractères"""
+    # Parcours de idx_user_status_position (couvrant) : réservé à manage.py rebalance
+    return (yield Query('''
+        SELECT DISTINCT user_id, status FROM tasks
+        WHERE LENGTH(position) > %s
+        LIMIT %s
+    ''', (min_length, limit), fetch='all'))
+
+
+def rebalance_column(user_id, status, delta=None):
+    """Plan : réattribue les clés les plus courtes à la colonne, dans le même ordre.
+
+    Retourne le nombre de tâches renumérotées. ``delta`` : voir create_task.
+    """
+    task_ids = yield from _column_ids(user_id, status)
+    if not task_ids:
+        return 0
+    delta = TaskCounterDelta() if delta is None else delta
+    # Aucun compteur ne change, mais la colonne est touchée (cache, version des données)
+    yield from delta.change((status, None), (status, None)).apply(user_id)
+    yield from _write_positions(user_id, list(zip(sequential_keys(len(task_ids)), task_ids)))
+    return len(task_ids)
+
+
+# ============================================
+# ARCHIVAGE
+# ============================================
+# Une tâche archivée garde son id et ses valeurs dans tasks_archive; pour la
+# synchronisation par delta (list_changes) elle est supprimée de tasks
+# (tombstone), et les routes de tâches ne la trouvent plus (404).
+
+ARCHIVE_COLUMNS = f'{TASK_COLUMNS}, archivedAt'
+# Même ordre que la colonne « terminées » : idx_archive_user_created (migration 0007)
+ARCHIVE_ORDERING = TASK_ORDERINGS['done']
+
+
+def encode_archive_cursor(task):
+    """Curseur opaque désignant la position de ``task`` dans l'archive"""
+    return _encode_position('archive', ARCHIVE_ORDERING, task)
+
+
+def decode_archive_cursor(cursor_str):
+    """Décode un curseur de list_archive; lève ValueError s'il est invalide"""
+    return _decode_position('archive', ARCHIVE_ORDERING, cursor_str)
+
+
+def list_archive(user_id, after=None, limit=None):
+    """Plan : tâches archivées de l'utilisateur, plus récentes d'abord, à partir de ``after``"""
+    where = ['user_id = %s']
+    params = [user_id]
+    if after is not None:
+        condition, condition_params = keyset_condition(ARCHIVE_ORDERING, after)
+        where.append(condition)
+        params.extend(condition_params)
+    query = f'''
+        SELECT {ARCHIVE_COLUMNS} FROM tasks_archive
+        WHERE {' AND '.join(where)}
+        ORDER BY createdAt DESC, id DESC
+    '''
+    if limit is not None:
+        query += ' LIMIT %s'
+        params.append(limit)
+    return (yield Query(query, params, fetch='all'))
+
+
+def find_archivable(cutoff, limit):
+    """Plan : (id, user_id) des plus anciennes tâches terminées non modifiées depuis ``cutoff``"""
+    # Parcours de idx_status_updated (migration 0007), arrêté après ``limit`` lignes
+    return (yield Query('''
+        SELECT id, user_id FROM tasks
+        WHERE status = 'done' AND updatedAt < %s
+        ORDER BY updatedAt
+        LIMIT %s
+    ''', (cutoff, limit), fetch='all'))
+
+
+def archive_tasks(user_id, task_ids, cutoff, delta=None):
+    """Plan : déplace dans tasks_archive celles des tâches ``task_ids`` encore archivables.
+
+    Les lignes sont revérifiées sous verrou : une tâche rouverte ou modifiée
+    depuis find_archivable reste dans tasks. Retourne le nombre de tâches
+    archivées. ``delta`` : voir create_task.
+    """
+    placeholders = ', '.join(['%s'] * len(task_ids))
+    rows = yield Query(f'''
+        SELECT {TASK_COLUMNS} FROM tasks
+        WHERE user_id = %s AND id IN ({placeholders})
+        AND status = 'done' AND updatedAt < %s
+        FOR UPDATE
+    ''', [user_id] + list(task_ids) + [cutoff], fetch='all')
+    if not rows:
+        return 0
+
+    ids = [row['id'] for row in rows]
+    delta = TaskCounterDelta() if delta is None else delta
+    for row in rows:
+        delta.change((row['status'], row['start_date']), None)
+    delta.archived += len(ids)
+    yield from delta.apply(user_id)
+
+    placeholders = ', '.join(['%s'] * len(ids))
+    archived_at = datetime.now().replace(microsecond=0)
+    yield Query(f'''
+        INSERT INTO tasks_archive ({ARCHIVE_COLUMNS})
+        SELECT {TASK_COLUMNS}, %s FROM tasks
+        WHERE user_id = %s AND id IN ({placeholders})
+    ''', [archived_at, user_id] + ids)
+    yield from _bury(user_id, ids)
+    yield Query(f'DELETE FROM tasks WHERE user_id = %s AND id IN ({placeholders})', [user_id] + ids)
+    return len(ids)
+
+
+# ============================================
+# SYNCHRONISATION PAR DELTA
+# ============================================
+
+def encode_change_cursor(row):
+    """Curseur opaque désignant la position d'une modification (change_seq, suppression, id)"""
+    return _encode_token({'c': [int(row['change_seq']), int(row['deleted']), int(row['id'])]})
+
+
+def decode_change_cursor(cursor_str):
+    """Décode un curseur de list_changes; lève ValueError s'il est invalide"""
+    try:
+        change_seq, deleted, task_id = _decode_token(cursor_str)['c']
+        return int(change_seq), int(deleted), int(task_id)
+    except (KeyError, TypeError, ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError('Curseur invalide') from e
+
+
+def _after_change(deleted, after):
+    """Condition keyset sur (change_seq, deleted, id) pour une branche où deleted est constant"""
+    if after is None:
+        return '', []
+    change_seq, after_deleted, task_id = after
+    if deleted > after_deleted:
+        return 'AND change_seq >= %s', [change_seq]
+    if deleted < after_deleted:
+        return 'AND change_seq > %s', [change_seq]
+    return 'AND (change_seq > %s OR (change_seq = %s AND {id} > %s))', [change_seq, change_seq, task_id]
+
+
+def list_changes(user_id, after=None, limit=100):
+    """Plan : tâches modifiées et tâches supprimées après la position ``after``.
+
+    Retourne les lignes triées par (change_seq, deleted, id) ; ``deleted`` vaut 1
+    pour une tombstone (seuls id et updatedAt = date de suppression sont remplis).
+    """
+    live_condition, live_params = _after_change(0, after)
+    dead_condition, dead_params = _after_change(1, after)
+    return (yield Query(f'''
+        SELECT {TASK_COLUMNS}, change_seq, 0 AS deleted
+        FROM tasks
+        WHERE user_id = %s {live_condition.format(id='id')}
+        UNION ALL
+        SELECT task_id, user_id, NULL, NULL, NULL, NULL, NULL, deleted_at, change_seq, 1
+        FROM task_tombstones
+        WHERE user_id = %s {dead_condition.format(id='task_id')}
+        ORDER BY change_seq, deleted, id
+        LIMIT %s
+    ''', [user_id] + live_params + [user_id] + dead_params + [limit], fetch='all'))
+
+
+def read_sync_horizon(user_id):
+    """Plan : plus grand change_seq des tombstones déjà purgées (0 si aucune)"""
+    row = yield Query('SELECT tombstones_purged_seq FROM task_counters WHERE user_id = %s',
+                      (user_id,), fetch='one')
+    return int(row['tombstones_purged_seq']) if row else 0
+
+
+def compact_tombstones(retention_days):
+    """Plan : purge les tombstones de plus de ``retention_days`` jours.
+
+    L'horizon de chaque utilisateur est relevé d'abord : un client dont le
+    curseur est antérieur doit refaire une synchronisation complète.
+    """
+    cutoff = datetime.now().replace(microsecond=0) - timedelta(days=retention_days)
+    yield Query(f'''
+        UPDATE task_counters
+        SET tombstones_purged_seq = {current_dialect().greatest}(tombstones_purged_seq, (
+            SELECT MAX(t.change_seq) FROM task_tombstones t
+            WHERE t.user_id = task_counters.user_id AND t.deleted_at < %s
+        ))
+        WHERE user_id IN (SELECT user_id FROM task_tombstones WHERE deleted_at < %s)
+    ''', (cutoff, cutoff))
+    return (yield Query('DELETE FROM task_tombstones WHERE deleted_at < %s', (cutoff,), fetch='rowcount'))
@@ -0,0 +1,34 @@
+"""Accès aux données de la table users (plans, voir sql_plan.py)."""
+from sql_plan import Query
+
+
+def find_principal(user_id):
+    """Plan : utilisateur authentifié (id, username, email) ou None"""
+    return (yield Query('SELECT id, username, email FROM users WHERE id = %s', (user_id,), fetch='one'))
+
+
+def find_for_login(username):
+    """Plan : utilisateur et hash de son mot de passe, ou None"""
+    return (yield Query(
+        'SELECT id, username, email, password_hash FROM users WHERE username = %s',
+        (username,), fetch='one'
+    ))
+
+
+def is_taken(username, email):
+    """Plan : True si le nom d'utilisateur ou l'email est déjà utilisé"""
+    row = yield Query('SELECT id FROM users WHERE username = %s OR email = %s', (username, email), fetch='one')
+    return row is not None
+
+
+def create_user(username, email, password_hash):
+    """Plan : crée l'utilisateur et retourne son id"""
+    return (yield Query(
+        'INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)',
+        (username, email, password_hash)
+    ))
+
+
+def update_password_hash(user_id, password_hash):
+    """Plan : remplace le hash du mot de passe (changement de coût bcrypt)"""
+    yield Query('UPDATE users SET password_hash = %s WHERE id = %s', (password_hash, user_id))
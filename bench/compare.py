@@ -0,0 +1,86 @@
+"""Compare deux résultats de bench/loadtest.py (référence puis candidat).
+
+Affiche par scénario et par route l'écart de p50 / p95 / p99, de débit et de
+requêtes SQL. Avec ``--threshold N``, le code de sortie vaut 1 si le p95 d'une
+route régresse de plus de N % : utilisable dans un script de CI.
+
+    python bench/compare.py bench/results/avant.json bench/results/apres.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def delta(before, after):
+    """Écart relatif en %, ou None si non calculable"""
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def fmt(value, change):
+    if value is None:
+        return f"{'-':>18}"
+    if change is None:
+        return f'{value:>10} {"":>7}'
+    return f'{value:>10} {change:>+6.1f}%'
+
+
+def compare(baseline, candidate, threshold=None):
+    """Affiche les écarts; retourne la liste des régressions p95 au-delà du seuil"""
+    regressions = []
+    for name, scenario in candidate['scenarios'].items():
+        reference = baseline['scenarios'].get(name)
+        if reference is None:
+            print(f"\n▶ {name} : absent de la référence")
+            continue
+        print(f"\n▶ {name}")
+        print(f"  {'route':<34} {'p50 (ms)':>18} {'p95 (ms)':>18} {'p99 (ms)':>18} "
+              f"{'req/s':>18} {'SQL':>18}")
+        for endpoint, after in scenario['endpoints'].items():
+            before = reference['endpoints'].get(endpoint)
+            if before is None:
+                print(f"  {endpoint:<34} (nouvelle route)")
+                continue
+            cells = []
+            for key in ('p50', 'p95', 'p99'):
+                value = after['latency_ms'][key]
+                cells.append(fmt(value, delta(before['latency_ms'][key], value)))
+            cells.append(fmt(after['throughput_rps'], delta(before['throughput_rps'], after['throughput_rps'])))
+            cells.append(fmt(after['db_queries_per_request'],
+                             delta(before['db_queries_per_request'], after['db_queries_per_request'])))
+            print(f"  {endpoint:<34} " + ' '.join(cells))
+
+            p95_change = delta(before['latency_ms']['p95'], after['latency_ms']['p95'])
+            if threshold is not None and p95_change is not None and p95_change > threshold:
+                regressions.append((name, endpoint, p95_change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare deux résultats de bench/loadtest.py')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, help='Régression p95 tolérée (%%)')
+    args = parser.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"Référence : {baseline['meta'].get('git_commit')} ({baseline['meta'].get('started_at')})")
+    print(f"Candidat  : {candidate['meta'].get('git_commit')} ({candidate['meta'].get('started_at')})")
+    regressions = compare(baseline, candidate, args.threshold)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} régression(s) p95 au-delà de {args.threshold} % :")
+        for name, endpoint, change in regressions:
+            print(f"   {name} {endpoint} : {change:+.1f} %")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Micro-benchmark de l'encodage d'une liste de tâches.
+
+Compare l'ancien chemin (serialize_task ligne par ligne puis json de Flask)
+avec encoding.dumps sur les lignes brutes, puis le coût de la compression.
+
+    python bench/encoding_microbench.py [--tasks 5000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import encoding
+from task_repository import TASK_STATUSES, serialize_task
+
+
+def make_rows(n):
+    """Lignes telles que renvoyées par un curseur dictionnaire MySQL"""
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    return [{
+        'id': i,
+        'user_id': 1,
+        'title': f'Tâche numéro {i} à traiter',
+        'status': TASK_STATUSES[i % 3],
+        'start_date': None if i % 5 == 0 else date(2026, 1, 1) + timedelta(days=i % 60),
+        'createdAt': now - timedelta(minutes=i),
+        'updatedAt': now,
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.tasks)
+    flask_json = DefaultJSONProvider(Flask(__name__))
+    before = flask_json.dumps([serialize_task(row) for row in rows]).encode('utf-8')
+    after = encoding.dumps(rows)
+    assert json.loads(before) == json.loads(after), 'les deux chemins doivent produire le même JSON'
+
+    cases = [
+        ('serialize_task + json Flask', lambda: flask_json.dumps([serialize_task(row) for row in rows])),
+        (f"encoding.dumps ({'orjson' if encoding.orjson else 'json'})", lambda: encoding.dumps(rows)),
+    ]
+    for name in encoding.SUPPORTED_ENCODINGS:
+        cases.append((f'compression {name}', lambda name=name: encoding.compress(after, name)))
+
+    print(f"{args.tasks} tâches, JSON {len(after)} octets, {args.repeat} répétitions")
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"  {name:<32} {best * 1000:8.2f} ms")
+    for name in encoding.SUPPORTED_ENCODINGS:
+        print(f"  taille {name:<26} {len(encoding.compress(after, name)):8d} octets")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Test de charge de l'API sur le jeu de données de bench/seed.py.
+
+Chaque scénario fait tourner ``--concurrency`` utilisateurs virtuels (un
+thread et une connexion HTTP keep-alive chacun) pendant ``--duration``
+secondes, puis relève par route : latences p50 / p95 / p99, débit, erreurs et
+nombre moyen de requêtes SQL par requête HTTP (en-tête X-DB-Queries, à
+activer côté serveur avec DB_QUERY_COUNT_HEADER=true).
+
+Scénarios :
+    login_storm      POST /api/login en rafale
+    board_load       chargement du tableau (liste complète + 3 colonnes)
+    status_churn     glisser-déposer : PUT /api/tasks/<id>/status
+    stats_dashboard  GET /api/tasks/stats
+    upcoming         GET /api/tasks/upcoming
+    search           GET /api/tasks/search (pertinence et date)
+
+    python bench/loadtest.py --url http://localhost:5000 --users 100 \\
+        --scenario board_load --scenario status_churn --output bench/results/avant.json
+    python bench/compare.py bench/results/avant.json bench/results/apres.json
+"""
+import argparse
+import http.client
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+USER_PREFIX = 'bench-user-'
+STATUSES = ('todo', 'in_progress', 'done')
+
+
+class ApiClient:
+    """Connexion HTTP keep-alive d'un utilisateur virtuel; enregistre chaque appel"""
+
+    def __init__(self, url, samples, accept_encoding):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.samples = samples
+        self.accept_encoding = accept_encoding
+        self.token = None
+        self.etags = {}
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        return self._conn
+
+    def call(self, method, path, body=None, endpoint=None, revalidate=False, record=True):
+        """Envoie une requête; retourne (status, corps JSON ou None)"""
+        headers = {'Accept-Encoding': self.accept_encoding if record else 'identity'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if revalidate and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+
+        started = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # Connexion perdue : comptée comme erreur, reconnexion au prochain appel
+            self._conn = None
+            status, data, response = 0, b'', None
+        elapsed = time.perf_counter() - started
+
+        if response is not None and response.getheader('ETag'):
+            self.etags[path] = response.getheader('ETag')
+        if record:
+            queries = response.getheader('X-DB-Queries') if response is not None else None
+            self.samples.append((endpoint or f'{method} {path}', elapsed, status,
+                                 int(queries) if queries is not None else None))
+        if not record and data and response.getheader('Content-Type', '').startswith('application/json'):
+            return status, json.loads(data)
+        return status, None
+
+
+# ============================================
+# SCÉNARIOS (une itération d'un utilisateur virtuel)
+# ============================================
+
+def login_storm(client, user, rng, args):
+    username = f'{USER_PREFIX}{rng.randint(1, args.users)}'
+    client.call('POST', '/api/login', {'username': username, 'password': args.password},
+                endpoint='POST /api/login')
+
+
+def board_load(client, user, rng, args):
+    for status in ('all',) + STATUSES:
+        client.call('GET', f'/api/tasks?status={status}', revalidate=args.revalidate)
+
+
+def status_churn(client, user, rng, args):
+    if not user['task_ids']:
+        return
+    task_id = rng.choice(user['task_ids'])
+    client.call('PUT', f'/api/tasks/{task_id}/status', {'status': rng.choice(STATUSES)},
+                endpoint='PUT /api/tasks/{id}/status')
+
+
+def stats_dashboard(client, user, rng, args):
+    client.call('GET', '/api/tasks/stats', revalidate=args.revalidate)
+
+
+def upcoming(client, user, rng, args):
+    client.call('GET', '/api/tasks/upcoming', revalidate=args.revalidate)
+
+
+def search(client, user, rng, args):
+    # Les titres de bench/seed.py commencent tous par « Tâche »
+    order = rng.choice(('relevance', 'date'))
+    client.call('GET', f'/api/tasks/search?q=t%C3%A2che&order={order}&limit=50',
+                endpoint=f'GET /api/tasks/search?order={order}', revalidate=args.revalidate)
+
+
+SCENARIOS = {
+    'login_storm': login_storm,
+    'board_load': board_load,
+    'status_churn': status_churn,
+    'stats_dashboard': stats_dashboard,
+    'upcoming': upcoming,
+    'search': search,
+}
+
+
+# ============================================
+# EXÉCUTION
+# ============================================
+
+def percentile(sorted_values, p):
+    """Percentile par rang le plus proche"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Statistiques par route : liste de (route, latence s, status, requêtes SQL)"""
+    by_endpoint = {}
+    for endpoint, latency, status, queries in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, status, queries))
+
+    summary = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(latency * 1000 for latency, _, _ in rows)
+        queries = [q for _, _, q in rows if q is not None]
+        summary[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _ in rows if status == 0 or status >= 400),
+            'not_modified': sum(1 for _, status, _ in rows if status == 304),
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(latencies[-1], 3),
+            },
+            'db_queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return summary
+
+
+def prepare_user(args, index):
+    """Connexion (et ids de tâches) d'un utilisateur virtuel, hors mesures"""
+    client = ApiClient(args.url, [], args.accept_encoding)
+    username = f'{USER_PREFIX}{index % args.users + 1}'
+    status, body = client.call('POST', '/api/login', {'username': username, 'password': args.password},
+                               record=False)
+    if status != 200:
+        raise SystemExit(f"❌ Connexion de {username} impossible ({status}) : lancer d'abord bench/seed.py")
+    client.token = body['token']
+    _, tasks = client.call('GET', '/api/tasks?status=all', record=False)
+    return client, {'username': username, 'task_ids': [task['id'] for task in tasks or []]}
+
+
+def run_scenario(name, args):
+    scenario = SCENARIOS[name]
+    users = [prepare_user(args, index) for index in range(args.concurrency)]
+    samples_per_worker = [[] for _ in users]
+    iterations = [0] * len(users)
+    start = threading.Event()
+    deadline = [0.0]
+
+    def worker(index):
+        client, user = users[index]
+        client.samples = samples_per_worker[index]
+        rng = random.Random(args.seed * 1000 + index)
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            scenario(client, user, rng, args)
+            iterations[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(len(users))]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    deadline[0] = started + args.duration
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for worker_samples in samples_per_worker for sample in worker_samples]
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'iterations': sum(iterations),
+        'endpoints': summarize(samples, elapsed),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(name, result):
+    print(f"\n▶ {name} : {result['iterations']} itérations en {result['elapsed_s']} s")
+    print(f"  {'route':<34} {'req':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'SQL':>5}")
+    for endpoint, stats in result['endpoints'].items():
+        latency = stats['latency_ms']
+        queries = stats['db_queries_per_request']
+        print(f"  {endpoint:<34} {stats['requests']:>7} {stats['throughput_rps']:>8} "
+              f"{latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8} {stats['errors']:>5} "
+              f"{queries if queries is not None else '-':>5}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Test de charge des routes de l\'API')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scénario à lancer (répétable, défaut : tous)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Utilisateurs virtuels simultanés')
+    parser.add_argument('--duration', type=float, default=20, help='Durée (s) de chaque scénario')
+    parser.add_argument('--users', type=int, default=100, help='Utilisateurs créés par bench/seed.py')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='Renvoyer If-None-Match comme un navigateur (réponses 304)')
+    parser.add_argument('--accept-encoding', default='gzip')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Fichier JSON des résultats (comparable avec bench/compare.py)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'url': args.url,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'users': args.users,
+            'revalidate': args.revalidate,
+            'accept_encoding': args.accept_encoding,
+            'seed': args.seed,
+        },
+        'scenarios': {},
+    }
+    for name in args.scenario or sorted(SCENARIOS):
+        results['scenarios'][name] = run_scenario(name, args)
+        print_report(name, results['scenarios'][name])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"\n💾 Résultats enregistrés dans {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""Jeu de données reproductible pour les benchmarks.
+
+Crée ``--users`` utilisateurs ``bench-user-<n>`` (mot de passe ``--password``)
+avec ``--tasks`` tâches chacun. La répartition des status, la part de tâches
+sans date et l'étalement des dates de début autour d'aujourd'hui sont
+paramétrables ; la même graine (``--seed``) donne toujours les mêmes données.
+
+    python bench/seed.py --users 200 --tasks 300 --mix 50,20,30 --spread 60
+    python bench/seed.py --reset-only
+
+Les variables STORAGE_BACKEND, DB_* et SQLITE_PATH sont celles du backend
+(voir storage.py). Les utilisateurs bench-user-* existants sont supprimés
+avant la création.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import bcrypt
+
+from counters import rebuild_counters
+from migrate import migrate
+from positions import sequential_keys
+from sql_dialect import current_dialect
+from storage import active_storage
+from task_repository import TASK_STATUSES
+
+USER_PREFIX = 'bench-user-'
+INSERT_BATCH = 1000
+
+
+def parse_mix(value):
+    """« 50,20,30 » -> poids des status todo, in_progress, done"""
+    weights = [float(part) for part in value.split(',')]
+    if len(weights) != len(TASK_STATUSES) or sum(weights) <= 0 or min(weights) < 0:
+        raise argparse.ArgumentTypeError('3 poids positifs attendus : todo,in_progress,done')
+    return weights
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Génère le jeu de données des benchmarks')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--tasks', type=int, default=200, help='Tâches par utilisateur')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('50,20,30'),
+                        help='Poids des status todo,in_progress,done (défaut : 50,20,30)')
+    parser.add_argument('--spread', type=int, default=60,
+                        help='Dates de début tirées dans ±N jours autour d\'aujourd\'hui')
+    parser.add_argument('--no-date', type=float, default=0.2, help='Part des tâches sans date de début')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset-only', action='store_true', help='Supprimer les données de benchmark et quitter')
+    return parser
+
+
+def reset(conn):
+    cursor = conn.cursor()
+    # Tâches, compteurs et tombstones suivent par ON DELETE CASCADE
+    cursor.execute('DELETE FROM users WHERE username LIKE %s', (USER_PREFIX + '%',))
+    deleted = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return deleted
+
+
+def generate_tasks(rng, user_id, args, today, now):
+    rows = []
+    for i in range(args.tasks):
+        status = rng.choices(TASK_STATUSES, weights=args.mix)[0]
+        start_date = None
+        if rng.random() >= args.no_date:
+            start_date = today + timedelta(days=rng.randint(-args.spread, args.spread))
+        created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 180))
+        rows.append([user_id, f'Tâche {i + 1} de {USER_PREFIX}{user_id}', status, start_date, created, created])
+
+    # Ordre manuel : clés croissantes dans chaque colonne, dans l'ordre de génération
+    for status in TASK_STATUSES:
+        column = [row for row in rows if row[2] == status]
+        for row, position in zip(column, sequential_keys(len(column))):
+            row.append(position)
+    return [tuple(row) for row in rows]
+
+
+def seed(conn, args):
+    rng = random.Random(args.seed)
+    # Un seul hash pour tous les comptes (coût BCRYPT_LOG_ROUNDS, comme le backend)
+    rounds = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    today = date.today()
+    now = datetime.now().replace(microsecond=0)
+
+    cursor = conn.cursor()
+    for n in range(1, args.users + 1):
+        username = f'{USER_PREFIX}{n}'
+        cursor.execute('INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)',
+                       (username, f'{username}@bench.invalid', password_hash))
+        user_id = cursor.lastrowid
+        rows = generate_tasks(rng, user_id, args, today, now)
+        for start in range(0, len(rows), INSERT_BATCH):
+            cursor.executemany('''
+                INSERT INTO tasks (user_id, title, status, start_date, createdAt, updatedAt, position)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ''', rows[start:start + INSERT_BATCH])
+        conn.commit()
+        rebuild_counters(conn, user_id)
+        if n % 50 == 0 or n == args.users:
+            print(f"👥 {n}/{args.users} utilisateur(s) créé(s)")
+
+    for table in ('tasks', 'task_counters', 'task_date_buckets'):
+        cursor.execute(f'{current_dialect().analyze} {table}')
+        cursor.fetchall()
+    cursor.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    conn = active_storage().connect()
+    try:
+        migrate(conn)
+        print(f"🧹 {reset(conn)} utilisateur(s) de benchmark supprimé(s)")
+        if args.reset_only:
+            return 0
+        seed(conn, args)
+    finally:
+        conn.close()
+    print(f"✅ {args.users} utilisateurs × {args.tasks} tâches (graine {args.seed})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())